@@ -1,5 +1,6 @@
 # app.py - Main Application Entry Point with File-Based Storage
 import sys
+import argparse
 import logging
 
 # Configure logging
@@ -11,24 +12,27 @@ logging.basicConfig(
 
 from core.auth import Authentication
 from core.expenses import ExpenseTracker
-from core.file_manager import load_data, save_data
+from core.expense_store import get_store
+from core.file_manager import (load_global, put_user, save_data, set_storage_mode, fold_leftover_journal,
+                               reserve_category_id, STORAGE_MODE, STORAGE_MODES)
+from core.codec import set_format, JSON_FORMATS
+from core.categories import migrate_category_refs, verify_usage, rebuild_usage
 from core.models import Category
-from core.file_manager import hash_password
+from core.reports import build_report
+from core.passwords import hash_password, is_hashed
 from app_gui import AppGUI
 
 
 def create_admin(auth):
-    data = load_data()
-
-    for user in data["users"]:
-        if user["username"] == "admin":
-            # If admin password is in plain text, hash it
-            if len(user["password"]) != 64:  # SHA-256 hashes are always 64 characters long
-                print("[!] Admin password found in plain text. Converting to hash...")
-                user["password"] = hash_password(user["password"])  # Convert to hash
-                save_data(data)
-                print("[✔] Admin password has been secured.")
-            return
+    admin = auth.get_user("admin")
+    if admin is not None:
+        # If admin password is in plain text, hash it
+        if not is_hashed(admin.password):
+            print("[!] Admin password found in plain text. Converting to hash...")
+            admin.password = hash_password(admin.password)  # Convert to hash
+            put_user(vars(admin))
+            print("[✔] Admin password has been secured.")
+        return
 
     # If no admin exists, create one with a hashed password
     print("[i] No admin found. Creating a new one...")
@@ -38,12 +42,41 @@ def create_admin(auth):
         "password": hash_password("adminpass"),  # Store hashed password
         "role": "admin"
     }
-    data["users"].append(admin_user)
-    save_data(data)
+    put_user(admin_user)
     print("[✔] Admin account created with hashed password.")
     logging.info("Admin account created and stored securely.")
 
 
+def check_totals(rebuild=False):
+    # Compare each user's stored running totals with their expenses, recomputing them if asked
+    mismatched = 0
+    for user in load_global(readonly=True).get("users", []):
+        store = get_store(user["user_id"])
+        if store.verify_aggregates():
+            continue
+        mismatched += 1
+        if rebuild:
+            store.rebuild_aggregates()
+            print(f"[+] Totals rebuilt for user '{user['username']}'.")
+            logging.info(f"Expense totals rebuilt for user {user['user_id']}.")
+        else:
+            print(f"[!] Stored totals for user '{user['username']}' do not match their expenses.")
+            logging.warning(f"Expense totals out of date for user {user['user_id']}.")
+    # Then the per-category usage counts the admin checks rely on
+    if not verify_usage():
+        mismatched += 1
+        if rebuild:
+            rebuild_usage()
+            print("[+] Category usage counts rebuilt.")
+            logging.info("Category usage counts rebuilt.")
+        else:
+            print("[!] Category usage counts do not match the expenses.")
+            logging.warning("Category usage counts out of date.")
+    if not mismatched:
+        print("[✔] All stored totals match the expenses.")
+    return mismatched
+
+
 def main_menu(auth):
     while True:
         print("\n=== Main Menu ===")
@@ -76,11 +109,11 @@ def create_category(data):
     # Prompt the admin to enter a new category name
     name = input("Enter new category name: ").strip()
     if name:
-        # Generate a unique category ID
-        category_id = max(data["categories"].keys(), default=0) + 1
+        # Generate a unique category ID, never one a deleted category had
+        category_id = reserve_category_id()
         # Create a new category object and add it to the data
         new_cat = Category(name=name, user_id=1, category_id=category_id)
-        data["categories"][category_id] = vars(new_cat)
+        data["categories"][str(category_id)] = vars(new_cat)
         save_data(data)
         print("[+] Category created.")
         logging.info(f"Category '{name}' created by admin.")
@@ -160,7 +193,12 @@ def user_menu(auth, user_trackers):
         if choice == "1":
             tracker.add_expense()
         elif choice == "2":
-            tracker.list_expenses()
+            date_from = input("From date (YYYY, YYYY-MM or YYYY-MM-DD, Enter for all): ").strip()
+            date_to = input("To date (Enter for no limit): ").strip()
+            try:
+                tracker.list_expenses(date_from or None, date_to or None)
+            except ValueError as e:
+                print(f"[!] {e}")
         elif choice == "3":
             tracker.edit_expense()
         elif choice == "4":
@@ -185,6 +223,7 @@ def user_menu(auth, user_trackers):
 
 
 def run_app():
+    """The text menus; the startup steps in __main__ have already run."""
     auth = Authentication()
     create_admin(auth)
     user_trackers = {}
@@ -197,7 +236,38 @@ def run_app():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cha-Ching $$ - Personal Expense Tracker")
+    parser.add_argument("--storage", choices=STORAGE_MODES,
+                        help="storage backend to use (default: $CHACHING_STORAGE or json)")
+    parser.add_argument("--json-format", choices=JSON_FORMATS,
+                        help="how JSON data files are written (default: $CHACHING_JSON_FORMAT or pretty)")
+    parser.add_argument("--verify-totals", action="store_true",
+                        help="check every user's stored expense totals and category usage counts "
+                             "against their expenses and exit")
+    parser.add_argument("--rebuild-totals", action="store_true",
+                        help="recompute every user's stored expense totals and category usage counts and exit")
+    parser.add_argument("--report", metavar="MONTH",
+                        help="write spend reports for every user for MONTH (YYYY-MM, or 'all') "
+                             "to data/reports and exit")
+    parser.add_argument("--cli", action="store_true", help="use the text menus instead of the window")
+    args = parser.parse_args()
+    # Also for the mode set by CHACHING_STORAGE, so a data.json saved after its store is picked up
+    set_storage_mode(args.storage or STORAGE_MODE, carry_over=False)
+    fold_leftover_journal()
+    if args.json_format:
+        set_format(args.json_format)
+    migrate_category_refs()  # expenses saved before categories were referenced by id
+    if args.verify_totals or args.rebuild_totals:
+        sys.exit(1 if check_totals(rebuild=args.rebuild_totals) and not args.rebuild_totals else 0)
+    if args.report:
+        report = build_report(None if args.report == "all" else args.report)
+        print(f"[✔] Report for {len(report['users'])} users ({report['count']} expenses, "
+              f"${report['total']:.2f}) written to {report['dir']}.")
+        sys.exit(0)
+
     logging.info("Application started.")
+    if args.cli:
+        run_app()
 
     auth = Authentication()
     create_admin(auth)  # <--- This ensures admin gets created
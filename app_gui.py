@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from concurrent.futures import ThreadPoolExecutor
 from core.auth import Authentication
 from core.expenses import ExpenseTracker
+from core.file_manager import start_background_writer, shutdown_background_writer, write_status
 from dashboards import AdminDashboard, UserDashboard
 import logging
 
@@ -40,6 +42,13 @@ class AppGUI(tk.Tk):
 
         self.auth = Authentication()
         self.current_tracker = None
+        # Password hashing is deliberately slow, so login and registration run on this worker
+        # thread; a single worker also keeps them from racing on the user list
+        self.auth_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="auth")
+
+        # Saves are written by a background thread so the UI never waits on disk
+        start_background_writer()
+        self.protocol("WM_DELETE_WINDOW", self.quit_app)
 
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -77,6 +86,17 @@ class AppGUI(tk.Tk):
 
         self.frames[frame_class].tkraise()
 
+    def quit_app(self):
+        """Waits for pending saves to reach disk before closing the window."""
+        if not shutdown_background_writer(timeout=5):
+            pending, error = write_status()
+            detail = f"\n\nLast error: {error}" if error else ""
+            if not messagebox.askyesno("Unsaved Changes",
+                                       f"{pending} change(s) could not be saved yet.{detail}\n\nQuit anyway?"):
+                return
+            logging.error(f"[GUI] Quit with {pending} unsaved change(s).")
+        self.destroy()
+
 
 class HomePage(ttk.Frame):
     def __init__(self, parent, controller):
@@ -97,7 +117,7 @@ class HomePage(ttk.Frame):
                    command=lambda: controller.show_frame(RegisterPage)).pack(pady=5, ipadx=18)
 
         # Quit Button at bottom right
-        quit_btn = ttk.Button(self, text="Quit", style="TButton", command=controller.destroy)
+        quit_btn = ttk.Button(self, text="Quit", style="TButton", command=controller.quit_app)
         quit_btn.place(relx=0.95, rely=0.95, anchor="se")
 
 class LoginPage(ttk.Frame):
@@ -154,7 +174,11 @@ class LoginPage(ttk.Frame):
         self.password.bind("<FocusIn>", clear_once(self.password, "Enter password..."))
 
         # --- Login Button ---
-        ttk.Button(wrapper, text="Login", style="Accent.TButton", command=self.login).pack(pady=15)
+        self.login_btn = ttk.Button(wrapper, text="Login", style="Accent.TButton", command=self.login)
+        self.login_btn.pack(pady=15)
+
+        # Shown while the password is checked on the controller's auth worker
+        self.progress = ttk.Progressbar(wrapper, mode="indeterminate", length=200)
 
     def reset_fields(self):
         """Clears the username and password fields."""
@@ -176,8 +200,30 @@ class LoginPage(ttk.Frame):
             self.password.focus_set()
             return
 
-        # Auth check
-        if self.controller.auth.login(user, pwd):
+        # Auth check, off the Tk thread
+        self.login_btn.config(state="disabled", text="Logging in…")
+        self.validation_msg.config(text="")
+        self.progress.pack(pady=(0, 10))
+        self.progress.start(10)
+        future = self.controller.auth_executor.submit(self.controller.auth.login, user, pwd)
+        self.after(50, self.finish_login, future, user)
+
+    def finish_login(self, future, user):
+        """Polls the login worker and updates the UI once it is done."""
+        if not future.done():
+            self.after(50, self.finish_login, future, user)
+            return
+        self.progress.stop()
+        self.progress.pack_forget()
+        self.login_btn.config(state="normal", text="Login")
+
+        try:
+            success = future.result()
+        except Exception:
+            logging.exception("[GUI] Login failed with an unexpected error.")
+            success = False
+
+        if success:
             current_user = self.controller.auth.get_current_user()
             logging.info(f"[GUI] User '{current_user.username}' logged in successfully.")
 
@@ -263,7 +309,11 @@ class RegisterPage(ttk.Frame):
         self.confirm_password.bind("<FocusIn>", clear_once(self.confirm_password))
 
         # Register button
-        ttk.Button(wrapper, text="Register", style="Accent.TButton", command=self.register).pack(pady=15)
+        self.register_btn = ttk.Button(wrapper, text="Register", style="Accent.TButton", command=self.register)
+        self.register_btn.pack(pady=15)
+
+        # Shown while the password is hashed on the controller's auth worker
+        self.progress = ttk.Progressbar(wrapper, mode="indeterminate", length=200)
 
     def reset_fields(self):
         """Clears all input fields and validation message."""
@@ -292,7 +342,29 @@ class RegisterPage(ttk.Frame):
             self.confirm_password.focus_set()
             return
 
-        result = self.controller.auth.register(user, pwd)
+        # Registration hashes the password, off the Tk thread
+        self.register_btn.config(state="disabled", text="Registering…")
+        self.validation_msg.config(text="")
+        self.progress.pack(pady=(0, 10))
+        self.progress.start(10)
+        future = self.controller.auth_executor.submit(self.controller.auth.register, user, pwd)
+        self.after(50, self.finish_register, future)
+
+    def finish_register(self, future):
+        """Polls the registration worker and updates the UI once it is done."""
+        if not future.done():
+            self.after(50, self.finish_register, future)
+            return
+        self.progress.stop()
+        self.progress.pack_forget()
+        self.register_btn.config(state="normal", text="Register")
+
+        try:
+            result = future.result()
+        except Exception:
+            logging.exception("[GUI] Registration failed with an unexpected error.")
+            result = None
+
         if result:
             self.validation_msg.config(text="", foreground="green")
             messagebox.showinfo("Registration Successful", "Your account has been created.")
@@ -0,0 +1,67 @@
+# bench_analytics.py - Summary/Trend Loops vs. the Columnar Analytics Engines
+#
+# Run from the project root:  python -m benchmarks.bench_analytics [rows ...]
+# "loops" is how the summary and trend views used to compute their numbers: a dict loop
+# over every expense for the month's category totals and one pass per month for the trend.
+# The engines first build columns (paid once per change to the data), then group them.
+import sys
+import time
+from collections import defaultdict
+from benchmarks.datagen import make_dataset
+from core import analytics
+from core.analytics import ExpenseColumns
+
+ROW_COUNTS = (10_000, 100_000, 1_000_000)
+MONTH = "2023-06"
+TREND_MONTHS = [f"2023-{m:02d}" for m in range(1, 13)]
+
+
+def _ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def _loops(expenses):
+    def category_totals():
+        totals = defaultdict(float)
+        for exp in expenses:
+            if exp["date"].startswith(MONTH):
+                totals[exp["category_id"]] += exp["amount"]
+        return dict(totals)
+
+    def trend():
+        return {month: sum(exp["amount"] for exp in expenses if exp["date"].startswith(month))
+                for month in TREND_MONTHS}
+
+    return [("category totals", category_totals), ("12-month trend", trend)]
+
+
+def _engine(columns):
+    def trend():
+        by_month = columns.by_month()
+        totals = [by_month.get(month, 0.0) for month in TREND_MONTHS]
+        return columns.rolling_average(totals)
+
+    return [("category totals", lambda: columns.by_category(MONTH)), ("12-month trend", trend),
+            ("weekday", columns.by_weekday), ("percentiles", columns.percentiles),
+            ("month x category", columns.by_month_category)]
+
+
+def main(row_counts):
+    engines = [engine for engine in analytics.ENGINES if engine != "numpy" or analytics.np is not None]
+    if "numpy" not in engines:
+        print("(NumPy is not installed; only the pure-Python engine is measured)")
+    print(f"{'rows':>9} {'method':<8} {'build ms':>9} {'operation':<17} {'ms':>9}")
+    for rows in row_counts:
+        expenses = make_dataset(rows, n_users=1)["expenses"]["2"]
+        for name, fn in _loops(expenses):
+            print(f"{rows:>9} {'loops':<8} {'-':>9} {name:<17} {_ms(fn)[0]:>9.2f}")
+        for engine in engines:
+            build, columns = _ms(lambda: ExpenseColumns.from_records(expenses, engine))
+            for name, fn in _engine(columns):
+                print(f"{rows:>9} {engine:<8} {build:>9.1f} {name:<17} {_ms(fn)[0]:>9.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or ROW_COUNTS)
@@ -0,0 +1,64 @@
+# bench_models.py - Memory of the Expense Records and of a Loaded ExpenseStore
+#
+# Run from the project root:  python -m benchmarks.bench_models [rows ...]
+# Compares one user's expenses as parsed from JSON (one dict per expense) with the
+# compact Expense records built by Expense.from_lists, then loads a real ExpenseStore
+# (records plus its indexes) from a temporary data.json and measures what it holds.
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.datagen import make_dataset
+from core import file_manager
+from core.expense_store import ExpenseStore
+from core.models import Expense
+
+ROW_COUNTS = (100_000, 1_000_000)
+
+
+def _measure(build):
+    """(MiB held by the result, seconds to build it)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return held / 2 ** 20, seconds
+
+
+def _load_store(user_id):
+    store = ExpenseStore(user_id)
+    len(store)  # loads the records and builds the indexes
+    file_manager.invalidate_cache()  # count the store, not the file cache it was read from
+    return store
+
+
+def main(row_counts):
+    print(f"{'rows':>9} {'representation':<22} {'MiB':>8} {'bytes/row':>10} {'build s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "data.json")
+        for rows in row_counts:
+            data = make_dataset(rows, n_users=1)
+            # Encoded once, so the records are built from freshly parsed JSON like a real load
+            raw = json.dumps(data["expenses"]["2"])
+            with open(data_file, "w") as f:
+                json.dump(data, f)
+            del data
+            file_manager.use_data_paths(data_file, os.path.join(tmp, "data.journal"),
+                                        os.path.join(tmp, "shards"), os.path.join(tmp, "chaching.db"))
+            runs = [("dicts (JSON)", lambda: json.loads(raw)),
+                    ("Expense.from_lists", lambda: Expense.from_lists(json.loads(raw))),
+                    ("ExpenseStore", lambda: _load_store(2))]
+            for name, build in runs:
+                mib, seconds = _measure(build)
+                print(f"{rows:>9} {name:<22} {mib:>8.1f} {mib * 2 ** 20 / rows:>10.0f} {seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or ROW_COUNTS)
@@ -0,0 +1,43 @@
+# bench_passwords.py - Password Verify Latency per KDF Cost Setting
+#
+# Run from the project root:  python -m benchmarks.bench_passwords
+# Pick the largest cost whose latency is still acceptable for a login (~100-250 ms)
+# and set it with CHACHING_SCRYPT_N / CHACHING_PBKDF2_ITERATIONS.
+import hashlib
+import time
+from core import passwords
+
+SCRYPT_COSTS = (2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16, 2 ** 17)
+PBKDF2_COSTS = (100_000, 300_000, 600_000, 1_000_000, 2_000_000)
+REPEAT = 3
+
+
+def _verify_ms(stored):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        assert passwords.verify_password(stored, "correct horse battery staple")
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _is_current(kdf, cost):
+    return kdf == passwords.KDF and cost == (passwords.SCRYPT_N if kdf == "scrypt" else passwords.PBKDF2_ITERATIONS)
+
+
+def main():
+    print(f"{'kdf':<15} {'cost':>10} {'verify ms':>10}")
+    legacy = hashlib.sha256(b"correct horse battery staple").hexdigest()
+    print(f"{'sha256 (legacy)':<15} {'-':>10} {_verify_ms(legacy):>10.2f}")
+    runs = [("pbkdf2_sha256", cost) for cost in PBKDF2_COSTS]
+    if hasattr(hashlib, "scrypt"):
+        runs = [("scrypt", cost) for cost in SCRYPT_COSTS] + runs
+    for kdf, cost in runs:
+        stored = passwords.hash_password("correct horse battery staple", kdf=kdf, cost=cost)
+        marker = "  <- current" if _is_current(kdf, cost) else ""
+        print(f"{kdf:<15} {cost:>10} {_verify_ms(stored):>10.1f}{marker}")
+
+
+
+if __name__ == "__main__":
+    main()
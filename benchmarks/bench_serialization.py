@@ -0,0 +1,52 @@
+# bench_serialization.py - Compares data.json Size and Load/Save Time per JSON Format
+#
+# Run from the project root:  python -m benchmarks.bench_serialization [sizes...]
+import os
+import sys
+import tempfile
+import time
+from core import codec
+from core.atomic import atomic_write_json
+from benchmarks.datagen import make_dataset
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+REPEAT = 3
+
+
+def _best(fn):
+    """Best wall time of REPEAT runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _variants():
+    yield "pretty", "pretty", codec.orjson
+    yield "compact (stdlib)", "compact", None
+    if codec.orjson is not None:
+        yield "compact (orjson)", "compact", codec.orjson
+
+
+def main(sizes):
+    orjson = codec.orjson
+    print(f"orjson: {'installed' if orjson else 'not installed'}")
+    print(f"{'expenses':>9}  {'format':<17} {'size KB':>9} {'save ms':>9} {'load ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.json")
+        for size in sizes:
+            data = make_dataset(size)
+            for label, fmt, codec_lib in _variants():
+                codec.orjson = codec_lib
+                try:
+                    save_ms = _best(lambda: atomic_write_json(path, data, fmt))
+                    load_ms = _best(lambda: codec.load_file(path))
+                finally:
+                    codec.orjson = orjson
+                print(f"{size:>9}  {label:<17} {os.path.getsize(path) / 1024:>9.1f} {save_ms:>9.1f} {load_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
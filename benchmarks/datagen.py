@@ -0,0 +1,33 @@
+# datagen.py - Synthetic Datasets for the Benchmarks
+import random
+
+CATEGORIES = ["Groceries", "Rent", "Utilities", "Transport", "Dining", "Health", "Entertainment", "Shopping"]
+WORDS = ["weekly", "shop", "bus", "ticket", "dinner", "with", "friends", "electric", "bill", "coffee",
+         "pharmacy", "movie", "night", "monthly", "rent", "taxi", "lunch", "market", "gift", "books"]
+
+
+def make_dataset(n_expenses, n_users=10, seed=42):
+    """Builds a data.json-shaped structure with `n_expenses` spread over `n_users` users."""
+    rng = random.Random(seed)
+    data = {
+        "users": [{"user_id": 1, "username": "admin", "password": "0" * 64, "role": "admin"}],
+        "expenses": {},
+        "categories": {str(i): {"category_id": i, "name": name, "user_id": 1}
+                       for i, name in enumerate(CATEGORIES, start=1)},
+        "budgets": {},
+    }
+    for uid in range(2, n_users + 2):
+        data["users"].append({"user_id": uid, "username": f"user{uid}", "password": "0" * 64, "role": "user"})
+        data["expenses"][str(uid)] = []
+        data["budgets"][str(uid)] = {f"2024-{m:02d}": 1500.0 for m in range(1, 13)}
+    for i in range(n_expenses):
+        uid = rng.randint(2, n_users + 1)
+        data["expenses"][str(uid)].append({
+            "expense_id": len(data["expenses"][str(uid)]) + 1,
+            "amount": round(rng.uniform(1, 500), 2),
+            "category_id": rng.randint(1, len(CATEGORIES)),
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))),
+            "user_id": uid,
+            "date": f"{rng.randint(2020, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        })
+    return data
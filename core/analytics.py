@@ -0,0 +1,206 @@
+# analytics.py - Columnar Expense Analytics, NumPy-Backed with a Pure-Python Fallback
+import os
+from core.categories import category_name
+from core.indexes import date_ordinal
+
+try:
+    import numpy as np
+except ImportError:  # optional speed-up, the pure-Python engine is used otherwise
+    np = None
+
+# "numpy" runs the group-bys as vectorized array operations; "python" uses plain loops
+# over the same columns. Results are identical; numpy is only used when installed.
+ENGINES = ("numpy", "python")
+ENGINE = os.environ.get("CHACHING_ANALYTICS", "numpy" if np is not None else "python")
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+# Ordinal of 1970-01-01, the day numpy's datetime64 counts from
+_EPOCH_ORDINAL = 719163
+
+
+def set_engine(engine):
+    global ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown analytics engine: {engine}")
+    if engine == "numpy" and np is None:
+        raise ValueError("The numpy analytics engine needs NumPy installed.")
+    ENGINE = engine
+
+
+def _month_name(key):
+    """YYYY-MM for a month key (year * 12 + month - 1)."""
+    return f"{key // 12:04d}-{key % 12 + 1:02d}"
+
+
+def _month_key(month):
+    return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+
+def _parse_dates(dates):
+    """(ordinals, month keys) parsed row by row; unreadable dates get 0 for both."""
+    ordinals = [date_ordinal(d) for d in dates]
+    months = [int(d[:4]) * 12 + int(d[5:7]) - 1 if ordinal else 0 for d, ordinal in zip(dates, ordinals)]
+    return ordinals, months
+
+
+def _percentile(sorted_values, q):
+    """Linear-interpolated percentile, the same definition numpy.percentile uses by default."""
+    position = (len(sorted_values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+class ExpenseColumns:
+    """
+    One user's expenses as parallel columns: date ordinal, month key, category id and
+    amount in integer cents. Built once per change (see ExpenseStore.analytics) and then
+    grouped and summarized without touching the expense dicts again. Amounts come back in
+    currency units; sums are exact because they are taken in cents.
+    """
+
+    def __init__(self, ordinals, months, codes, cents, engine):
+        self.ordinals = ordinals
+        self.months = months
+        self.codes = codes  # category ids; names are looked up when results are returned
+        self.cents = cents
+        self.engine = engine
+
+    @classmethod
+    def from_records(cls, records, engine=None):
+        engine = engine or ENGINE
+        dates, codes, cents = [], [], []
+        for exp in records:
+            dates.append(exp["date"])
+            codes.append(exp["category_id"])
+            cents.append(round(exp["amount"] * 100))
+        if engine == "numpy":
+            try:
+                days = np.array(dates, dtype="datetime64[D]")
+                ordinals = days.astype("int64") + _EPOCH_ORDINAL
+                months = days.astype("datetime64[M]").astype("int64") + 1970 * 12
+            except ValueError:  # an unreadable date somewhere; parse row by row instead
+                ordinals, months = (np.array(column, dtype="int64") for column in _parse_dates(dates))
+            return cls(ordinals, months, np.array(codes, dtype="int64"), np.array(cents, dtype="int64"), engine)
+        ordinals, months = _parse_dates(dates)
+        return cls(ordinals, months, codes, cents, engine)
+
+    def __len__(self):
+        return len(self.cents)
+
+    # ------------------------------------------------------------------ group-bys
+
+    def _group(self, keys, mask=None):
+        """{key: total cents} over rows (optionally only where `mask` holds)."""
+        if self.engine == "numpy":
+            cents = self.cents
+            if mask is not None:
+                keys, cents = keys[mask], cents[mask]
+            if not len(keys):
+                return {}
+            low = int(keys.min())
+            if int(keys.max()) - low < 4 * len(keys) + 1024:
+                # Dense keys (months, weekdays, category ids): one counting pass, no sort
+                counts = np.bincount(keys - low)
+                sums = np.bincount(keys - low, weights=cents)  # float64 holds cent sums exactly up to 2**53
+                present = np.flatnonzero(counts)
+                return dict(zip((present + low).tolist(), np.rint(sums[present]).astype("int64").tolist()))
+            unique, inverse = np.unique(keys, return_inverse=True)
+            sums = np.zeros(len(unique), dtype="int64")
+            np.add.at(sums, inverse, cents)
+            return dict(zip(unique.tolist(), sums.tolist()))
+        totals = {}
+        rows = range(len(keys)) if mask is None else (i for i in range(len(keys)) if mask[i])
+        for i in rows:
+            totals[keys[i]] = totals.get(keys[i], 0) + self.cents[i]
+        return totals
+
+    def _month_mask(self, month):
+        try:
+            key = _month_key(month)
+        except ValueError:
+            key = -1  # not a YYYY-MM month, so nothing matches
+        if self.engine == "numpy":
+            return self.months == key
+        return [m == key for m in self.months]
+
+    def by_month(self):
+        """{YYYY-MM: total}, oldest month first."""
+        return {_month_name(key): cents / 100 for key, cents in sorted(self._group(self.months).items())}
+
+    def by_category(self, month=None):
+        """{category: total}, for one month or all of them, largest first."""
+        mask = None if month is None else self._month_mask(month)
+        totals = self._group(self.codes, mask)
+        return {category_name(code): cents / 100
+                for code, cents in sorted(totals.items(), key=lambda item: -item[1])}
+
+    def by_month_category(self):
+        """{(YYYY-MM, category): total}."""
+        if self.engine == "numpy":
+            width = int(self.codes.max(initial=0)) + 1
+            keys = self.months * width + self.codes
+        else:
+            width = max(self.codes, default=0) + 1
+            keys = [m * width + c for m, c in zip(self.months, self.codes)]
+        return {(_month_name(key // width), category_name(key % width)): cents / 100
+                for key, cents in sorted(self._group(keys).items())}
+
+    def by_weekday(self, month=None):
+        """{weekday name: total}, Monday first."""
+        mask = None if month is None else self._month_mask(month)
+        if self.engine == "numpy":
+            weekdays = (self.ordinals + 6) % 7  # ordinal 1 (0001-01-01) was a Monday
+        else:
+            weekdays = [(o + 6) % 7 for o in self.ordinals]
+        totals = self._group(weekdays, mask)
+        return {name: totals.get(day, 0) / 100 for day, name in enumerate(WEEKDAYS)}
+
+    # ------------------------------------------------------------------ series and distributions
+
+    def monthly_series(self, first=None, last=None):
+        """(months, totals) for every month from `first` to `last` (YYYY-MM), empty months included."""
+        totals = self._group(self.months)
+        if not totals and (first is None or last is None):
+            return [], []
+        start = _month_key(first) if first else min(totals)
+        stop = _month_key(last) if last else max(totals)
+        keys = range(start, stop + 1)
+        return [_month_name(key) for key in keys], [totals.get(key, 0) / 100 for key in keys]
+
+    def rolling_average(self, values, window=3):
+        """Trailing mean of `values` over `window` points; the first points average what is available."""
+        if not values:
+            return []
+        if self.engine == "numpy":
+            sums = np.cumsum(np.asarray(values, dtype="float64"))
+            dropped = np.concatenate((np.zeros(window), sums))[:len(values)]  # sum of points left the window
+            counts = np.minimum(np.arange(1, len(values) + 1), window)
+            return ((sums - dropped) / counts).tolist()
+        averages, running = [], 0.0
+        for i, value in enumerate(values):
+            running += value
+            if i >= window:
+                running -= values[i - window]
+            averages.append(running / min(i + 1, window))
+        return averages
+
+    def percentiles(self, qs=(50, 90, 99), month=None):
+        """{q: amount} for single-expense amounts, e.g. the median and 90th percentile."""
+        if self.engine == "numpy":
+            cents = self.cents if month is None else self.cents[self._month_mask(month)]
+            if not len(cents):
+                return {}
+            return dict(zip(qs, (np.percentile(cents, list(qs)) / 100).tolist()))
+        if month is None:
+            cents = sorted(self.cents)
+        else:
+            mask = self._month_mask(month)
+            cents = sorted(c for c, keep in zip(self.cents, mask) if keep)
+        if not cents:
+            return {}
+        return {q: _percentile(cents, q) / 100 for q in qs}
+
+    def total(self):
+        if self.engine == "numpy":
+            return int(self.cents.sum()) / 100
+        return sum(self.cents) / 100
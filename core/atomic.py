@@ -0,0 +1,44 @@
+# atomic.py - Crash-Safe File Replacement
+import os
+import tempfile
+from core import codec
+
+
+def _fsync_directory(directory):
+    """Makes a rename durable. Not supported (or needed) on Windows."""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, text):
+    """
+    Replaces `path` with `text` (str or bytes) without ever leaving a truncated file behind.
+    The content goes to a temp file in the same directory, is fsynced, and is then renamed over the target.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(text.encode("utf-8") if isinstance(text, str) else text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def atomic_write_json(path, content, fmt=None):
+    """Serializes `content` to JSON (see codec.JSON_FORMAT) and atomically replaces `path` with it."""
+    atomic_write(path, codec.dumps(content, fmt))
@@ -3,13 +3,14 @@ import itertools
 import logging
 import datetime
 from core.models import User
-from core.file_manager import load_data, save_data, hash_password, verify_password
+from core.file_manager import load_global, put_user
+from core.passwords import hash_password, verify_password, needs_rehash
 
 class Authentication:
     def __init__(self):
         """Initializes the authentication system and loads user data."""
         try:
-            data = load_data()
+            data = load_global(readonly=True)
             self.users = [User(**user) for user in data.get("users", [])]
             if self.users:
                 max_id = max(user.user_id for user in self.users)
@@ -17,22 +18,38 @@ class Authentication:
         except Exception as e:
             logging.error(f"Failed to load user data: {e}")
             self.users = []
+        # Lookup tables kept in sync with self.users; the first account wins on duplicate names
+        self.users_by_name = {}
+        self.users_by_id = {}
+        for user in self.users:
+            self._index(user)
         self.current_user = None
 
+    def _index(self, user):
+        self.users_by_name.setdefault(user.username, user)
+        self.users_by_id.setdefault(user.user_id, user)
+
+    def get_user(self, username: str):
+        """Returns the User with this username, or None."""
+        return self.users_by_name.get(username)
+
+    def get_user_by_id(self, user_id: int):
+        """Returns the User with this id, or None."""
+        return self.users_by_id.get(user_id)
+
     def register(self, username: str, password: str, role: str = "user"):
         """Registers a new user, ensuring the username is unique."""
-        if any(user.username == username for user in self.users):
+        if username in self.users_by_name:
             logging.warning(f"Registration failed: Username '{username}' already exists.")
             print("[!] Username already exists. Choose another one.")
             return None
 
         try:
             new_user = User(username, hash_password(password), role)
+            if not put_user(vars(new_user)):
+                raise IOError("user record could not be saved")
             self.users.append(new_user)
-
-            data = load_data()
-            data["users"].append(vars(new_user))
-            save_data(data)
+            self._index(new_user)
 
             logging.info(f"User '{username}' registered successfully.")
             print("[+] Registration successful:", new_user)
@@ -43,23 +60,37 @@ class Authentication:
             return None
 
     def login(self, username: str, password: str) -> bool:
-        """Logs in a user if the username and password match."""
-        for user in self.users:
-            if user.username == username:
-                try:
-                    if verify_password(user.password, password):  # <-- ✅ Correct order
-                        self.current_user = user
-                        logging.info(f"User '{username}' logged in.")
-                        print("[+] Login successful.")
-                        return True
-                except Exception as e:
-                    logging.warning(f"Password verification failed: {e}")
-                    return False
+        """
+        Logs in a user if the username and password match.
+        This runs the password KDF, so GUI callers should call it off the Tk thread.
+        """
+        user = self.users_by_name.get(username)
+        if user is not None:
+            try:
+                if verify_password(user.password, password):  # <-- ✅ Correct order
+                    self.current_user = user
+                    logging.info(f"User '{username}' logged in.")
+                    print("[+] Login successful.")
+                    if needs_rehash(user.password):
+                        self._rehash(user, password)
+                    return True
+            except Exception as e:
+                logging.warning(f"Password verification failed: {e}")
+                return False
 
         logging.warning(f"Login failed for username '{username}'.")
         print("[!] Invalid username or password.")
         return False
 
+    def _rehash(self, user, password):
+        """Upgrades a legacy or outdated hash while the plain-text password is at hand."""
+        try:
+            user.password = hash_password(password)
+            put_user(vars(user))
+            logging.info(f"Password hash for '{user.username}' upgraded.")
+        except Exception as e:
+            logging.warning(f"Could not upgrade password hash for '{user.username}': {e}")
+
     def logout(self):
         """Logs out the current user."""
         if self.current_user:
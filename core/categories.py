@@ -0,0 +1,185 @@
+# categories.py - Category Names Resolved by ID, Usage Counts, and the Migration to ID References
+import logging
+import sys
+import threading
+from core.file_manager import (load_data, save_data, load_global, load_user_data, global_version, storage_version,
+                               reserve_category_id)
+
+# Shown for an expense whose category no longer exists
+UNKNOWN_CATEGORY = "Unknown"
+# Given to legacy expenses that carry no category at all
+UNCATEGORIZED = "Uncategorized"
+# Value of the global "schema" section once every expense references its category by id
+CATEGORY_ID_SCHEMA = 1
+
+# (global version, {category_id: interned name}, {name: category_id}), swapped as a whole
+_lookup = (None, {}, {})
+_lookup_lock = threading.Lock()
+# Expenses per category: "users" is {uid: {category_id: count}} and "total" the sum over
+# every user, kept in step as users' counts are replaced. "version" is the
+# file_manager.storage_version() they were counted at, None before the first count.
+_usage = {"version": None, "users": {}, "total": {}}
+_usage_lock = threading.RLock()
+
+
+def _tables():
+    """The id -> name and name -> id tables, rebuilt only after the categories change."""
+    global _lookup
+    version = global_version()
+    if _lookup[0] != version:
+        with _lookup_lock:
+            if _lookup[0] != version:
+                names = {int(cid): sys.intern(cat["name"])
+                         for cid, cat in load_global(readonly=True).get("categories", {}).items()}
+                _lookup = (version, names, {name: cid for cid, name in names.items()})
+    return _lookup[1], _lookup[2]
+
+
+def category_name(category_id):
+    """The current name of a category, e.g. for display; a rename shows up everywhere at once."""
+    return _tables()[0].get(category_id, UNKNOWN_CATEGORY)
+
+
+def category_names():
+    """{category_id: name} for every category."""
+    return dict(_tables()[0])
+
+
+def category_id(name):
+    """The id of the category called `name`, or None if there is none."""
+    return _tables()[1].get(name)
+
+
+def assign_category_ids(expenses, categories, next_id=None):
+    """
+    Moves expense records that still name their category onto its category_id, in place.
+    Names missing from `categories` (a categories table, updated in place too) are added
+    as new categories, numbered by `next_id()` (e.g. file_manager.reserve_category_id) or
+    else one past the highest id in the table. Returns the records of the categories added.
+    """
+    by_name = {cat["name"]: int(cid) for cid, cat in categories.items()}
+    added = []
+    for exp in expenses:
+        if "category_id" in exp:
+            continue
+        name = exp.pop("category", None) or UNCATEGORIZED
+        if name not in by_name:
+            new_id = next_id() if next_id is not None else max(map(int, categories), default=0) + 1
+            categories[str(new_id)] = {"category_id": new_id, "name": name, "user_id": None}
+            by_name[name] = new_id
+            added.append(categories[str(new_id)])
+        exp["category_id"] = by_name[name]
+    return added
+
+
+def migrate_category_refs():
+    """
+    One-shot migration of data saved when expenses stored their category's name: every
+    expense gets its category_id instead. Returns the number of expenses changed. Once done,
+    the global "schema" section records it, so later startups skip the full load.
+    """
+    if load_global(readonly=True).get("schema", 0) >= CATEGORY_ID_SCHEMA:
+        return 0
+    data = load_data()
+    categories = data.setdefault("categories", {})
+    changed = 0
+    for exps in data.get("expenses", {}).values():
+        legacy = [exp for exp in exps if "category_id" not in exp]
+        for record in assign_category_ids(legacy, categories, reserve_category_id):
+            logging.warning(f"Category '{record['name']}' was missing; added as ID {record['category_id']}.")
+        changed += len(legacy)
+    data["schema"] = CATEGORY_ID_SCHEMA
+    save_data(data)
+    if changed:
+        logging.info(f"Migrated {changed} expenses to category ids.")
+    return changed
+
+
+# ------------------------------------------------------------------ usage counts
+
+def _count_expenses(expenses):
+    counts = {}
+    for exp in expenses:
+        if "category_id" in exp:
+            counts[exp["category_id"]] = counts.get(exp["category_id"], 0) + 1
+    return counts
+
+
+def _stored_counts(uid):
+    """One user's counts from their stored running totals, or from their expenses if those are stale."""
+    content = load_user_data(uid, readonly=True)
+    counts = {}
+    for cells in content["totals"].values():
+        for cid, (_, count) in cells.items():
+            counts[int(cid)] = counts.get(int(cid), 0) + count
+    if sum(counts.values()) != len(content["expenses"]):
+        counts = _count_expenses(content["expenses"])
+    return counts
+
+
+def _count_all(version, count):
+    """Replaces every user's counts with `count(uid)`, as of storage `version`."""
+    _usage["users"].clear()
+    _usage["total"].clear()
+    _usage["version"] = version
+    for user in load_global(readonly=True).get("users", []):
+        record_usage(user["user_id"], count(str(user["user_id"])))
+
+
+def record_usage(user_id, counts):
+    """
+    Replaces one user's per-category expense counts and moves the running total by the
+    difference. The ExpenseStore calls this after every load and save, so lookups stay O(1).
+    """
+    uid = str(user_id)
+    with _usage_lock:
+        if _usage["version"] is None:
+            return  # nothing counted yet; the first lookup counts every user
+        old = _usage["users"].get(uid, {})
+        total = _usage["total"]
+        for cid in old.keys() | counts.keys():
+            n = total.get(cid, 0) - old.get(cid, 0) + counts.get(cid, 0)
+            if n > 0:
+                total[cid] = n
+            else:
+                total.pop(cid, None)
+        _usage["users"][uid] = {cid: n for cid, n in counts.items() if n > 0}
+
+
+def _refresh_usage():
+    """Recounts from the stored totals if the data was replaced or saved by another process since they were counted."""
+    version = storage_version()
+    if _usage["version"] != version:
+        _count_all(version, _stored_counts)
+
+
+def category_usage(user_id=None):
+    """
+    {category_id: number of expenses} for one user, or for every user if `user_id` is None.
+    Expenses only change through an ExpenseStore, which keeps these counts in step; they are
+    recounted after a whole-document save or a save by another process.
+    """
+    with _usage_lock:
+        _refresh_usage()
+        if user_id is None:
+            return dict(_usage["total"])
+        return dict(_usage["users"].get(str(user_id), {}))
+
+
+def verify_usage():
+    """True if the usage counts match a recount of every user's expenses."""
+    with _usage_lock:
+        _refresh_usage()
+        total = {}
+        for uid, counts in _usage["users"].items():
+            if counts != _count_expenses(load_user_data(uid, readonly=True)["expenses"]):
+                return False
+            for cid, n in counts.items():
+                total[cid] = total.get(cid, 0) + n
+        return total == _usage["total"]
+
+
+def rebuild_usage():
+    """Recounts every user's expenses per category."""
+    with _usage_lock:
+        _count_all(storage_version(), lambda uid: _count_expenses(load_user_data(uid, readonly=True)["expenses"]))
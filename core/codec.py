@@ -0,0 +1,48 @@
+# codec.py - JSON Encoding for the Data Files
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the stdlib codec is used otherwise
+    orjson = None
+
+# "pretty" writes indented, human-readable files; "compact" drops indentation and
+# whitespace (and uses orjson when it is installed) for smaller, faster files.
+# Both formats load regardless of the setting.
+JSON_FORMATS = ("pretty", "compact")
+JSON_FORMAT = os.environ.get("CHACHING_JSON_FORMAT", "pretty")
+
+
+def set_format(fmt):
+    global JSON_FORMAT
+    if fmt not in JSON_FORMATS:
+        raise ValueError(f"Unknown JSON format: {fmt}")
+    JSON_FORMAT = fmt
+
+
+def dumps(content, fmt=None):
+    """Encodes `content` as UTF-8 JSON bytes in the given (or configured) format."""
+    if (fmt or JSON_FORMAT) == "pretty":
+        return json.dumps(content, indent=4).encode("utf-8")
+    if orjson is not None:
+        try:
+            return orjson.dumps(content)
+        except TypeError:  # e.g. integers beyond 64 bits; let the stdlib handle them
+            pass
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(raw):
+    """Decodes JSON from str or bytes. Raises json.JSONDecodeError on invalid input."""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # NaN/Infinity written by the stdlib are accepted below; real errors re-raise
+    return json.loads(raw)
+
+
+def load_file(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -0,0 +1,90 @@
+# csv_export.py - Streaming CSV Export of an Expense Query, Written on a Worker Thread
+import csv
+import gzip
+import logging
+import os
+import threading
+from core.categories import category_name
+from core.csv_import import COLUMNS
+
+
+def export_rows(query):
+    """The CSV rows of an ExpenseQuery, header first, produced one at a time as the query is read."""
+    yield list(COLUMNS)
+    for exp in query:
+        yield [exp["date"], category_name(exp["category_id"]), f"{exp['amount']:.2f}", exp["description"]]
+
+
+def open_export(path, compress=None):
+    """Opens an export file for writing text; gzip-compressed if `compress`, or by default if the path ends in .gz."""
+    if compress is None:
+        compress = path.lower().endswith(".gz")
+    if compress:
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+class CsvExport:
+    """
+    Writes the results of an ExpenseQuery to a CSV file from a worker thread, one row at
+    a time, so a multi-year export neither freezes the window nor is held in memory. The
+    file is written under a temporary name and renamed when complete, so a cancelled or
+    failed export leaves nothing behind. Progress is rows written out of `total`.
+    """
+
+    def __init__(self, query, path, compress=None):
+        self.query = query
+        self.path = path
+        self.compress = path.lower().endswith(".gz") if compress is None else compress
+        self.total = None      # number of rows to write, known shortly after start
+        self.written = 0
+        self.error = None      # what stopped the export, if anything
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="csv-export", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def progress(self):
+        """Fraction of the rows written, from 0 to 1."""
+        if not self.total:
+            return 1.0 if self.finished else 0.0
+        return self.written / self.total
+
+    def _run(self):
+        partial = self.path + ".part"
+        try:
+            self.total = self.query.count()
+            rows = export_rows(self.query)
+            with open_export(partial, self.compress) as f:
+                writer = csv.writer(f)
+                writer.writerow(next(rows))
+                for row in rows:
+                    if self.cancelled:
+                        break
+                    writer.writerow(row)
+                    self.written += 1
+            if self.cancelled:
+                os.remove(partial)
+            else:
+                os.replace(partial, self.path)
+        except Exception as e:
+            self.error = e
+            logging.error(f"CSV export to {self.path} stopped: {e}")
+            if os.path.exists(partial):
+                os.remove(partial)
+        finally:
+            self._done.set()
@@ -0,0 +1,189 @@
+# csv_import.py - Streaming CSV Import, Parsed and Validated in Chunks on a Worker Thread
+import csv
+import datetime
+import logging
+import math
+import os
+import queue
+import threading
+from core.categories import category_id
+from core.file_manager import reserve_expense_ids
+from core.indexes import fingerprint
+from core.models import Expense
+
+# Rows per chunk; each chunk is one ExpenseStore.add_many, i.e. one save
+IMPORT_CHUNK_SIZE = int(os.environ.get("CHACHING_IMPORT_CHUNK", "2000"))
+# Parsed chunks waiting to be committed; the reader pauses when this many are queued
+MAX_QUEUED_CHUNKS = 4
+# Row errors kept for display; any further ones are only counted
+MAX_ROW_ERRORS = 200
+COLUMNS = ("Date", "Category", "Amount", "Description")
+# What to do with a row matching an expense the user already has: leave it out, or import it
+# anyway and list it so the user can check
+DUPLICATE_POLICIES = ("skip", "flag")
+
+
+def parse_row(row, user_id):
+    """Turns one CSV row into an Expense (without an id yet), raising ValueError if it is invalid."""
+    missing = [column for column in COLUMNS if row.get(column) is None]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    cat_id = category_id(row["Category"].strip())
+    if cat_id is None:
+        raise ValueError(f"unknown category {row['Category']!r}")
+    try:
+        amount = float(row["Amount"])
+    except ValueError:
+        raise ValueError(f"invalid amount {row['Amount']!r}") from None
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValueError(f"invalid amount {row['Amount']!r}: must be a positive number")
+    date = row["Date"].strip()
+    try:
+        return Expense(amount, cat_id, row["Description"], user_id, date, expense_id=0)
+    except ValueError:
+        # Spreadsheets often drop the zero padding (2025-4-1); slower, but only for those rows
+        try:
+            date = datetime.datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"invalid date {row['Date']!r}") from None
+        return Expense(amount, cat_id, row["Description"], user_id, date, expense_id=0)
+
+
+class CsvImport:
+    """
+    Imports a CSV export of expenses without holding the file in memory. A worker thread
+    reads and validates rows and hands over chunks of ready records; the caller commits
+    them with take() (e.g. on the Tk thread, which owns the ExpenseStore), so every chunk
+    is one save. Progress, row errors and cancellation are available while it runs.
+
+    `existing` is {fingerprint: count} of the user's expenses (ExpenseStore.fingerprints().counts()).
+    A row is a duplicate if the file repeats its fingerprint no more often than the user
+    already has it, so re-importing an export matches every row, while two identical
+    coffees in a new file are both imported. `duplicates` is one of DUPLICATE_POLICIES.
+    """
+
+    def __init__(self, path, user_id, chunk_size=None, existing=None, duplicates="skip"):
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"duplicates must be one of {DUPLICATE_POLICIES}, not {duplicates!r}")
+        self.path = path
+        self.user_id = user_id
+        self.chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+        self.existing = existing or {}
+        self.policy = duplicates
+        self.rows = 0          # data rows read so far
+        self.imported = 0      # rows committed through take()
+        self.failed = 0        # rows rejected
+        self.duplicates = 0    # rows matching an existing expense (skipped or flagged)
+        self.errors = []       # (line number, message), the first MAX_ROW_ERRORS of them
+        self.duplicate_lines = []  # (line number, description), the first MAX_ROW_ERRORS duplicates
+        self.error = None      # what stopped the import early, if anything
+        self.bytes_read = 0
+        self.size = os.path.getsize(path)
+        self._chunks = queue.Queue(MAX_QUEUED_CHUNKS)
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="csv-import", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stops reading; chunks not yet taken are dropped, those already taken stay imported."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        """True once the reader has stopped and every chunk it produced was taken (or dropped by cancel)."""
+        return self._done.is_set() and (self.cancelled or self._chunks.empty())
+
+    def progress(self):
+        """Fraction of the file read, from 0 to 1."""
+        return self.bytes_read / self.size if self.size else 1.0
+
+    def take(self, commit):
+        """Calls `commit(records)` for every chunk parsed so far. Returns the number of records committed."""
+        committed = 0
+        while not self.cancelled:
+            try:
+                records = self._chunks.get_nowait()
+            except queue.Empty:
+                break
+            commit(records)
+            self.imported += len(records)
+            committed += len(records)
+        return committed
+
+    # ------------------------------------------------------------------ worker
+
+    def _lines(self, f):
+        """The file's lines as text, counting bytes for progress (tell() is unavailable while csv reads)."""
+        for number, raw in enumerate(f):
+            self.bytes_read += len(raw)
+            yield raw.decode("utf-8-sig" if number == 0 else "utf-8")
+
+    def _put(self, records):
+        while not self.cancelled:
+            try:
+                self._chunks.put(records, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _reject(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ROW_ERRORS:
+            self.errors.append((line, message))
+            logging.warning(f"[User {self.user_id}] CSV import, line {line}: {message}")
+
+    def _duplicate(self, line, record):
+        self.duplicates += 1
+        if len(self.duplicate_lines) < MAX_ROW_ERRORS:
+            self.duplicate_lines.append((line, f"{record['date']} {record['amount']:.2f} {record['description']}"))
+
+    def _run(self):
+        try:
+            with open(self.path, "rb") as f:
+                reader = csv.DictReader(self._lines(f))
+                missing = [column for column in COLUMNS if column not in (reader.fieldnames or ())]
+                if missing:
+                    raise ValueError(f"The file has no {', '.join(missing)} column.")
+                chunk = []
+                seen = {}  # fingerprint -> times it occurred in this file so far
+                for row in reader:
+                    if self.cancelled:
+                        break
+                    self.rows += 1
+                    try:
+                        record = parse_row(row, self.user_id)
+                    except ValueError as e:
+                        self._reject(reader.line_num, str(e))
+                        continue
+                    key = fingerprint(record)
+                    seen[key] = seen.get(key, 0) + 1
+                    if seen[key] <= self.existing.get(key, 0):
+                        self._duplicate(reader.line_num, record)
+                        if self.policy == "skip":
+                            continue
+                    chunk.append(record)
+                    if len(chunk) >= self.chunk_size:
+                        self._put(self._records(chunk))
+                        chunk = []
+                if chunk and not self.cancelled:
+                    self._put(self._records(chunk))
+        except Exception as e:
+            self.error = e
+            logging.error(f"[User {self.user_id}] CSV import of {self.path} stopped: {e}")
+        finally:
+            self._done.set()
+
+    def _records(self, records):
+        """Assigns ids to a chunk in one reservation."""
+        first = reserve_expense_ids(self.user_id, len(records))
+        for offset, record in enumerate(records):
+            record["expense_id"] = first + offset
+        return records
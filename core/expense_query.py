@@ -0,0 +1,148 @@
+# expense_query.py - Filtered, Sorted and Paginated Queries over a User's Expenses
+import calendar
+import datetime
+import heapq
+from itertools import islice
+from core.categories import category_id, category_name, category_names
+from core.indexes import date_ordinal, tokenize
+
+# Fields results can be ordered by; prefix with "-" for descending order.
+ORDER_FIELDS = ("date", "amount", "category", "description")
+PAGE_SIZE = 50
+
+
+def _bound(value, last):
+    """
+    Turns a date bound into a day ordinal. Strings may be YYYY, YYYY-MM or YYYY-MM-DD;
+    a partial date covers its whole year/month, so `last` picks its final day.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    try:
+        parts = [int(p) for p in str(value).strip().split("-")]
+        if len(parts) > 3 or not 1000 <= parts[0] <= 9999:
+            raise ValueError
+        year, month = parts[0], parts[1] if len(parts) > 1 else (12 if last else 1)
+        day = parts[2] if len(parts) > 2 else (calendar.monthrange(year, month)[1] if last else 1)
+        return datetime.date(year, month, day).toordinal()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r}. Use YYYY, YYYY-MM or YYYY-MM-DD.") from None
+
+
+class ExpenseQuery:
+    """
+    A lazily evaluated query over an ExpenseStore. Date ranges are located in the store's
+    date index by binary search and only the expenses in range are read; nothing is
+    materialized until results are iterated, paged or counted, and then only as far as needed.
+    Each evaluation reads the store as it is at that moment.
+    """
+
+    def __init__(self, store, date_from=None, date_to=None, categories=None, min_amount=None,
+                 max_amount=None, text=None, order_by="date", limit=None, offset=0):
+        field = order_by.lstrip("-")
+        if field not in ORDER_FIELDS:
+            raise ValueError(f"Cannot order expenses by {order_by!r}; choose from {', '.join(ORDER_FIELDS)}.")
+        self.store = store
+        self.first = _bound(date_from, last=False)
+        self.last = _bound(date_to, last=True)
+        # Names are turned into ids once, so matching never resolves a name per expense
+        self.categories = {category_id(name) for name in categories} if categories is not None else None
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.text = text if text and tokenize(text) else None
+        self.order_field = field
+        self.descending = order_by.startswith("-")
+        self.limit = limit
+        self.offset = offset
+
+    def _filtered(self):
+        """True if anything beyond the date range narrows the results."""
+        return (self.categories is not None or self.min_amount is not None
+                or self.max_amount is not None or self.text is not None)
+
+    def _matches(self, exp):
+        if self.categories is not None and exp["category_id"] not in self.categories:
+            return False
+        if self.min_amount is not None and exp["amount"] < self.min_amount:
+            return False
+        if self.max_amount is not None and exp["amount"] > self.max_amount:
+            return False
+        return True
+
+    def _in_date_order(self):
+        """
+        Expenses in range, in date order (newest first when descending). Without a text
+        search they are read straight off the date index; with one, the text index's
+        hits are sorted by date if they are few compared to the expenses in the range.
+        """
+        records, by_date, generation = self.store.snapshot()
+        start, stop = by_date.span(self.first, self.last)
+        hits = self.store.by_text.search(self.text, category_names()) if self.text is not None else None
+        # Sorting a hit costs far more than skipping a date-index entry, hence the factor
+        if hits is not None and len(hits) * 8 < stop - start:
+            keys = []
+            for expense_id in hits:
+                ordinal = date_ordinal(records[expense_id]["date"])
+                if (self.first is None or ordinal >= self.first) and (self.last is None or ordinal <= self.last):
+                    keys.append((ordinal, expense_id))
+            ids = (expense_id for _, expense_id in sorted(keys, reverse=self.descending))
+        else:
+            positions = range(stop - 1, start - 1, -1) if self.descending else range(start, stop)
+            ids = (by_date.expense_id_at(position) for position in positions)
+            if hits is not None:
+                ids = (expense_id for expense_id in ids if expense_id in hits)
+        for expense_id in ids:
+            if self.store.generation != generation:
+                raise RuntimeError("Expenses changed during query iteration.")
+            exp = records[expense_id]
+            if self._matches(exp):
+                yield exp
+
+    def _ordered(self, stop=None):
+        """Every match in the requested order; `stop` bounds how many are needed."""
+        if self.order_field == "date":
+            return self._in_date_order()
+        field, matches = self.order_field, self._in_date_order()
+        if field == "category":
+            key = lambda exp: category_name(exp["category_id"]).lower()
+        elif field == "description":
+            key = lambda exp: exp[field].lower()
+        else:
+            key = lambda exp: exp[field]
+        if stop is not None:
+            pick = heapq.nlargest if self.descending else heapq.nsmallest
+            return iter(pick(stop, matches, key=key))
+        return iter(sorted(matches, key=key, reverse=self.descending))
+
+    def _slice(self, start, stop):
+        start += self.offset
+        stop = None if stop is None else stop + self.offset
+        if self.limit is not None:
+            end = self.offset + self.limit
+            stop = end if stop is None else min(stop, end)
+        return islice(self._ordered(stop), start, stop)
+
+    def __iter__(self):
+        return self._slice(0, None)
+
+    def page(self, number, size=PAGE_SIZE):
+        """Page `number` (counting from 1) of `size` results, as a list."""
+        if number < 1:
+            raise ValueError("Page numbers start at 1.")
+        return list(self._slice((number - 1) * size, number * size))
+
+    def count(self):
+        """Number of results, honouring offset and limit. A pure date-range count is two binary searches."""
+        if self._filtered():
+            matched = sum(1 for _ in self._in_date_order())
+        else:
+            start, stop = self.store.snapshot()[1].span(self.first, self.last)
+            matched = stop - start
+        matched = max(0, matched - self.offset)
+        return matched if self.limit is None else min(matched, self.limit)
+
+    def total(self):
+        """Sum of the amounts of every result."""
+        return sum(exp["amount"] for exp in self)
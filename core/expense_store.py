@@ -0,0 +1,256 @@
+# expense_store.py - In-Memory Per-User Expense Store Keyed by expense_id
+import logging
+import threading
+from core.file_manager import (load_user_data, save_user_expenses, save_expense_changes, reserve_expense_ids,
+                               reserve_category_id, data_version, load_global, put_category)
+from core.analytics import ExpenseColumns
+from core.categories import assign_category_ids, category_name, record_usage
+from core.expense_query import ExpenseQuery
+from core.indexes import MonthIndex, DateIndex, TextIndex, AggregateIndex, FingerprintIndex, month_of
+from core.models import Expense
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(user_id):
+    """Returns the shared ExpenseStore for a user, so every view and tracker sees the same indexes."""
+    with _stores_lock:
+        store = _stores.get(str(user_id))
+        if store is None:
+            store = _stores[str(user_id)] = ExpenseStore(user_id)
+        return store
+
+
+class ExpenseStore:
+    """
+    Holds one user's expenses as an insertion-ordered expense_id -> record dict, so
+    lookups, edits and deletes never scan the history. Records are compact
+    core.models.Expense objects, built in bulk from the stored lists on load. Every change is saved through
+    file_manager as just the records it touched (see file_manager.save_expense_changes),
+    and the store reloads itself if the user's data changed elsewhere.
+    Indexes (see core.indexes) are kept in step with every change, and the running
+    totals are saved with the expenses so a reload does not have to recompute them.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._records = {}
+        self._version = None
+        self.generation = 0  # bumped on every change, so running queries can tell
+        self.by_month = MonthIndex()
+        self.by_date = DateIndex()
+        self.by_text = TextIndex()
+        self.aggregates = AggregateIndex()
+        self.by_fingerprint = None  # built by fingerprints() when first needed
+        self.indexes = [self.by_month, self.by_date, self.by_text, self.aggregates]
+        self._columns = (None, None)  # (generation, ExpenseColumns)
+
+    def _load(self):
+        version = data_version(self.user_id)
+        content = load_user_data(self.user_id, readonly=True)
+        expenses = content["expenses"]
+        records = {}
+        renumbered = []
+        # Expenses saved before categories were referenced by id (see categories.migrate_category_refs)
+        legacy = [exp for exp in expenses if "category_id" not in exp]
+        if legacy:
+            expenses = [dict(exp) for exp in expenses]
+            legacy = [exp for exp in expenses if "category_id" not in exp]
+            categories = dict(load_global(readonly=True).get("categories", {}))
+            for record in assign_category_ids(legacy, categories, reserve_category_id):
+                put_category(record)
+        for exp in Expense.from_lists(expenses):
+            if exp.get("expense_id") in records:
+                # Ids handed out by the old shared counter could collide; keep both records
+                exp["expense_id"] = reserve_expense_ids(self.user_id)
+                renumbered.append(exp["expense_id"])
+            records[exp["expense_id"]] = exp
+        self._records = records
+        self._version = version
+        self.generation += 1
+        self.by_month.rebuild(records.values())
+        self.by_date.rebuild(records.values())
+        self.by_text.rebuild(records.values())
+        if self.by_fingerprint is not None:
+            self.by_fingerprint.rebuild(records.values())
+        self.aggregates.load(content["totals"])
+        if renumbered or legacy or self.aggregates.count != len(records):
+            self.aggregates.rebuild(records.values())
+        record_usage(self.user_id, self.aggregates.category_counts())
+        if renumbered:
+            logging.warning(f"[User {self.user_id}] duplicate expense ids found; renumbered as {renumbered}.")
+        if legacy:
+            logging.info(f"[User {self.user_id}] {len(legacy)} expenses moved to category ids.")
+        if renumbered or legacy:
+            self._save()
+
+    def _fresh(self):
+        if self._version != data_version(self.user_id):
+            self._load()
+        return self._records
+
+    def _save(self, put=None, delete=(), months=()):
+        """
+        Saves the changed records `put` and removed ids `delete` with the totals of the months
+        they touched; with no changes given, every expense and total is saved.
+        """
+        if put is None and not delete:
+            saved = save_user_expenses(self.user_id, self._records.values(), self.aggregates.dump())
+        else:
+            saved = save_expense_changes(self.user_id, put or (), delete, self.aggregates.dump(set(months)))
+        if not saved:
+            self._version = None  # reload what is really stored on next access
+            raise IOError(f"Could not save expenses for user {self.user_id}.")
+        self._version = data_version(self.user_id)
+        record_usage(self.user_id, self.aggregates.category_counts())
+
+    def __len__(self):
+        return len(self._fresh())
+
+    def __iter__(self):
+        return iter(list(self._fresh().values()))
+
+    def __contains__(self, expense_id):
+        return expense_id in self._fresh()
+
+    def get(self, expense_id):
+        """Returns the expense with this id, or None."""
+        return self._fresh().get(expense_id)
+
+    def records(self):
+        """All expenses in insertion order."""
+        return list(self._fresh().values())
+
+    def add(self, record):
+        """Adds an expense (its expense_id must come from reserve_expense_ids) and saves."""
+        self.add_many([record])
+
+    def add_many(self, records):
+        """Adds several expenses (Expense objects, or dicts in the stored layout) with a single save."""
+        store = self._fresh()
+        records = [record if isinstance(record, Expense) else Expense.from_lists([record])[0]
+                   for record in records]
+        added = {}
+        months = set()
+        for record in records:
+            old = store.get(record["expense_id"])
+            store[record["expense_id"]] = record
+            if old is not None and record["expense_id"] not in added:
+                for index in self.indexes:
+                    index.remove(old)
+                months.add(month_of(old))
+            added[record["expense_id"]] = record
+            months.add(month_of(record))
+        self.generation += 1
+        for index in self.indexes:
+            index.add_many(added.values())
+        self._save(list(added.values()), months=months)
+
+    def update(self, expense_id, **changes):
+        """Changes fields of one expense and saves. Returns the updated record, or None if not found."""
+        record = self._fresh().get(expense_id)
+        if record is None:
+            return None
+        old = dict(record)
+        record.update(changes)
+        self.generation += 1
+        for index in self.indexes:
+            index.update(old, record)
+        self._save([record], months={month_of(old), month_of(record)})
+        return record
+
+    def remove(self, expense_id):
+        """Deletes one expense and saves. Returns the removed record, or None if not found."""
+        record = self._fresh().pop(expense_id, None)
+        if record is not None:
+            self.generation += 1
+            for index in self.indexes:
+                index.remove(record)
+            self._save(delete=[expense_id], months=[month_of(record)])
+        return record
+
+    def snapshot(self):
+        """(records by id, date index, generation) as of now, for ExpenseQuery."""
+        records = self._fresh()
+        return records, self.by_date, self.generation
+
+    def query(self, date_from=None, date_to=None, categories=None, min_amount=None, max_amount=None,
+              text=None, order_by="date", limit=None, offset=0):
+        """
+        Returns a lazy ExpenseQuery over this user's expenses. Dates are inclusive and may be
+        YYYY, YYYY-MM or YYYY-MM-DD strings or date objects; `categories` is a collection of names;
+        `text` is answered from the text index: each of its words must start a word of the
+        description or category, ignoring case; `order_by` is one of
+        core.expense_query.ORDER_FIELDS, prefixed with "-" for descending.
+        """
+        return ExpenseQuery(self, date_from, date_to, categories, min_amount, max_amount,
+                            text, order_by, limit, offset)
+
+    def analytics(self):
+        """The expenses as core.analytics columns, rebuilt only after they change."""
+        self._fresh()
+        if self._columns[0] != self.generation:
+            self._columns = (self.generation, ExpenseColumns.from_records(self._records.values()))
+        return self._columns[1]
+
+    def fingerprints(self):
+        """
+        The FingerprintIndex used to spot duplicates (e.g. when a CSV is imported twice). It is
+        built on first use and kept in step with every change from then on.
+        """
+        records = self._fresh()
+        if self.by_fingerprint is None:
+            self.by_fingerprint = FingerprintIndex()
+            self.by_fingerprint.rebuild(records.values())
+            self.indexes.append(self.by_fingerprint)
+        return self.by_fingerprint
+
+    def verify_aggregates(self):
+        """True if the stored totals match the expenses they summarize."""
+        self._fresh()
+        rebuilt = AggregateIndex()
+        rebuilt.rebuild(self._records.values())
+        stored = AggregateIndex()
+        stored.load(load_user_data(self.user_id, readonly=True)["totals"])
+        return rebuilt.matches(stored)
+
+    def rebuild_aggregates(self):
+        """Recomputes the totals from the expenses and saves them."""
+        self.aggregates.rebuild(self._fresh().values())
+        self._save()
+
+    # ------------------------------------------------------------------ summaries
+
+    def month_expenses(self, month):
+        """Expenses whose date starts with `month`; a YYYY-MM month is answered from the index."""
+        records = self._fresh()
+        if len(month) == 7:
+            return self.by_month.expenses(month)
+        return [exp for exp in records.values() if exp["date"].startswith(month)]
+
+    def months(self):
+        """Months (YYYY-MM) with at least one expense, oldest first."""
+        self._fresh()
+        return self.by_month.months()
+
+    def month_total(self, month):
+        self._fresh()
+        return self.aggregates.month_total(month)
+
+    def category_totals(self, month=None):
+        """{category name: total} for `month`, or for every expense if `month` is None."""
+        records = self._fresh()
+        if month is None or len(month) == 7:
+            totals = self.aggregates.category_totals(month)
+        else:
+            totals = {}
+            for exp in records.values():
+                if exp["date"].startswith(month):
+                    totals[exp["category_id"]] = totals.get(exp["category_id"], 0) + exp["amount"]
+        return {category_name(cid): total for cid, total in totals.items()}
+
+    def grand_total(self):
+        """Total amount of all the user's expenses."""
+        self._fresh()
+        return self.aggregates.total
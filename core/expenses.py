@@ -1,26 +1,20 @@
 import logging
-from core.file_manager import load_data, save_data
+from core.file_manager import load_global, load_user_data, put_budget, reserve_expense_ids
+from core.expense_store import get_store
+from core.categories import category_name
 from core.models import Expense
-import itertools
 import datetime
 import re
 class ExpenseTracker:
-    expense_id_counter = itertools.count(1)  # Ensures unique expense IDs
-
     def __init__(self, user):
         """Initializes expense tracking for a user."""
         self.user = user
-        data = load_data()
-        user_expenses = data.get("expenses", {}).get(str(user.user_id), [])
-        if user_expenses:
-            max_existing_id = max(exp.get("expense_id", 0) for exp in user_expenses)
-            ExpenseTracker.expense_id_counter = itertools.count(max_existing_id + 1)
+        self.expenses = get_store(user.user_id)  # id -> record, loaded on first use
 
     def add_expense(self):
         """Prompts the user to select a category and adds an expense."""
-        data = load_data()
         categories = {int(k): v["name"] for k, v in
-                      data.get("categories", {}).items()}  # Ensure category IDs are integers
+                      load_global(readonly=True).get("categories", {}).items()}  # Ensure category IDs are integers
 
         if not categories:
             print("[!] No categories available. Please ask the admin to create categories first.")
@@ -35,7 +29,6 @@ class ExpenseTracker:
                 category_id = int(input("Select category ID: ").strip())
                 if category_id not in categories:
                     raise ValueError("Invalid category ID.")
-                category_name = categories[category_id]
                 break
             except ValueError as e:
                 logging.warning(f"Invalid category input: {e}")
@@ -74,37 +67,37 @@ class ExpenseTracker:
                 print("[!] Invalid date format. Please enter in YYYY-MM-DD format.")
                 logging.warning(f"[User {self.user.user_id}] Entered invalid date: {date}")
 
-        expense_id = next(ExpenseTracker.expense_id_counter)  # Assign unique ID
-        expense = Expense(amount, category_name, description, self.user.user_id, date, expense_id)
+        expense_id = reserve_expense_ids(self.user.user_id)  # Assign unique ID
+        expense = Expense(amount, category_id, description, self.user.user_id, date, expense_id)
 
-        if str(self.user.user_id) not in data["expenses"]:
-            data["expenses"][str(self.user.user_id)] = []
-        data["expenses"][str(self.user.user_id)].append(vars(expense))
-        save_data(data)
+        self.expenses.add(expense)
         logging.info(
             f"Expense added: {expense.amount}, {expense.category}, {expense.description}, {expense.date}, ID: {expense.expense_id} by user {self.user.user_id}."
         )
         print(f"[+] Expense added successfully with ID: {expense.expense_id}.")
 
 
-    def list_expenses(self):
-        """Lists all expenses for the user."""
-        data = load_data()
-        user_expenses = data["expenses"].get(str(self.user.user_id), [])
-        if not user_expenses:
+    def query(self, date_from=None, date_to=None, categories=None, min_amount=None, max_amount=None,
+              text=None, order_by="date", limit=None, offset=0):
+        """Filters, sorts and pages the user's expenses lazily; see ExpenseStore.query."""
+        return self.expenses.query(date_from, date_to, categories, min_amount, max_amount,
+                                   text, order_by, limit, offset)
+
+    def list_expenses(self, date_from=None, date_to=None):
+        """Lists the user's expenses, oldest first, optionally within a date range."""
+        results = self.query(date_from, date_to)
+        if not results.count():
             print("[i] No expenses recorded yet.")
             return
         print("\n------ Expense List ------")
-        for exp in user_expenses:
+        for exp in results:
             print(
-                f"ID: {exp['expense_id']} | {exp['date']} - {exp['category']}: {exp['amount']:.2f} ({exp['description']})")
+                f"ID: {exp['expense_id']} | {exp['date']} - {category_name(exp['category_id'])}: {exp['amount']:.2f} ({exp['description']})")
 
     def view_summary(self):
         """Displays a summary of the user's expenses."""
-        data = load_data()
-        user_expenses = data["expenses"].get(str(self.user.user_id), [])
-        total_expenses = sum(exp["amount"] for exp in user_expenses)
-        budget_data = data.get("budgets", {}).get(str(self.user.user_id), {})
+        total_expenses = self.expenses.grand_total()
+        budget_data = load_user_data(self.user.user_id, readonly=True)["budgets"]
         current_month = datetime.datetime.now().strftime("%Y-%m")
         budget = budget_data.get(current_month, None)
 
@@ -123,19 +116,22 @@ class ExpenseTracker:
             print(f"[i] No budget set for {current_month}.")
 
         print("\nExpenses by Category:")
-        category_totals = {}
-        for exp in user_expenses:
-            category_totals[exp["category"]] = category_totals.get(exp["category"], 0) + exp["amount"]
-        for cat, amt in category_totals.items():
+        for cat, amt in self.expenses.category_totals().items():
             print(f"  {cat:<20}: {amt:.2f}")
 
+        stats = self.expenses.analytics()
+        typical = stats.percentiles((50, 90))
+        if typical:
+            print(f"\nTypical expense: {typical[50]:.2f} (90% are under {typical[90]:.2f})")
+            print("\nExpenses by Weekday:")
+            for day, amt in stats.by_weekday().items():
+                print(f"  {day:<20}: {amt:.2f}")
+
     def set_budget(self, period, amount):
         """Sets a budget for the user."""
-        data = load_data()
-        if str(self.user.user_id) not in data["budgets"]:
-            data["budgets"][str(self.user.user_id)] = {}
-        data["budgets"][str(self.user.user_id)][period] = amount
-        save_data(data)
+        if not put_budget(self.user.user_id, period, amount):
+            print("[!] The budget could not be saved.")
+            return
         logging.info(f"Budget set for {period}: {amount} by user {self.user.user_id}.")
         print(f"[+] Budget set for {period}: {amount:.2f}")
 
@@ -149,26 +145,21 @@ class ExpenseTracker:
             logging.warning(f"[User {self.user.user_id}] Entered non-integer Expense ID for editing.")
             return
 
-        data = load_data()
-        user_expenses = data["expenses"].get(str(self.user.user_id), [])
-        for expense in user_expenses:
-            if expense["expense_id"] == expense_id:
+        if expense_id in self.expenses:
+            try:
+                new_amount = float(input("Enter new amount: ").strip())
+                new_description = input("Enter new description: ").strip()
                 try:
-                    new_amount = float(input("Enter new amount: ").strip())
-                    new_description = input("Enter new description: ").strip()
-                    expense["amount"] = new_amount
-                    expense["description"] = new_description
-                    try:
-                        save_data(data)
-                    except Exception as e:
-                        logging.error(f"Failed to save updated expenses: {e}")
-                        print("[!] Failed to save changes. Please try again.")
-
-                    print("[+] Expense updated successfully.")
-                    return
-                except ValueError:
-                    print("[!] Invalid input.")
-                    return
+                    self.expenses.update(expense_id, amount=new_amount, description=new_description)
+                except Exception as e:
+                    logging.error(f"Failed to save updated expenses: {e}")
+                    print("[!] Failed to save changes. Please try again.")
+
+                print("[+] Expense updated successfully.")
+                return
+            except ValueError:
+                print("[!] Invalid input.")
+                return
         print("[!] Expense ID not found.")
         logging.warning(f"[User {self.user.user_id}] Tried editing non-existent Expense ID: {expense_id}")
 
@@ -182,17 +173,13 @@ class ExpenseTracker:
             logging.warning(f"[User {self.user.user_id}] Entered invalid Expense ID for deletion.")
             return
 
-        data = load_data()
-        user_expenses = data["expenses"].get(str(self.user.user_id), [])
-        updated_expenses = [exp for exp in user_expenses if exp["expense_id"] != expense_id]
-        if len(updated_expenses) == len(user_expenses):
+        if expense_id not in self.expenses:
             print("[!] Expense ID not found.")
             logging.warning(f"[User {self.user.user_id}] Tried deleting non-existent Expense ID: {expense_id}")
             return
 
-        data["expenses"][str(self.user.user_id)] = updated_expenses
         try:
-            save_data(data)
+            self.expenses.remove(expense_id)
         except Exception as e:
             logging.error(f"Failed to save updated expenses: {e}")
             print("[!] Failed to save changes. Please try again.")
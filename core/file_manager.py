@@ -1,49 +1,1052 @@
 # file_manager.py - Handles File-Based I/O with User-Specific Storage & Logging
+import atexit
+import datetime
 import json
 import os
+import shutil
 import logging
-from hashlib import sha256
+import threading
+from core import codec
+from core.atomic import atomic_write_json
+from core.journal import Journal, apply_records, diff_data
+from core.passwords import hash_password, verify_password  # re-exported for existing callers
+from core.readonly import freeze
+from core.shards import ShardedStore, USER_SECTIONS, empty_user_content
+from core.sqlite_store import SQLiteStore
+from core.writer import BackgroundWriter
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_FILE = os.path.join(BASE_DIR, 'data', 'data.json')
 LOG_FILE = os.path.join(BASE_DIR, 'data', 'app.log')
+JOURNAL_FILE = os.path.join(BASE_DIR, 'data', 'data.journal')
+SHARD_DIR = os.path.join(BASE_DIR, 'data', 'shards')
+DB_FILE = os.path.join(BASE_DIR, 'data', 'chaching.db')
+
+# Storage mode: "json" rewrites data.json on every save, "journal" appends
+# small change records to data.journal and periodically checkpoints, "sharded"
+# keeps users/categories in shards/global.json and one file per user, "sqlite"
+# stores everything in chaching.db with indexed expense queries.
+STORAGE_MODES = ("json", "journal", "sharded", "sqlite")
+STORAGE_MODE = os.environ.get("CHACHING_STORAGE", "json")
+# Number of journal records after which the snapshot is rewritten and the journal truncated.
+CHECKPOINT_INTERVAL = 1000
+# Group commit: seconds to hold back whole-document saves so a burst of saves (CSV import,
+# category renames, quick edits) becomes one durable write. 0 writes every save through.
+GROUP_COMMIT_WINDOW = float(os.environ.get("CHACHING_GROUP_COMMIT", "0"))
+
+_journal = Journal(JOURNAL_FILE)
+_shards = ShardedStore(SHARD_DIR)
+_sqlite = SQLiteStore(DB_FILE)
+
+# Parsed data shared by every load_data() caller, validated against the file's stat.
+# In journal mode it also serves as the last state known to be on disk. "disk" is the
+# stamp of the files as this process last read or wrote them, so a save by another
+# process can be told apart from our own (see _check_disk).
+_cache = {"stamp": None, "data": None, "disk": None}
+# _lock guards the in-memory state and is never held while waiting for a disk write;
+# _write_lock serializes the writes themselves and is always taken before _lock.
+_lock = threading.RLock()
+_write_lock = threading.RLock()
+# While saves are held back, "base" is the state last written to disk and the cache holds
+# the newer data; "inflight" is the state a flush is currently writing. "records" are the
+# change records that turn "base" into the cache, or None if some save was not given as records.
+_pending = {"base": None, "inflight": None, "timer": None, "records": None}
+# Per-user and global saves queued on the background writer (sharded/sqlite modes),
+# served to readers until they are on disk. "records" holds per-user change records queued
+# in sqlite mode, applied over the user's rows when read. "epoch" moves on whole-document
+# saves, which supersede every queued per-user/global write.
+_overlay = {"users": {}, "global": None, "records": {}, "epoch": 0}
+_writer = None
+# Highest expense_id handed out per user in this process, saved or not
+_reserved_ids = {}
+# Highest category_id handed out in this process, saved or not
+_reserved_category = {"id": 0}
+# Change counters that let in-memory views (e.g. ExpenseStore) tell whether they are stale:
+# "all" moves on whole-document saves, cache invalidation and saves by another process,
+# "users" on per-user saves,
+# "global" on saves of the global sections (users, categories).
+_versions = {"all": 0, "users": {}, "global": 0}
 
 # Ensure data file exists
 if not os.path.exists(DATA_FILE):
     with open(DATA_FILE, "w") as f:
         json.dump({"users": [], "expenses": {}, "categories": {}, "budgets": {}}, f)
 
-def load_data():
-    """Loads data from the JSON file. Logs if an error occurs."""
+
+def set_storage_mode(mode, carry_over=True):
+    """
+    Switches the storage mode. With `carry_over` the current state moves along:
+    pending journal records are checkpointed and data.json, the shards and the
+    database are kept in step. At startup pass carry_over=False (also for the mode
+    already set) so an existing store is used as-is: it is only migrated from data.json
+    if it doesn't exist yet, or if data.json was saved after it (see _adopt_newer_snapshot).
+    """
+    global STORAGE_MODE
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode: {mode}")
+    if _writer is not None:
+        _writer.wait()
+    with _write_lock, _lock:
+        if mode == STORAGE_MODE and carry_over:
+            return
+        flush()
+        if not carry_over:
+            STORAGE_MODE = mode
+            _adopt_newer_snapshot()
+            invalidate_cache()
+            return
+        if STORAGE_MODE == "journal":
+            checkpoint()
+        elif STORAGE_MODE == "sharded":
+            _write_snapshot(_shards.load_all())
+        elif STORAGE_MODE == "sqlite":
+            _write_snapshot(_sqlite.load_all())
+        if mode == "sharded":
+            migrate_to_shards()
+        elif mode == "sqlite":
+            migrate_to_sqlite()
+        STORAGE_MODE = mode
+        invalidate_cache()
+
+
+def migrate_to_shards(data=None):
+    """One-shot migration of the monolithic data.json (or `data`) into per-user shard files."""
+    with _write_lock, _lock:
+        _shards.migrate(_read_snapshot() if data is None else data)
+        invalidate_cache()
+
+
+def migrate_to_sqlite(data=None):
+    """One-shot migration of the monolithic data.json (or `data`) into the SQLite database."""
+    from core.categories import assign_category_ids  # imports this module
+    with _write_lock, _lock:
+        data = _read_snapshot() if data is None else data
+        # The expenses table needs category ids; data.json may predate them
+        for exps in data.get("expenses", {}).values():
+            assign_category_ids(exps, data.setdefault("categories", {}))
+        _sqlite.migrate(data)
+        invalidate_cache()
+
+
+def _modified(paths):
+    """Latest mtime (ns) among `paths`, 0 if none of them exists."""
+    latest = 0
+    for path in paths:
+        try:
+            latest = max(latest, os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            pass
+    return latest
+
+
+def _adopt_newer_snapshot():
+    """
+    In sharded/sqlite mode, migrates data.json (with its journal) into the existing store
+    if it was saved after the store, e.g. by a run in json or journal mode. The store is
+    copied aside first, so whatever only it held can still be recovered.
+    """
+    if STORAGE_MODE == "sharded" and _shards.exists():
+        stored = _modified(os.path.join(SHARD_DIR, name) for name in os.listdir(SHARD_DIR))
+    elif STORAGE_MODE == "sqlite" and _sqlite.exists():
+        stored = _modified([DB_FILE])
+    else:
+        return  # json/journal, or a store that is migrated when first used
+    if _modified([DATA_FILE, _journal.path]) <= stored:
+        return
+    data = _journal.replay(_read_snapshot())
+    if not data.get("users"):
+        logging.warning(f"{DATA_FILE} is newer than the {STORAGE_MODE} store but holds no users; store kept.")
+        return
+    if _journal.record_count:
+        # Folded first, so the store ends up newer than data.json and is not migrated again
+        _write_snapshot(data)
+        _journal.reset()
+    suffix = datetime.datetime.now().strftime(".%Y%m%d-%H%M%S.bak")
+    if STORAGE_MODE == "sharded":
+        backup = SHARD_DIR + suffix
+        shutil.copytree(SHARD_DIR, backup)
+        migrate_to_shards(data)
+    else:
+        backup = DB_FILE + suffix
+        _sqlite.close()
+        shutil.copy2(DB_FILE, backup)
+        migrate_to_sqlite(data)
+    logging.warning(f"{DATA_FILE} was saved after the {STORAGE_MODE} store, so it was migrated into it; "
+                    f"the previous store is kept as {backup}.")
+
+
+def _ensure_shards():
+    if not _shards.exists():
+        migrate_to_shards()
+
+
+def _ensure_sqlite():
+    if not _sqlite.exists():
+        migrate_to_sqlite()
+    return _sqlite
+
+
+def sqlite_store(user_id=None):
+    """
+    Returns the SQLite store when it is the active backend and up to date for `user_id`
+    (for every user if None), otherwise None. Callers then answer from the in-memory data,
+    so a query never waits for queued writes.
+    """
+    with _lock:
+        if STORAGE_MODE != "sqlite" or _holding_back() or _overlay["global"] is not None:
+            return None
+        if user_id is None and (_overlay["users"] or _overlay["records"]):
+            return None
+        if str(user_id) in _overlay["users"] or str(user_id) in _overlay["records"]:
+            return None
+        return _ensure_sqlite()
+
+
+def data_paths():
+    """The files the stores live in, e.g. to point a worker process at them (see use_data_paths)."""
+    return {"data_file": DATA_FILE, "journal_file": _journal.path, "shard_dir": _shards.directory,
+            "db_file": DB_FILE}
+
+
+def use_data_paths(data_file, journal_file, shard_dir, db_file):
+    """Points every store at other files; anything held back is written to the old ones first."""
+    global DATA_FILE, JOURNAL_FILE, SHARD_DIR, DB_FILE, _journal, _shards, _sqlite
+    if _writer is not None:
+        _writer.wait()
+    with _write_lock, _lock:
+        flush()
+        _sqlite.close()
+        DATA_FILE, JOURNAL_FILE, SHARD_DIR, DB_FILE = data_file, journal_file, shard_dir, db_file
+        _journal = Journal(journal_file)
+        _shards = ShardedStore(shard_dir)
+        _sqlite = SQLiteStore(db_file)
+        _reserved_ids.clear()
+        _reserved_category["id"] = 0
+        invalidate_cache()
+
+
+def start_background_writer():
+    """
+    Moves every save onto a dedicated writer thread (write-behind): saves return at once,
+    readers see the new data immediately and the writes reach disk in order.
+    """
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = BackgroundWriter()
+        _writer.start()
+
+
+def shutdown_background_writer(timeout=None):
+    """
+    Waits for queued writes, stops the writer and flushes anything held back.
+    Returns False if not everything reached disk within `timeout`; the writer then keeps retrying.
+    """
+    global _writer
+    if _writer is not None:
+        if not _writer.stop(timeout):
+            return False
+        with _lock:
+            _writer = None
+    return flush()
+
+
+def sync(timeout=None):
+    """
+    Blocks until every save made so far is on disk, including those queued on the background
+    writer, e.g. before another process reads the files. Returns False if that did not
+    happen within `timeout` or a write failed.
+    """
+    writer = _writer
+    if writer is not None and not writer.wait(timeout):
+        return False
+    return flush()
+
+
+def write_status():
+    """Returns (number of saves not yet on disk, last write error or None) for the UI."""
+    with _lock:
+        held_back = 1 if _holding_back() else 0
+        writer = _writer
+    if writer is None:
+        return held_back, None
+    return max(writer.pending(), held_back), writer.last_error
+
+
+def _submit(task, coalesce_key=None):
+    """Runs a write on the background writer if there is one, otherwise right away."""
+    if _writer is not None:
+        _writer.submit(task, coalesce_key)
+    else:
+        task()
+
+
+def _empty_data():
+    return {"users": [], "expenses": {}, "categories": {}, "budgets": {}}
+
+
+def _file_stamp(path):
     try:
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _current_stamp():
+    """Identifies the on-disk state by mtime/size/inode of every file it is built from."""
+    if STORAGE_MODE == "journal":
+        return _file_stamp(DATA_FILE), _file_stamp(_journal.path)
+    if STORAGE_MODE == "sharded":
+        _ensure_shards()
+        return _shards.stamp()
+    if STORAGE_MODE == "sqlite":
+        _ensure_sqlite()
+        return _file_stamp(DB_FILE),
+    return _file_stamp(DATA_FILE),
+
+
+def _copy_data(data):
+    """
+    Copies the data structure for a caller that may mutate it.
+    Records are flat dicts, so a per-record dict() copy is enough and much cheaper than deepcopy.
+    """
+    copied = {}
+    for key, value in data.items():
+        if key == "users":
+            copied[key] = [dict(u) for u in value]
+        elif key == "expenses":
+            copied[key] = {uid: [dict(e) for e in exps] for uid, exps in value.items()}
+        elif key in ("categories", "budgets"):
+            copied[key] = {k: dict(v) for k, v in value.items()}
+        elif key == "expense_seq":
+            copied[key] = dict(value)
+        elif key == "totals":
+            copied[key] = {uid: _copy_totals(totals) for uid, totals in value.items()}
+        else:
+            copied[key] = json.loads(json.dumps(value))
+    return copied
+
+
+def _copy_totals(totals):
+    return {month: {category: list(cell) for category, cell in cells.items()} for month, cells in totals.items()}
+
+
+def _drop_stale_totals(data, current):
+    """
+    Stored totals are only trusted when saved together with the expenses they were computed
+    from (see ExpenseStore). Drops those of users whose expenses differ from `current`,
+    so they are recomputed on next load.
+    """
+    totals = data.get("totals")
+    if not totals:
+        return
+    for uid in list(totals):
+        if data.get("expenses", {}).get(uid, []) != current.get("expenses", {}).get(uid, []):
+            del totals[uid]
+
+
+def _holding_back():
+    return _pending["base"] is not None or _pending["inflight"] is not None
+
+
+def invalidate_cache():
+    """Drops the cached data so the next load_data() re-reads from disk. Held-back saves are flushed first."""
+    with _write_lock, _lock:
+        if _pending["base"] is not None and not flush():
+            return
+        _cache["stamp"] = None
+        _cache["data"] = None
+        _versions["all"] += 1
+
+
+def _read_snapshot():
+    return codec.load_file(DATA_FILE)
+
+
+def _write_snapshot(data):
+    atomic_write_json(DATA_FILE, data)
+
+
+def _preserve_corrupt_file():
+    """Keeps a copy of an unreadable data file so a later save can't silently destroy it."""
+    backup = DATA_FILE + ".corrupt"
+    if os.path.exists(DATA_FILE) and not os.path.exists(backup):
+        shutil.copy2(DATA_FILE, backup)
+        logging.error(f"Unreadable data file preserved as {backup}.")
+
+
+def _cached_data():
+    """Returns the shared parsed data, re-reading it only if the files changed on disk."""
+    if _holding_back():
+        return _cache["data"]
+    stamp = _current_stamp()
+    if _cache["data"] is None or _cache["stamp"] != stamp:
+        if STORAGE_MODE == "journal":
+            data = _journal.replay(_read_snapshot())
+            # Skipped while a write is running; that write checkpoints the journal itself
+            if _journal.record_count >= CHECKPOINT_INTERVAL and _write_lock.acquire(blocking=False):
+                try:
+                    checkpoint(data)
+                finally:
+                    _write_lock.release()
+                return _cache["data"]
+        elif STORAGE_MODE == "sharded":
+            data = _shards.load_all()
+        elif STORAGE_MODE == "sqlite":
+            data = _sqlite.load_all()
+        else:
+            data = _read_snapshot()
+        _cache["data"] = data
+        _cache["stamp"] = _cache["disk"] = stamp
+    return _cache["data"]
+
+
+def _with_overlay(data):
+    """Layers per-user/global saves still queued on the writer over `data`, shallowly."""
+    if not _overlay["users"] and _overlay["global"] is None and not _overlay["records"]:
+        return data
+    if _overlay["global"] is not None:
+        data = {k: v for k, v in data.items() if k in USER_SECTIONS}
+        data.update(_overlay["global"])
+    else:
+        data = dict(data)
+    for section in USER_SECTIONS:
+        data[section] = dict(data.get(section, {}))
+    overlay = dict(_overlay["users"])
+    for uid, queued in _overlay["records"].items():
+        if uid not in overlay:
+            content = empty_user_content()
+            for section in USER_SECTIONS:
+                content[section] = data[section].get(uid, content[section])
+            overlay[uid] = _apply_user_records(content, uid, [record for batch in queued for record in batch])
+    for uid, content in overlay.items():
+        for section in USER_SECTIONS:
+            if content[section]:
+                data[section][uid] = content[section]
+            else:
+                data[section].pop(uid, None)
+    return data
+
+
+def load_data(readonly=False):
+    """
+    Loads data from the JSON file. Logs if an error occurs.
+    The parsed file is cached until it changes on disk; callers get their own copy,
+    or a cheap read-only view of the cache when `readonly` is True.
+    """
+    try:
+        with _lock:
+            data = _with_overlay(_cached_data())
+            return freeze(data) if readonly else _copy_data(data)
     except FileNotFoundError:
         logging.error("Data file not found. Returning empty structure.")
     except json.JSONDecodeError:
         logging.error("Data file is corrupted. Returning empty structure.")
+        _preserve_corrupt_file()
     except Exception as e:
         logging.exception("Unexpected error while loading data:")
-    return {"users": [], "expenses": {}, "categories": {}, "budgets": {}}
+    return _empty_data()
+
 
 def save_data(data):
     """Saves data to the JSON file. Logs success or failure."""
     try:
-        with open(DATA_FILE, "w") as f:
-            json.dump(data, f, indent=4)
+        with _lock:
+            owned = _copy_data(data)
+            _drop_stale_totals(owned, _with_overlay(_cached_data()))
+            if _reserved_ids:
+                seq = owned.setdefault("expense_seq", {})
+                for uid, last in _reserved_ids.items():
+                    if seq.get(uid, 0) < last:
+                        seq[uid] = last
+            if owned.get("category_seq", 0) < _reserved_category["id"]:
+                owned["category_seq"] = _reserved_category["id"]
+            _persist(owned)
+            # The whole document supersedes per-user/global saves still queued on the writer
+            _overlay["users"].clear()
+            _overlay["global"] = None
+            _overlay["records"].clear()
+            _overlay["epoch"] += 1
+            _versions["all"] += 1
         logging.info("Data saved successfully.")
     except IOError as e:
+        invalidate_cache()
         logging.error(f"I/O error while saving data: {e}")
     except Exception:
+        invalidate_cache()
         logging.exception("Unexpected error while saving data.")
 
 
-def hash_password(password):
-    """Encrypts the password using SHA-256."""
-    return sha256(password.encode()).hexdigest()
+def _persist(data, records=None):
+    """
+    Saves `data` with the active storage mode; the cache takes ownership of `data`.
+    `records`, if given, are the change records from the cached data to `data`, written
+    as they are instead of diffing the two.
+    With a group-commit window or the background writer the write is held back
+    and merged with any saves that follow before it reaches disk.
+    """
+    if _writer is None and GROUP_COMMIT_WINDOW <= 0:
+        _write(_cached_data(), data, records)
+        _cache["data"] = data
+        _cache["stamp"] = _cache["disk"] = _current_stamp()
+        return
+    if _pending["base"] is not None:
+        if _pending["records"] is not None and records is not None:
+            _pending["records"].extend(records)
+        else:
+            _pending["records"] = None
+    else:
+        _pending["base"] = _cached_data()
+        _pending["records"] = list(records) if records is not None else None
+        if GROUP_COMMIT_WINDOW > 0:
+            _pending["timer"] = threading.Timer(GROUP_COMMIT_WINDOW, _submit, (_flush, "flush"))
+            _pending["timer"].daemon = True
+            _pending["timer"].start()
+        else:
+            _submit(_flush, "flush")
+    _cache["data"] = data
+
+
+def _write(old, new, records=None):
+    """
+    Durably writes `new`, given that `old` is what is currently on disk and
+    `records` (if not None) the change records between them.
+    """
+    if STORAGE_MODE == "journal":
+        _journal.append(diff_data(old, new) if records is None else records)
+        if _journal.record_count >= CHECKPOINT_INTERVAL:
+            _write_snapshot(new)
+            _journal.reset()
+            logging.info("Journal checkpoint written.")
+    elif STORAGE_MODE == "sharded":
+        _ensure_shards()
+        _shards.save_all(new)
+    elif STORAGE_MODE == "sqlite":
+        if records is None:
+            _ensure_sqlite().save_all(old, new)
+        else:
+            _ensure_sqlite().apply(records)
+    else:
+        _write_snapshot(new)
+
+
+def _flush():
+    """Writes held-back saves, raising if that fails. Readers are not blocked while it writes."""
+    with _write_lock:
+        with _lock:
+            base = _pending["base"]
+            if base is None:
+                return
+            if _pending["timer"] is not None:
+                _pending["timer"].cancel()
+            new = _cache["data"]
+            records = _pending["records"]
+            _pending["base"] = _pending["timer"] = _pending["records"] = None
+            _pending["inflight"] = new
+        try:
+            _write(base, new, records)
+        except Exception:
+            with _lock:
+                # Disk still holds `base`; saves made meanwhile are merged into the retry,
+                # which diffs against it
+                _pending["base"] = base
+                _pending["records"] = None
+                _pending["inflight"] = None
+            raise
+        with _lock:
+            _pending["inflight"] = None
+            if _pending["base"] is None:
+                _cache["stamp"] = _cache["disk"] = _current_stamp()
+    logging.info("Held-back saves flushed.")
+
+
+def flush():
+    """
+    Writes any held-back saves now. Returns False if the write failed;
+    the data stays pending and is retried on the next flush.
+    """
+    try:
+        _flush()
+        return True
+    except Exception:
+        logging.exception("Writing held-back saves failed; changes are kept in memory and will be retried.")
+        return False
+
+
+atexit.register(flush)
+
+
+def _copy_user_data(user_data):
+    return {"expenses": [dict(e) for e in user_data.get("expenses", [])],
+            "budgets": dict(user_data.get("budgets", {})),
+            "expense_seq": user_data.get("expense_seq", 0),
+            "totals": _copy_totals(user_data.get("totals", {}))}
+
+
+def _store_is_current():
+    """True if the sharded/sqlite store on disk holds every save made so far."""
+    return STORAGE_MODE in ("sharded", "sqlite") and not _holding_back()
+
+
+def _global_content():
+    """The current global sections, uncopied. Call with _lock held."""
+    if _overlay["global"] is not None:
+        return _overlay["global"]
+    if _store_is_current() and STORAGE_MODE == "sharded":
+        _ensure_shards()
+        return _shards.load_global()
+    if _store_is_current() and STORAGE_MODE == "sqlite":
+        return _ensure_sqlite().load_global()
+    return {k: v for k, v in _cached_data().items() if k not in USER_SECTIONS}
+
+
+def load_global(readonly=False):
+    """
+    Loads everything except per-user expenses and budgets (users, categories, ...).
+    In sharded mode only the small global file is read.
+    """
+    try:
+        with _lock:
+            content = _global_content()
+            return freeze(content) if readonly else _copy_data(content)
+    except Exception:
+        logging.exception("Unexpected error while loading global data:")
+    return {"users": [], "categories": {}}
+
+
+def _write_global(owned, records=None, epoch=None):
+    """
+    Writes the global sections to the shard/database, after anything held back.
+    In sqlite mode `records` (change records for `owned`) are applied instead of a full diff.
+    """
+    with _write_lock:
+        with _lock:
+            # Later global saves may be change records that build on this one, so only a
+            # whole-document save since it was queued makes this write redundant
+            if _writer is not None and _overlay["epoch"] != epoch:
+                return
+        _flush()
+        if STORAGE_MODE == "sharded":
+            _ensure_shards()
+            _shards.save_global(owned)
+        elif records is not None:
+            _ensure_sqlite().apply(records)
+        else:
+            _ensure_sqlite().save_global(owned)
+        with _lock:
+            if _overlay["global"] is owned:
+                _overlay["global"] = None
+            _cache["stamp"] = None
+            _cache["disk"] = _current_stamp()
+
+
+def _save_global_content(owned, records=None):
+    """Persists new global sections; `owned` is taken over by the cache or overlay."""
+    with _lock:
+        # The category sequence only moves forward, whatever copy of the sections is being saved
+        seq = max(owned.get("category_seq", 0), _reserved_category["id"], _global_content().get("category_seq", 0))
+        if seq != owned.get("category_seq", 0):
+            owned["category_seq"] = seq
+            if records is not None:
+                records = records + [{"op": "set", "table": "category_seq", "key": [], "value": seq}]
+        _versions["global"] += 1
+    if STORAGE_MODE in ("sharded", "sqlite"):
+        # Single-file/row-level writes, queued behind anything still held back
+        with _lock:
+            if _writer is not None:
+                _overlay["global"] = owned
+            epoch = _overlay["epoch"]
+        _submit(lambda: _write_global(owned, records, epoch))
+    else:
+        with _lock:
+            data = {k: v for k, v in _cached_data().items() if k in USER_SECTIONS}
+            data.update(owned)
+            _persist(data, records)
+
+
+def save_global(content):
+    """Saves users, categories and other global sections without touching any user's expenses."""
+    try:
+        _save_global_content(_copy_data({k: v for k, v in content.items() if k not in USER_SECTIONS}))
+        logging.info("Global data saved successfully.")
+    except Exception:
+        invalidate_cache()
+        logging.exception("Unexpected error while saving global data.")
+
+
+def put_user(record):
+    """
+    Adds a user record, or replaces the one with the same user_id. The in-memory list of
+    users is rebuilt shallowly with a linear scan (O(users), their records are not copied);
+    on disk journal mode appends a single record and sqlite mode writes a single row.
+    """
+    record = dict(record)
+    try:
+        with _lock:
+            current = _global_content()
+            users = list(current.get("users", []))
+            for i, user in enumerate(users):
+                if user["user_id"] == record["user_id"]:
+                    users[i] = record
+                    break
+            else:
+                users.append(record)
+            owned = dict(current)
+            owned["users"] = users
+        _save_global_content(owned, [{"op": "put", "table": "users", "key": [record["user_id"]], "value": record}])
+        logging.info(f"User record {record['user_id']} saved successfully.")
+        return True
+    except Exception:
+        invalidate_cache()
+        logging.exception(f"Unexpected error while saving user record {record.get('user_id')}.")
+        return False
+
+
+def reserve_category_id():
+    """
+    Hands out a never-reused category id. The high-water mark is stored in the global
+    "category_seq" section on the next global save (normally the put_category of the new
+    category), so the id of a deleted category is not handed out again.
+    """
+    with _lock:
+        content = _global_content()
+        last = max(content.get("category_seq", 0), _reserved_category["id"],
+                   max(map(int, content.get("categories", {})), default=0))
+        _reserved_category["id"] = last + 1
+        return last + 1
+
+
+def put_category(record):
+    """
+    Adds a category record, or replaces the one with the same category_id (e.g. a rename).
+    Expenses refer to categories by id, so no expense is touched; journal mode appends a
+    single record and sqlite mode writes a single row.
+    """
+    record = dict(record)
+    key = str(record["category_id"])
+    try:
+        with _lock:
+            current = _global_content()
+            owned = dict(current)
+            owned["categories"] = dict(current.get("categories", {}))
+            owned["categories"][key] = record
+        _save_global_content(owned, [{"op": "put", "table": "categories", "key": [key], "value": record}])
+        logging.info(f"Category record {key} saved successfully.")
+        return True
+    except Exception:
+        invalidate_cache()
+        logging.exception(f"Unexpected error while saving category record {key}.")
+        return False
+
+
+def delete_category(category_id):
+    """Removes one category record; callers check it is unused first (see queries.category_in_use)."""
+    key = str(category_id)
+    try:
+        with _lock:
+            current = _global_content()
+            owned = dict(current)
+            owned["categories"] = {k: v for k, v in current.get("categories", {}).items() if k != key}
+        _save_global_content(owned, [{"op": "del", "table": "categories", "key": [key]}])
+        logging.info(f"Category record {key} deleted successfully.")
+        return True
+    except Exception:
+        invalidate_cache()
+        logging.exception(f"Unexpected error while deleting category record {key}.")
+        return False
+
+
+def _user_content(uid):
+    """The current content of one user's sections, uncopied. Call with _lock held."""
+    if uid in _overlay["users"]:
+        return _overlay["users"][uid]
+    if _store_is_current() and STORAGE_MODE == "sharded":
+        _ensure_shards()
+        return _shards.load_user(uid)
+    if _store_is_current() and STORAGE_MODE == "sqlite":
+        content = _ensure_sqlite().load_user(uid)
+        queued = _overlay["records"].get(uid)
+        if queued:
+            content = _apply_user_records(content, uid, [record for batch in queued for record in batch])
+        return content
+    data = _cached_data()
+    content = empty_user_content()
+    for section in USER_SECTIONS:
+        content[section] = data.get(section, {}).get(uid, content[section])
+    return content
+
+
+def load_user_data(user_id, readonly=False):
+    """
+    Loads one user's sections as {"expenses": [...], "budgets": {...}, "expense_seq": n, "totals": {...}}.
+    In sharded mode only that user's shard is read; in sqlite mode only that user's rows.
+    """
+    uid = str(user_id)
+    try:
+        with _lock:
+            content = _user_content(uid)
+            return freeze(content) if readonly else _copy_user_data(content)
+    except Exception:
+        logging.exception(f"Unexpected error while loading data for user {uid}:")
+    return empty_user_content()
+
+
+def reserve_expense_ids(user_id, count=1):
+    """
+    Hands out `count` consecutive, never-reused expense ids for a user and returns the first.
+    The user's high-water mark is stored with their data ("expense_seq") on their next save,
+    so this is O(1); only data saved before the sequence existed is scanned, once.
+    """
+    uid = str(user_id)
+    with _lock:
+        last = _expense_seq(uid)
+        if uid in _reserved_ids:
+            last = max(last, _reserved_ids[uid])
+        elif not last:
+            last = max((exp.get("expense_id", 0) for exp in _user_content(uid)["expenses"]), default=0)
+        _reserved_ids[uid] = last + count
+        return last + 1
+
+
+def _expense_seq(uid):
+    """The user's stored expense_seq; in sqlite mode their expenses are not read. Call with _lock held."""
+    if STORAGE_MODE == "sqlite" and _store_is_current() and uid not in _overlay["users"]:
+        seq = _ensure_sqlite().expense_seq(uid)
+        for batch in _overlay["records"].get(uid, ()):
+            for record in batch:
+                if record["table"] == "expense_seq" and record["op"] == "put":
+                    seq = max(seq, record["value"])
+        return seq
+    return _user_content(uid).get("expense_seq", 0)
+
+
+def _write_user(uid, owned, records=None, epoch=None):
+    """
+    Writes one user's shard/rows, after anything held back.
+    In sqlite mode `records` (change records for `owned`) are applied instead of a full diff;
+    `owned` is None when only the records were queued (see _save_user_records).
+    """
+    with _write_lock:
+        with _lock:
+            if _writer is not None and _overlay["epoch"] != epoch:
+                return  # superseded by a whole-document save
+            # A later save of the whole content writes it instead; later change records
+            # build on this one, so it still has to be written
+            if _writer is not None and records is None and _overlay["users"].get(uid) is not owned:
+                return
+        _flush()
+        if STORAGE_MODE == "sharded":
+            _ensure_shards()
+            _shards.save_user(uid, owned)
+        elif records is not None:
+            _ensure_sqlite().apply(records)
+        else:
+            _ensure_sqlite().save_user(uid, owned)
+        with _lock:
+            if owned is not None and _overlay["users"].get(uid) is owned:
+                del _overlay["users"][uid]
+            queued = _overlay["records"].get(uid)
+            if queued and queued[0] is records:
+                del queued[0]
+                if not queued:
+                    del _overlay["records"][uid]
+            _cache["stamp"] = None
+            _cache["disk"] = _current_stamp()
+
+
+def _check_disk():
+    """
+    Moves every version on if the files changed since this process last read or wrote
+    them, i.e. another process saved. Skipped while a save of ours is on its way to disk.
+    """
+    if _cache["disk"] is None or _holding_back() or not _write_lock.acquire(blocking=False):
+        return
+    try:
+        stamp = _current_stamp()
+        if stamp != _cache["disk"]:
+            _cache["disk"] = stamp
+            _cache["stamp"] = None
+            _versions["all"] += 1
+    finally:
+        _write_lock.release()
+
+
+def data_version(user_id):
+    """
+    An opaque value that changes whenever the user's data may have changed, here or in
+    another process (one stat of the data files per call).
+    """
+    with _lock:
+        _check_disk()
+        return _versions["all"], _versions["users"].get(str(user_id), 0)
+
+
+def storage_version():
+    """
+    An opaque value that changes when the data may have changed as a whole: a whole-document
+    save, cache invalidation or a save by another process. Per-user and global saves made
+    here leave it alone.
+    """
+    with _lock:
+        _check_disk()
+        return _versions["all"]
+
+
+def global_version():
+    """An opaque value that changes whenever users or categories may have changed, here or in another process."""
+    with _lock:
+        _check_disk()
+        return _versions["all"], _versions["global"]
+
+
+def _save_user_content(uid, owned, records=None):
+    """
+    Persists one user's sections; `owned` is taken over by the cache or overlay.
+    `records`, if given, are the change records from the user's current content to `owned`.
+    """
+    with _lock:
+        # The sequence only moves forward, whatever copy of the user's data is being saved
+        seq = max(owned["expense_seq"], _reserved_ids.get(uid, 0), _expense_seq(uid))
+        if records is not None and seq != owned["expense_seq"]:
+            records = records + [{"op": "put", "table": "expense_seq", "key": [uid], "value": seq}]
+        owned["expense_seq"] = seq
+        _versions["users"][uid] = _versions["users"].get(uid, 0) + 1
+    if STORAGE_MODE in ("sharded", "sqlite"):
+        with _lock:
+            if _writer is not None:
+                _overlay["users"][uid] = owned
+            epoch = _overlay["epoch"]
+        _submit(lambda: _write_user(uid, owned, records, epoch))
+    else:
+        with _lock:
+            data = dict(_cached_data())
+            for section in USER_SECTIONS:
+                if owned[section] or uid in data.get(section, {}):
+                    data[section] = dict(data.get(section, {}))
+                    data[section][uid] = owned[section]
+            _persist(data, records)
+
+
+def _apply_user_records(content, uid, records):
+    """
+    One user's content with change records applied. The expense list and the touched
+    budgets/totals maps are replaced, never the objects `content` (shared with readers) holds.
+    """
+    staged = {"expenses": {uid: content["expenses"]}, "budgets": {uid: dict(content["budgets"])},
+              "expense_seq": {uid: content["expense_seq"]}, "totals": {uid: dict(content["totals"])}}
+    apply_records(staged, records)
+    return {section: staged[section].get(uid, empty) for section, empty in empty_user_content().items()}
+
+
+def _save_user_records(uid, records):
+    """
+    Applies change records to one user's sections and persists just those: journal mode
+    appends them and sqlite mode writes their rows without reading the user's others.
+    """
+    with _lock:
+        owned = None
+        if STORAGE_MODE == "sqlite" and _store_is_current() and uid not in _overlay["users"]:
+            seq = _reserved_ids.get(uid, 0)
+            if seq > _expense_seq(uid):
+                records = records + [{"op": "put", "table": "expense_seq", "key": [uid], "value": seq}]
+            _versions["users"][uid] = _versions["users"].get(uid, 0) + 1
+            if _writer is not None:
+                # Readers see the records applied over the rows until they are written
+                _overlay["records"].setdefault(uid, []).append(records)
+            epoch = _overlay["epoch"]
+        else:
+            owned = _apply_user_records(_user_content(uid), uid, records)
+    if owned is not None:
+        _save_user_content(uid, owned, records)
+    else:
+        _submit(lambda: _write_user(uid, None, records, epoch))
+
+
+def save_expense_changes(user_id, put=(), delete=(), totals=None):
+    """
+    Saves changes to some of one user's expenses: `put` records are added or replace the one
+    with the same expense_id, `delete` lists expense_ids to remove, and `totals` maps each month
+    whose aggregates changed to its new {category_id: [total, count]} (empty once the month has
+    no expenses). Only these records are written: journal mode appends them and sqlite mode
+    writes their rows; sharded mode still rewrites the user's shard and json mode the file.
+    """
+    uid = str(user_id)
+    records = [{"op": "del", "table": "expenses", "key": [uid, expense_id]} for expense_id in delete]
+    records += [{"op": "put", "table": "expenses", "key": [uid, exp["expense_id"]], "value": dict(exp)}
+                for exp in put]
+    for month, cells in (totals or {}).items():
+        if cells:
+            records.append({"op": "put", "table": "totals", "key": [uid, month],
+                            "value": {category: list(cell) for category, cell in cells.items()}})
+        else:
+            records.append({"op": "del", "table": "totals", "key": [uid, month]})
+    try:
+        _save_user_records(uid, records)
+        logging.info(f"{len(records)} expense change(s) for user {uid} saved successfully.")
+        return True
+    except Exception:
+        invalidate_cache()
+        logging.exception(f"Unexpected error while saving expense changes for user {uid}.")
+        return False
+
+
+def put_budget(user_id, period, amount):
+    """Sets one user's budget for `period` without copying or rewriting their expenses in journal/sqlite mode."""
+    uid = str(user_id)
+    try:
+        _save_user_records(uid, [{"op": "put", "table": "budgets", "key": [uid, period], "value": amount}])
+        logging.info(f"Budget {period} for user {uid} saved successfully.")
+        return True
+    except Exception:
+        invalidate_cache()
+        logging.exception(f"Unexpected error while saving budget {period} for user {uid}.")
+        return False
+
+
+def save_user_expenses(user_id, expenses, totals=None):
+    """
+    Saves one user's expenses, keeping their budgets as they are. `totals` are the
+    aggregates for exactly these expenses, stored alongside them.
+    """
+    uid = str(user_id)
+    try:
+        owned = {"expenses": [dict(exp) for exp in expenses], "totals": _copy_totals(totals or {})}
+        with _lock:
+            current = _user_content(uid)
+            owned["budgets"] = dict(current.get("budgets", {}))
+            owned["expense_seq"] = current.get("expense_seq", 0)
+        _save_user_content(uid, owned)
+        logging.info(f"Expenses for user {uid} saved successfully.")
+        return True
+    except Exception:
+        invalidate_cache()
+        logging.exception(f"Unexpected error while saving expenses for user {uid}.")
+        return False
+
+
+def checkpoint(data=None):
+    """Writes a compacted snapshot of the journaled state and truncates the journal."""
+    with _write_lock:
+        if data is None:
+            flush()
+            data = _journal.replay(_read_snapshot())
+        _write_snapshot(data)
+        _journal.reset()
+        with _lock:
+            if not _holding_back():
+                _cache["data"] = data
+                _cache["stamp"] = _cache["disk"] = _current_stamp()
+    logging.info("Journal checkpoint written.")
 
-def verify_password(stored_password, input_password):
-    """Verifies the hashed password."""
-    return stored_password == hash_password(input_password)
 
+def fold_leftover_journal():
+    """
+    Folds a journal left over from a previous journaled run back into the snapshot when
+    another mode is active. Called once at startup by the main process, not on import,
+    so a worker process importing this module never rewrites the parent's files.
+    """
+    with _write_lock:
+        if STORAGE_MODE != "journal" and os.path.exists(_journal.path) and os.path.getsize(_journal.path) > 0:
+            checkpoint()
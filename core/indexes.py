@@ -0,0 +1,382 @@
+# indexes.py - Incrementally Maintained Indexes over a User's Expenses
+import bisect
+import datetime
+import re
+from abc import ABC, abstractmethod
+
+_WORD = re.compile(r"\w+")
+
+
+def month_of(record):
+    """The YYYY-MM bucket an expense falls in."""
+    return record["date"][:7]
+
+
+def tokenize(text):
+    """Lower-cased words of a text: "Shoprite + Costco (Milk)" -> ["shoprite", "costco", "milk"]."""
+    return _WORD.findall(text.lower())
+
+
+def fingerprint(record):
+    """
+    What makes two expenses the same for duplicate detection: date, amount in cents, category
+    and description words ignoring case and punctuation. The category is its id, which a
+    rename does not change.
+    """
+    return (record["date"], round(record["amount"] * 100), record["category_id"],
+            " ".join(tokenize(record["description"])))
+
+
+def date_ordinal(text):
+    """The day number of a YYYY-MM-DD date; unreadable dates sort before every real one."""
+    try:
+        return datetime.date.fromisoformat(text).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+class ExpenseIndex(ABC):
+    """
+    Base class for indexes kept by an ExpenseStore. The store calls add/remove for every
+    record it gains or loses, and update when a record changes in place.
+    """
+
+    @abstractmethod
+    def clear(self):
+        """Forgets every record."""
+
+    @abstractmethod
+    def add(self, record):
+        """Indexes one record."""
+
+    @abstractmethod
+    def remove(self, record):
+        """Drops one record that was added before."""
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+
+    def update(self, old, new):
+        """`old` is a copy of the record before the change, `new` the changed record."""
+        self.remove(old)
+        self.add(new)
+
+    def rebuild(self, records):
+        self.clear()
+        for record in records:
+            self.add(record)
+
+
+class MonthIndex(ExpenseIndex):
+    """Buckets expenses by YYYY-MM, so a month view costs O(rows in that month)."""
+
+    def __init__(self):
+        self._buckets = {}  # month -> {expense_id: record}, in insertion order
+        self._months = []   # sorted months that have at least one expense
+
+    def clear(self):
+        self._buckets = {}
+        self._months = []
+
+    def add(self, record):
+        month = month_of(record)
+        bucket = self._buckets.get(month)
+        if bucket is None:
+            bucket = self._buckets[month] = {}
+            bisect.insort(self._months, month)
+        bucket[record["expense_id"]] = record
+
+    def remove(self, record):
+        month = month_of(record)
+        bucket = self._buckets.get(month)
+        if bucket is None:
+            return
+        bucket.pop(record["expense_id"], None)
+        if not bucket:
+            del self._buckets[month]
+            del self._months[bisect.bisect_left(self._months, month)]
+
+    def update(self, old, new):
+        if month_of(old) == month_of(new):
+            return  # same bucket, and the bucket holds the live record
+        self.remove(old)
+        self.add(new)
+
+    def expenses(self, month):
+        """The expenses dated in `month` (YYYY-MM), in insertion order."""
+        return list(self._buckets.get(month, {}).values())
+
+    def months(self):
+        """Months with at least one expense, oldest first."""
+        return list(self._months)
+
+
+class DateIndex(ExpenseIndex):
+    """
+    Keeps (date ordinal, expense_id) keys sorted, so a date range is found with two
+    binary searches and read in date order without sorting.
+    """
+
+    def __init__(self):
+        self._keys = []
+
+    def clear(self):
+        self._keys = []
+
+    @staticmethod
+    def _key(record):
+        # An Expense carries its ordinal already, one int shared by every expense that day
+        ordinal = getattr(record, "ordinal", None)
+        return ordinal if ordinal is not None else date_ordinal(record["date"]), record["expense_id"]
+
+    def add(self, record):
+        bisect.insort(self._keys, self._key(record))
+
+    def remove(self, record):
+        key = self._key(record)
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def update(self, old, new):
+        if old["date"] != new["date"]:
+            self.remove(old)
+            self.add(new)
+
+    def add_many(self, records):
+        # One sort of the appended run is far cheaper than an insort per record
+        self._keys.extend(self._key(record) for record in records)
+        self._keys.sort()
+
+    def rebuild(self, records):
+        self._keys = sorted(self._key(record) for record in records)
+
+    def span(self, first=None, last=None):
+        """Positions [start, stop) of the keys dated from ordinal `first` to `last`, both inclusive."""
+        start = 0 if first is None else bisect.bisect_left(self._keys, (first,))
+        stop = len(self._keys) if last is None else bisect.bisect_left(self._keys, (last + 1,))
+        return start, max(start, stop)
+
+    def expense_id_at(self, position):
+        return self._keys[position][1]
+
+
+class TextIndex(ExpenseIndex):
+    """
+    Inverted index from the words of each expense's description to expense ids, plus the
+    expense ids per category id. Words are also kept sorted, so every word starting with a
+    prefix is one binary search away; category names are matched at search time, so a
+    renamed category is found by its new name without reindexing.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._postings = {}    # word -> set of expense_ids
+        self._words = []       # sorted words that have at least one posting
+        self._categories = {}  # category_id -> set of expense_ids
+
+    @staticmethod
+    def _words_of(record):
+        return set(tokenize(record["description"]))
+
+    def add(self, record):
+        for word in self._words_of(record):
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                bisect.insort(self._words, word)
+            ids.add(record["expense_id"])
+        self._categories.setdefault(record["category_id"], set()).add(record["expense_id"])
+
+    def remove(self, record):
+        ids = self._categories.get(record["category_id"])
+        if ids is not None:
+            ids.discard(record["expense_id"])
+            if not ids:
+                del self._categories[record["category_id"]]
+        for word in self._words_of(record):
+            ids = self._postings.get(word)
+            if ids is None:
+                continue
+            ids.discard(record["expense_id"])
+            if not ids:
+                del self._postings[word]
+                del self._words[bisect.bisect_left(self._words, word)]
+
+    def update(self, old, new):
+        if (old["description"], old["category_id"]) != (new["description"], new["category_id"]):
+            self.remove(old)
+            self.add(new)
+
+    def rebuild(self, records):
+        self._postings = {}
+        self._categories = {}
+        for record in records:
+            for word in self._words_of(record):
+                self._postings.setdefault(word, set()).add(record["expense_id"])
+            self._categories.setdefault(record["category_id"], set()).add(record["expense_id"])
+        self._words = sorted(self._postings)
+
+    def _prefixed(self, prefix, category_words):
+        """Ids of expenses with a word of their description or category starting with `prefix`."""
+        start = bisect.bisect_left(self._words, prefix)
+        stop = bisect.bisect_left(self._words, prefix + "\U0010ffff", start)
+        matched = [self._postings[word] for word in self._words[start:stop]]
+        matched += [self._categories[cid] for cid, words in category_words.items()
+                    if cid in self._categories and any(word.startswith(prefix) for word in words)]
+        if len(matched) == 1:
+            return matched[0]
+        ids = set()
+        for posting in matched:
+            ids |= posting
+        return ids
+
+    def search(self, text, categories=None):
+        """
+        Ids of expenses that have, for every word of `text`, a word starting with it in
+        their description or in their category's name; `categories` is {category_id: name}.
+        """
+        category_words = {cid: tokenize(name) for cid, name in (categories or {}).items()}
+        result = None
+        for prefix in sorted(set(tokenize(text)), key=len, reverse=True):
+            ids = self._prefixed(prefix, category_words)
+            result = set(ids) if result is None else result & ids
+            if not result:
+                break
+        return result if result is not None else set()
+
+
+class AggregateIndex(ExpenseIndex):
+    """
+    Running total and count per (month, category_id), per month, per category_id and for
+    the whole history, so summaries and budget checks are lookups. Every change is O(1).
+    The (month, category_id) cells are what gets persisted; see dump() and load().
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._cells = {}       # month -> {category_id: [total, count]}
+        self._months = {}      # month -> [total, count]
+        self._categories = {}  # category_id -> [total, count]
+        self.total = 0.0
+        self.count = 0
+
+    @staticmethod
+    def _bump(table, key, amount, count):
+        cell = table.get(key)
+        if cell is None:
+            cell = table[key] = [0.0, 0]
+        cell[0] += amount
+        cell[1] += count
+        if cell[1] <= 0:
+            del table[key]  # also drops any rounding drift left in the cell
+
+    def _apply(self, month, category, amount, count):
+        cells = self._cells.get(month)
+        if cells is None:
+            cells = self._cells[month] = {}
+        self._bump(cells, category, amount, count)
+        if not cells:
+            del self._cells[month]
+        self._bump(self._months, month, amount, count)
+        self._bump(self._categories, category, amount, count)
+        self.total += amount
+        self.count += count
+        if self.count <= 0:
+            self.total, self.count = 0.0, 0
+
+    def add(self, record):
+        self._apply(month_of(record), record["category_id"], record["amount"], 1)
+
+    def remove(self, record):
+        self._apply(month_of(record), record["category_id"], -record["amount"], -1)
+
+    def update(self, old, new):
+        if (old["amount"], old["category_id"], month_of(old)) == (new["amount"], new["category_id"], month_of(new)):
+            return
+        self.remove(old)
+        self.add(new)
+
+    def month_total(self, month):
+        cell = self._months.get(month)
+        return cell[0] if cell else 0.0
+
+    def category_totals(self, month=None):
+        """{category_id: total} for one month, or for the whole history if `month` is None."""
+        cells = self._categories if month is None else self._cells.get(month, {})
+        return {category_id: cell[0] for category_id, cell in cells.items()}
+
+    def category_counts(self):
+        """{category_id: number of expenses} over the whole history."""
+        return {category_id: cell[1] for category_id, cell in self._categories.items()}
+
+    def dump(self, months=None):
+        """
+        The persisted form: {month: {category_id: [total, count]}}, ids as strings like any JSON key.
+        With `months`, only those months, each mapped to {} if it has no expenses left.
+        """
+        if months is not None:
+            return {month: {str(category_id): list(cell) for category_id, cell in self._cells.get(month, {}).items()}
+                    for month in months}
+        return {month: {str(category_id): list(cell) for category_id, cell in cells.items()}
+                for month, cells in self._cells.items()}
+
+    def load(self, totals):
+        """Restores the index from dump() output."""
+        self.clear()
+        for month, cells in totals.items():
+            for category_id, (amount, count) in cells.items():
+                self._apply(month, int(category_id), amount, count)
+
+    def matches(self, other, tolerance=0.005):
+        """True if both indexes hold the same counts and, within `tolerance`, the same totals."""
+        if self._cells.keys() != other._cells.keys():
+            return False
+        for month, cells in self._cells.items():
+            theirs = other._cells[month]
+            if cells.keys() != theirs.keys():
+                return False
+            for category, (amount, count) in cells.items():
+                if count != theirs[category][1] or abs(amount - theirs[category][0]) > tolerance:
+                    return False
+        return True
+
+
+class FingerprintIndex(ExpenseIndex):
+    """Number of expenses per fingerprint(), so checking an imported row for a duplicate is O(1)."""
+
+    def __init__(self):
+        self._counts = {}
+
+    def clear(self):
+        self._counts = {}
+
+    def add(self, record):
+        key = fingerprint(record)
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def remove(self, record):
+        key = fingerprint(record)
+        count = self._counts.get(key, 0) - 1
+        if count > 0:
+            self._counts[key] = count
+        else:
+            self._counts.pop(key, None)
+
+    def update(self, old, new):
+        if fingerprint(old) != fingerprint(new):
+            self.remove(old)
+            self.add(new)
+
+    def count(self, key):
+        """Number of expenses with this fingerprint."""
+        return self._counts.get(key, 0)
+
+    def counts(self):
+        """A copy of {fingerprint: number of expenses}, safe to read from another thread."""
+        return dict(self._counts)
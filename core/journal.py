@@ -0,0 +1,239 @@
+# journal.py - Append-Only Change Log for Journaled Storage
+import json
+import os
+import logging
+from core import codec
+
+# Tables whose rows are diffed record-by-record. Everything else in the
+# document is treated as an opaque section and replaced wholesale.
+KEYED_TABLES = ("users", "expenses", "categories", "budgets", "expense_seq", "totals")
+
+
+def _index_by(records, field):
+    """Maps records by a key field, or returns None if keys are missing or repeated."""
+    index = {}
+    for rec in records:
+        key = rec.get(field) if isinstance(rec, dict) else None
+        if key is None or key in index:
+            return None
+        index[key] = rec
+    return index
+
+
+def _diff_list(table, key_prefix, old_list, new_list, field):
+    """Diffs two record lists by id. Falls back to a full replace if ids are not unique."""
+    if old_list == new_list:
+        return []
+    old_index = _index_by(old_list, field)
+    new_index = _index_by(new_list, field)
+    if old_index is None or new_index is None:
+        return [{"op": "set", "table": table, "key": key_prefix, "value": new_list}]
+
+    records = []
+    for key in old_index.keys() - new_index.keys():
+        records.append({"op": "del", "table": table, "key": key_prefix + [key]})
+    for key, rec in new_index.items():
+        if old_index.get(key) != rec:
+            records.append({"op": "put", "table": table, "key": key_prefix + [key], "value": rec})
+    return records
+
+
+def _diff_mapping(table, key_prefix, old_map, new_map):
+    """Diffs two dicts key-by-key."""
+    if old_map == new_map:
+        return []
+    records = []
+    for key in old_map.keys() - new_map.keys():
+        records.append({"op": "del", "table": table, "key": key_prefix + [key]})
+    for key, value in new_map.items():
+        if key not in old_map or old_map[key] != value:
+            records.append({"op": "put", "table": table, "key": key_prefix + [key], "value": value})
+    return records
+
+
+def diff_data(old, new):
+    """
+    Returns the list of change records that turn `old` into `new`.
+    Unchanged users' expense lists, budgets and totals are skipped with a single comparison.
+    """
+    records = []
+    records += _diff_list("users", [], old.get("users", []), new.get("users", []), "user_id")
+    records += _diff_mapping("categories", [], old.get("categories", {}), new.get("categories", {}))
+    records += _diff_mapping("expense_seq", [], old.get("expense_seq", {}), new.get("expense_seq", {}))
+
+    old_expenses = old.get("expenses", {})
+    new_expenses = new.get("expenses", {})
+    for uid in old_expenses.keys() - new_expenses.keys():
+        records.append({"op": "del", "table": "expenses", "key": [uid]})
+    for uid, exps in new_expenses.items():
+        if uid not in old_expenses:
+            records.append({"op": "set", "table": "expenses", "key": [uid], "value": exps})
+        else:
+            records += _diff_list("expenses", [uid], old_expenses[uid], exps, "expense_id")
+
+    for table in ("budgets", "totals"):
+        old_section = old.get(table, {})
+        new_section = new.get(table, {})
+        for uid in old_section.keys() - new_section.keys():
+            records.append({"op": "del", "table": table, "key": [uid]})
+        for uid, mapping in new_section.items():
+            if uid not in old_section:
+                records.append({"op": "set", "table": table, "key": [uid], "value": mapping})
+            else:
+                records += _diff_mapping(table, [uid], old_section[uid], mapping)
+
+    for section in new.keys() - set(KEYED_TABLES):
+        if old.get(section) != new[section]:
+            records.append({"op": "set", "table": section, "key": [], "value": new[section]})
+    for section in old.keys() - new.keys() - set(KEYED_TABLES):
+        records.append({"op": "del", "table": section, "key": []})
+    return records
+
+
+def apply_records(data, records):
+    """
+    Applies change records to the in-memory data structure.
+    Keyed lists are staged as id-ordered dicts while replaying so every put/del is O(1).
+    """
+    staged = {}  # (table, uid) -> {id: record}
+
+    def stage(table, owner, records_list, field):
+        key = (table, owner)
+        if key not in staged:
+            index = _index_by(records_list, field)
+            staged[key] = index if index is not None else {
+                rec.get(field): rec for rec in records_list}
+        return staged[key]
+
+    for record in records:
+        op, table, key = record["op"], record["table"], record["key"]
+
+        if table not in KEYED_TABLES or (op == "set" and not key):
+            staged.pop((table, None), None)
+            if op == "del":
+                data.pop(table, None)
+            else:
+                data[table] = record["value"]
+        elif table == "users":
+            rows = stage("users", None, data.setdefault("users", []), "user_id")
+            if op == "put":
+                rows[key[0]] = record["value"]
+            else:
+                rows.pop(key[0], None)
+        elif table in ("categories", "expense_seq"):
+            mapping = data.setdefault(table, {})
+            if op == "put":
+                mapping[key[0]] = record["value"]
+            else:
+                mapping.pop(key[0], None)
+        else:
+            section = data.setdefault(table, {})
+            if len(key) == 1:
+                staged.pop((table, key[0]), None)
+                if op == "set":
+                    section[key[0]] = record["value"]
+                else:
+                    section.pop(key[0], None)
+            elif table == "expenses":
+                rows = stage("expenses", key[0], section.setdefault(key[0], []), "expense_id")
+                if op == "put":
+                    rows[key[1]] = record["value"]
+                else:
+                    rows.pop(key[1], None)
+            else:
+                mapping = section.setdefault(key[0], {})
+                if op == "put":
+                    mapping[key[1]] = record["value"]
+                else:
+                    mapping.pop(key[1], None)
+
+    for (table, owner), rows in staged.items():
+        if owner is None:
+            data[table] = list(rows.values())
+        else:
+            data[table][owner] = list(rows.values())
+    return data
+
+
+class Journal:
+    """
+    Append-only log of change records, one JSON object per line.
+    The snapshot plus the journal tail always describes the current state.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.record_count = 0
+        self._cut_to = None  # end of the last good record, if a failed append could not be cut back
+
+    def append(self, records):
+        """
+        Appends change records and flushes them to disk. If the write fails part-way, the
+        file is cut back to where it ended before, so a retry is not appended behind a torn line.
+        """
+        if not records:
+            return
+        data = "".join(json.dumps(rec, separators=(",", ":")) + "\n" for rec in records).encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            if self._cut_to is not None:
+                os.ftruncate(fd, self._cut_to)
+                self._cut_to = None
+            start = os.lseek(fd, 0, os.SEEK_END)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                os.fsync(fd)
+            except BaseException:
+                self._cut_back(fd, start)
+                raise
+        finally:
+            os.close(fd)
+        self.record_count += len(records)
+
+    def _cut_back(self, fd, offset):
+        try:
+            os.ftruncate(fd, offset)
+            os.fsync(fd)
+        except OSError:
+            self._cut_to = offset  # retried before the next append
+
+    def replay(self, data):
+        """
+        Applies every journaled record to `data`. A torn final line (a crash mid-append) is
+        cut off the file, so the records appended after it are not lost behind it on the
+        next load; a complete but unreadable line is skipped.
+        """
+        self.record_count = 0
+        if not os.path.exists(self.path):
+            return data
+        records = []
+        good = 0  # offset just past the last complete line
+        with open(self.path, "rb") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.endswith(b"\n"):
+                    logging.warning(f"Discarding torn journal record at line {line_no}.")
+                    break
+                good += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    records.append(codec.loads(line))
+                except ValueError:
+                    logging.warning(f"Skipping unreadable journal record at line {line_no}.")
+        if good < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+                f.flush()
+                os.fsync(f.fileno())
+        apply_records(data, records)
+        self.record_count = len(records)
+        return data
+
+    def reset(self):
+        """Truncates the journal after a checkpoint."""
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        self.record_count = 0
+        self._cut_to = None
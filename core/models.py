@@ -1,6 +1,42 @@
 # models.py - User, Expense, Category, Budget Classes
 import itertools
 import datetime
+import re
+import sys
+from collections.abc import MutableMapping
+
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_ordinals = {}    # "YYYY-MM-DD" -> day ordinal, so expenses on one day share the int
+_date_texts = {}  # day ordinal -> "YYYY-MM-DD"
+
+
+def _parse_date(text):
+    """Parses YYYY-MM-DD, raising ValueError for anything else."""
+    if not isinstance(text, str) or not _DATE.fullmatch(text):
+        raise ValueError(f"Invalid date: {text!r}. Use YYYY-MM-DD.")
+    return datetime.date.fromisoformat(text)
+
+
+def _ordinal(text):
+    """Day ordinal of a YYYY-MM-DD date, raising ValueError for anything else."""
+    ordinal = _ordinals.get(text)
+    if ordinal is None:
+        ordinal = _parse_date(text).toordinal()
+        _ordinals[text] = ordinal
+        _date_texts[ordinal] = text
+    return ordinal
+
+
+def _date_text(ordinal):
+    text = _date_texts.get(ordinal)
+    if text is None:
+        text = _date_texts[ordinal] = datetime.date.fromordinal(ordinal).isoformat()
+    return text
+
+
+def _share(text):
+    """One shared copy of a description; most are repeated many times over a history."""
+    return sys.intern(text) if type(text) is str else text
 
 class User:
     _id_counter = itertools.count(1)
@@ -18,37 +54,140 @@ class User:
         return f"User(id={self.user_id}, username='{self.username}', role='{self.role}')"
 
 
-class Expense:
+class Expense(MutableMapping):
+    """
+    One expense, stored compactly: amount as integer cents, category by id and date as a
+    day ordinal, in __slots__ instead of a __dict__. Expenses on the same day share one
+    ordinal and equal descriptions share one string. It reads and writes like the stored
+    dict (exp["amount"], exp["date"], dict(exp)), so ExpenseStore, its indexes and the
+    save path can hold these in place of dicts. Constructors do no I/O; callers prompt and
+    validate first, so expenses can be built in bulk or off the UI thread.
+    """
+    __slots__ = ("expense_id", "cents", "category_id", "description", "user_id", "ordinal", "extra")
     _id_counter = itertools.count(1)
 
-    def __init__(self, amount: float, category: str, description: str, user_id: int, date: str = None, expense_id=None):
-        """Initializes an Expense object."""
+    def __init__(self, amount: float, category_id: int, description: str, user_id: int, date: str = None, expense_id=None):
+        """Initializes an Expense object. `date` is YYYY-MM-DD and defaults to today."""
         self.expense_id = expense_id if expense_id is not None else next(Expense._id_counter)
-        self.amount = amount
-        self.category = category
-        self.description = description
+        self.cents = round(amount * 100)
+        self.category_id = category_id
+        self.description = _share(description)
         self.user_id = user_id
+        self.ordinal = _ordinal(date) if date else datetime.date.today().toordinal()
+        self.extra = None  # stored fields the model does not know, kept so saves round-trip them
+
+    @property
+    def amount(self):
+        return self.cents / 100
+
+    @amount.setter
+    def amount(self, value):
+        self.cents = round(value * 100)
+
+    @property
+    def category(self):
+        """The category's current name."""
+        from core.categories import category_name  # reads storage; models itself stays I/O free
+        return category_name(self.category_id)
 
-        # If date is None, prompt the user for input instead of setting today's date automatically
-        if date is None:
-            while True:
-                date_input = input("Enter Date (YYYY-MM-DD) or press Enter for today's date: ").strip()
-                if not date_input:
-                    self.date = datetime.datetime.now().strftime("%Y-%m-%d")
-                    break
-                try:
-                    datetime.datetime.strptime(date_input, "%Y-%m-%d")  # Validate format
-                    self.date = date_input
-                    break
-                except ValueError:
-                    print("[!] Invalid date format. Please enter in YYYY-MM-DD format.")
+    @property
+    def date(self):
+        if self.ordinal:
+            return _date_text(self.ordinal)
+        return self.extra["date"]  # unreadable date kept as stored (see from_lists)
+
+    @date.setter
+    def date(self, value):
+        self.ordinal = _ordinal(value)
+        if self.extra is not None:
+            self.extra.pop("date", None)
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record["amount"], record["category_id"], record["description"], record["user_id"],
+                   record["date"], record["expense_id"])
+
+    @classmethod
+    def from_lists(cls, records):
+        """
+        Bulk constructor for expense lists as stored in the data files. Each record is read
+        once without re-validating it; a date that does not parse is kept as its text (with
+        ordinal 0, like analytics.date_ordinal) rather than failing the whole load.
+        """
+        new = cls.__new__
+        out = []
+        append = out.append
+        for record in records:
+            exp = new(cls)
+            exp.expense_id = record["expense_id"]
+            exp.cents = round(record["amount"] * 100)
+            exp.category_id = record.get("category_id")
+            exp.description = _share(record["description"])
+            exp.user_id = record.get("user_id")
+            exp.extra = None
+            if len(record) != len(_FIELDS) or "category_id" not in record or "user_id" not in record:
+                extra = {key: value for key, value in record.items() if key not in _FIELDS}
+                exp.extra = extra or None
+            try:
+                exp.ordinal = _ordinal(record["date"])
+            except ValueError:
+                exp.ordinal = 0
+                exp.extra = dict(exp.extra or (), date=record["date"])
+            append(exp)
+        return out
+
+    def to_dict(self):
+        """The record as stored in the data files."""
+        return dict(self)
+
+    # Mapping interface: the stored record's keys, in the order the data files use
+
+    def __getitem__(self, key):
+        if key == "amount":
+            return self.cents / 100
+        if key == "date":
+            return self.date
+        if key in _SLOTS:
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in _FIELDS:
+            setattr(self, key, value)
+        elif self.extra is None:
+            self.extra = {key: value}
         else:
-            self.date = date
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELDS or self.extra is None or key not in self.extra:
+            raise KeyError(key)
+        del self.extra[key]
+
+    def __iter__(self):
+        yield from _FIELDS
+        if self.extra is not None:
+            for key in self.extra:
+                if key != "date":
+                    yield key
+
+    def __len__(self):
+        extra = self.extra
+        return len(_FIELDS) + (len(extra) - ("date" in extra) if extra is not None else 0)
+
+    def __repr__(self):
+        return f"Expense({dict(self)!r})"
 
     def __str__(self):
         return f"{self.expense_id:<4}{self.date:<12}{self.category:<20}{self.amount:<10.2f}{self.description}"
 
 
+_FIELDS = ("expense_id", "amount", "category_id", "description", "user_id", "date")
+_SLOTS = frozenset(("expense_id", "category_id", "description", "user_id"))
+
+
 class Category:
     _id_counter = itertools.count(1)
     def __init__(self, name: str, user_id: int, category_id=None):
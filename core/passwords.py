@@ -0,0 +1,84 @@
+# passwords.py - Salted Password Hashing with a Tunable Key-Derivation Function
+import base64
+import hashlib
+import hmac
+import os
+import re
+
+# Algorithm used for new hashes: "scrypt" (if this Python's OpenSSL supports it) or "pbkdf2_sha256".
+KDF = os.environ.get("CHACHING_KDF", "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256")
+# Cost settings. Raise them until a login takes ~100-250 ms on the target machine;
+# python -m benchmarks.bench_passwords reports the latency of each setting.
+SCRYPT_N = int(os.environ.get("CHACHING_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = int(os.environ.get("CHACHING_PBKDF2_ITERATIONS", "600000"))
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Hashes written before the KDF was introduced: unsalted SHA-256 hex digests.
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL refuses unless maxmem covers the 128*n*r bytes scrypt needs
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=KEY_BYTES)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=KEY_BYTES)
+
+
+def hash_password(password, kdf=None, cost=None):
+    """
+    Hashes the password with a random salt. The result records the algorithm and cost:
+    "scrypt$<n>$<r>$<p>$<salt>$<key>" or "pbkdf2_sha256$<iterations>$<salt>$<key>".
+    """
+    kdf = kdf or KDF
+    salt = os.urandom(SALT_BYTES)
+    if kdf == "scrypt":
+        n = cost or SCRYPT_N
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(_scrypt(password, salt, n, SCRYPT_R, SCRYPT_P))}"
+    if kdf == "pbkdf2_sha256":
+        iterations = cost or PBKDF2_ITERATIONS
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(_pbkdf2(password, salt, iterations))}"
+    raise ValueError(f"Unknown password KDF: {kdf}")
+
+
+def verify_password(stored_password, input_password):
+    """Checks a password against any supported hash format, in constant time."""
+    if _LEGACY_SHA256.fullmatch(stored_password):
+        candidate = hashlib.sha256(input_password.encode()).hexdigest()
+        return hmac.compare_digest(stored_password, candidate)
+    parts = stored_password.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+        candidate = _scrypt(input_password, _unb64(parts[4]), n, r, p)
+    elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        candidate = _pbkdf2(input_password, _unb64(parts[2]), int(parts[1]))
+    else:
+        raise ValueError("Unrecognised password hash format.")
+    return hmac.compare_digest(_unb64(parts[-1]), candidate)
+
+
+def is_hashed(stored_password):
+    """True if the stored value is a password hash rather than a plain-text password."""
+    return bool(_LEGACY_SHA256.fullmatch(stored_password)) \
+        or stored_password.startswith(("scrypt$", "pbkdf2_sha256$"))
+
+
+def needs_rehash(stored_password):
+    """True if the hash is legacy SHA-256 or was made with a different algorithm or cost than the current one."""
+    parts = stored_password.split("$")
+    if KDF == "scrypt":
+        return parts[:4] != ["scrypt", str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    return parts[:2] != ["pbkdf2_sha256", str(PBKDF2_ITERATIONS)]
@@ -0,0 +1,47 @@
+# queries.py - Expense Queries Served by the Active Storage Backend
+from core.file_manager import sqlite_store
+from core.categories import category_name, category_usage
+from core.expense_store import get_store
+
+
+def month_expenses(user_id, month):
+    """Returns a user's expenses whose date starts with `month` (YYYY-MM). An empty month matches all."""
+    store = sqlite_store(user_id)
+    if store:
+        return store.month_expenses(str(user_id), month)
+    return get_store(user_id).month_expenses(month)
+
+
+def category_totals(user_id, month):
+    """Returns {category name: total amount} for a user's expenses in `month`."""
+    store = sqlite_store(user_id)
+    if store:
+        return {category_name(cid): total for cid, total in store.category_totals(str(user_id), month).items()}
+    return get_store(user_id).category_totals(month)
+
+
+def month_totals(user_id, months):
+    """Returns {month: total amount} for each requested month."""
+    store = sqlite_store(user_id)
+    if store:
+        return store.month_totals(str(user_id), months)
+    expenses = get_store(user_id)
+    return {month: expenses.month_total(month) for month in months}
+
+
+def available_months(user_id):
+    """Returns the months (YYYY-MM) that have at least one expense, newest first."""
+    store = sqlite_store(user_id)
+    if store:
+        return store.available_months(str(user_id))
+    return get_store(user_id).months()[::-1]
+
+
+def used_categories():
+    """Returns the set of category ids referenced by any user's expenses, from the usage counts."""
+    return set(category_usage())
+
+
+def category_in_use(category_id):
+    """Returns True if any user's expense uses the category with this id; a usage-count lookup."""
+    return category_usage().get(category_id, 0) > 0
@@ -0,0 +1,65 @@
+# readonly.py - Read-Only Views over Cached Data
+from collections.abc import Mapping, Sequence
+
+
+def freeze(value):
+    """Wraps dicts and lists in read-only views. Scalars are returned unchanged."""
+    if isinstance(value, dict):
+        return ReadOnlyDict(value)
+    if isinstance(value, list):
+        return ReadOnlyList(value)
+    return value
+
+
+def thaw(value):
+    """Returns a plain, mutable copy of a value that may contain read-only views."""
+    if isinstance(value, (dict, ReadOnlyDict)):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, ReadOnlyList)):
+        return [thaw(v) for v in value]
+    return value
+
+
+class ReadOnlyDict(Mapping):
+    """A lazy, read-only view of a dict. Nested containers are wrapped on access."""
+    __slots__ = ("_data",)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        return freeze(self._data[key])
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __repr__(self):
+        return f"ReadOnlyDict({self._data!r})"
+
+
+class ReadOnlyList(Sequence):
+    """A lazy, read-only view of a list. Nested containers are wrapped on access."""
+    __slots__ = ("_data",)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ReadOnlyList(self._data[index])
+        return freeze(self._data[index])
+
+    def __iter__(self):
+        return map(freeze, self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"ReadOnlyList({self._data!r})"
@@ -0,0 +1,116 @@
+# reports.py - Month-End Spend Reports for Every User, Built in Parallel Worker Processes
+import csv
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core import file_manager
+from core.categories import category_names, UNKNOWN_CATEGORY
+from core.csv_import import COLUMNS
+
+REPORTS_DIR = os.path.join(file_manager.BASE_DIR, 'data', 'reports')
+# Users handed to a worker process at a time; large enough that process overhead is amortized
+REPORT_BATCH = 50
+# Worker processes; 0 means one per CPU core
+REPORT_WORKERS = int(os.environ.get("CHACHING_REPORT_WORKERS", "0"))
+# Seconds to wait for queued saves to reach disk before the workers read it
+REPORT_SYNC_TIMEOUT = 30
+
+
+def _init_worker(mode, paths):
+    # Workers are spawned, never forked (the parent runs the writer and Tk threads and may
+    # hold an open SQLite connection), so they start from a fresh import: point them at
+    # the parent's files and storage mode before anything reads them.
+    file_manager.use_data_paths(**paths)
+    file_manager.set_storage_mode(mode, carry_over=False)
+
+
+def _user_report(user, month, names, out_dir):
+    """Writes one user's expenses for `month` (every month if None) to CSV and returns their totals."""
+    content = file_manager.load_user_data(user["user_id"], readonly=True)
+    categories = {}
+    total, count = 0.0, 0
+    path = os.path.join(out_dir, f"user_{user['user_id']}.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        expenses = content["expenses"]
+        if month is not None:
+            expenses = [exp for exp in expenses if exp["date"].startswith(month)]
+        for exp in sorted(expenses, key=lambda exp: exp["date"]):
+            cell = categories.setdefault(exp["category_id"], [0.0, 0])
+            cell[0] += exp["amount"]
+            cell[1] += 1
+            total += exp["amount"]
+            count += 1
+            writer.writerow([exp["date"], names.get(exp["category_id"], UNKNOWN_CATEGORY), f"{exp['amount']:.2f}",
+                             exp["description"]])
+    return {"user_id": user["user_id"], "username": user["username"], "total": total, "count": count,
+            "categories": categories, "budget": content["budgets"].get(month) if month else None, "file": path}
+
+
+def _report_batch(users, month, names, out_dir):
+    """Runs in a worker process: the reports of a batch of users."""
+    return [_user_report(user, month, names, out_dir) for user in users]
+
+
+def _write_summaries(out_dir, users, categories, names):
+    with open(os.path.join(out_dir, "summary.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["User ID", "Username", "Expenses", "Total", "Budget", "Over Budget"])
+        for report in users:
+            budget = report["budget"]
+            writer.writerow([report["user_id"], report["username"], report["count"], f"{report['total']:.2f}",
+                             "" if budget is None else f"{budget:.2f}",
+                             "" if budget is None else ("yes" if report["total"] > budget else "no")])
+    with open(os.path.join(out_dir, "categories.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Category", "Expenses", "Total"])
+        for cid, (total, count) in sorted(categories.items(), key=lambda item: -item[1][0]):
+            writer.writerow([names.get(cid, UNKNOWN_CATEGORY), count, f"{total:.2f}"])
+
+
+def build_report(month=None, out_dir=None, workers=None, progress=None):
+    """
+    Builds the spend report for `month` (YYYY-MM, or every month if None) across all users:
+    one CSV of expenses per user plus summary.csv (per user, with their budget) and
+    categories.csv (all users per category) in `out_dir`, by default data/reports/<month>.
+    Users are split into batches that worker processes aggregate and write in parallel;
+    the results are merged here. `progress(done, total)` is called as users finish.
+    Returns {"dir", "users": [per-user totals], "categories": {category_id: [total, count]}, "total", "count"};
+    categories are keyed by id, so deleted categories (all named UNKNOWN_CATEGORY) stay apart.
+    """
+    out_dir = out_dir or os.path.join(REPORTS_DIR, month or "all")
+    os.makedirs(out_dir, exist_ok=True)
+    if not file_manager.sync(REPORT_SYNC_TIMEOUT):  # the workers read what is on disk
+        raise IOError("Saved changes could not be written to disk yet, so the report would miss them.")
+    users = [{"user_id": user["user_id"], "username": user["username"]}
+             for user in file_manager.load_global(readonly=True).get("users", []) if user.get("role") != "admin"]
+    names = category_names()
+    batches = [users[i:i + REPORT_BATCH] for i in range(0, len(users), REPORT_BATCH)]
+    workers = workers or REPORT_WORKERS or os.cpu_count() or 1
+
+    reports = []
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(batches), 1)),
+                             mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+                             initargs=(file_manager.STORAGE_MODE, file_manager.data_paths())) as pool:
+        futures = [pool.submit(_report_batch, batch, month, names, out_dir) for batch in batches]
+        for future in as_completed(futures):
+            reports.extend(future.result())
+            if progress is not None:
+                progress(len(reports), len(users))
+
+    reports.sort(key=lambda report: report["user_id"])
+    categories = {}
+    for report in reports:
+        for cid, (total, count) in report["categories"].items():
+            cell = categories.setdefault(cid, [0.0, 0])
+            cell[0] += total
+            cell[1] += count
+    _write_summaries(out_dir, reports, categories, names)
+    total = sum(report["total"] for report in reports)
+    count = sum(report["count"] for report in reports)
+    logging.info(f"Report for {month or 'all months'}: {len(reports)} users, {count} expenses, "
+                 f"${total:.2f}, written to {out_dir}.")
+    return {"dir": out_dir, "users": reports, "total": total, "count": count,
+            "categories": categories}
@@ -0,0 +1,135 @@
+# shards.py - Per-User Sharded JSON Storage
+import os
+import logging
+from core import codec
+from core.atomic import atomic_write_json
+
+GLOBAL_FILE = "global.json"
+USER_FILE_PREFIX = "user_"
+
+# Sections that live in a user's shard; everything else goes to the global file.
+# "expense_seq" holds the highest expense_id ever handed out to the user; "totals" holds
+# their running expense totals as {month: {category_id: [total, count]}} (empty = not computed).
+USER_SECTIONS = ("expenses", "budgets", "expense_seq", "totals")
+
+
+def empty_user_content():
+    return {"expenses": [], "budgets": {}, "expense_seq": 0, "totals": {}}
+
+
+class ShardedStore:
+    """
+    Stores users and categories in one small global file and each user's
+    expenses and budgets in their own file, so a save only rewrites the shards it touched.
+    Parsed files are cached and re-read only when their stat changes.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.global_path = os.path.join(directory, GLOBAL_FILE)
+        self._files = {}  # path -> (stamp, parsed content)
+
+    def exists(self):
+        return os.path.exists(self.global_path)
+
+    def user_path(self, user_id):
+        return os.path.join(self.directory, f"{USER_FILE_PREFIX}{user_id}.json")
+
+    @staticmethod
+    def _stamp(st):
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _read(self, path, default):
+        try:
+            stamp = self._stamp(os.stat(path))
+        except FileNotFoundError:
+            self._files.pop(path, None)
+            return default()
+        cached = self._files.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        content = codec.load_file(path)
+        self._files[path] = (stamp, content)
+        return content
+
+    def _write(self, path, content):
+        atomic_write_json(path, content)
+        self._files[path] = (self._stamp(os.stat(path)), content)
+
+    def _remove(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        self._files.pop(path, None)
+
+    def user_ids(self):
+        """Lists the user ids that have a shard, as strings."""
+        ids = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith(USER_FILE_PREFIX) and name.endswith(".json"):
+                    ids.append(name[len(USER_FILE_PREFIX):-len(".json")])
+        return ids
+
+    def stamp(self):
+        """Identifies the state of every shard by name, mtime, size and inode."""
+        with os.scandir(self.directory) as entries:
+            return tuple(sorted((e.name, self._stamp(e.stat())) for e in entries if e.name.endswith(".json")))
+
+    def load_global(self):
+        return self._read(self.global_path, lambda: {"users": [], "categories": {}})
+
+    def load_user(self, user_id):
+        return self._read(self.user_path(user_id), empty_user_content)
+
+    def save_global(self, content):
+        self._write(self.global_path, content)
+
+    def save_user(self, user_id, content):
+        if not any(content.get(section) for section in USER_SECTIONS):
+            self._remove(self.user_path(user_id))
+        else:
+            self._write(self.user_path(user_id), content)
+
+    def load_all(self):
+        """Assembles the monolithic data structure from the global file and every user shard."""
+        data = dict(self.load_global())
+        for section in USER_SECTIONS:
+            data[section] = {}
+        for uid in self.user_ids():
+            shard = self.load_user(uid)
+            for section in USER_SECTIONS:
+                if shard.get(section):
+                    data[section][uid] = shard[section]
+        return data
+
+    def save_all(self, data):
+        """Writes only the global file and user shards whose content differs from disk."""
+        global_content = {k: v for k, v in data.items() if k not in USER_SECTIONS}
+        if self.load_global() != global_content:
+            self.save_global(global_content)
+
+        empty = empty_user_content()
+        uids = set(self.user_ids())
+        for section in USER_SECTIONS:
+            uids.update(data.get(section, {}))
+        written = 0
+        for uid in uids:
+            content = {section: data.get(section, {}).get(uid, empty[section]) for section in USER_SECTIONS}
+            current = self.load_user(uid)
+            if all(current.get(section) is content[section] for section in USER_SECTIONS):
+                continue
+            if {section: current.get(section, empty[section]) for section in USER_SECTIONS} != content:
+                self.save_user(uid, content)
+                written += 1
+        return written
+
+    def migrate(self, data):
+        """One-shot split of a monolithic data structure into shards."""
+        os.makedirs(self.directory, exist_ok=True)
+        for uid in self.user_ids():
+            self._remove(self.user_path(uid))
+        self.save_all(data)
+        if not self.exists():
+            self.save_global({k: v for k, v in data.items() if k not in USER_SECTIONS})
+        logging.info(f"Migrated data into {len(self.user_ids())} user shard(s) under {self.directory}.")
@@ -0,0 +1,356 @@
+# sqlite_store.py - SQLite Storage Backend with Indexed Expense Queries
+import json
+import os
+import sqlite3
+import logging
+import threading
+from core.journal import diff_data
+from core.shards import USER_SECTIONS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id  INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    role     TEXT NOT NULL,
+    extra    TEXT
+);
+CREATE TABLE IF NOT EXISTS categories (
+    cat_key     TEXT PRIMARY KEY,
+    category_id INTEGER,
+    name        TEXT NOT NULL,
+    user_id     INTEGER,
+    extra       TEXT
+);
+CREATE TABLE IF NOT EXISTS expenses (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id     TEXT NOT NULL,
+    expense_id  INTEGER,
+    date        TEXT NOT NULL,
+    category_id INTEGER NOT NULL,
+    amount      REAL NOT NULL,
+    description TEXT NOT NULL,
+    extra       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_id ON expenses (user_id, expense_id);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user_id, date);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_category ON expenses (user_id, category_id);
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses (category_id);
+CREATE TABLE IF NOT EXISTS budgets (
+    user_id TEXT NOT NULL,
+    period  TEXT NOT NULL,
+    amount  REAL NOT NULL,
+    PRIMARY KEY (user_id, period)
+);
+CREATE TABLE IF NOT EXISTS expense_seq (
+    user_id TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS expense_totals (
+    user_id     TEXT NOT NULL,
+    month       TEXT NOT NULL,
+    category_id INTEGER NOT NULL,
+    total       REAL NOT NULL,
+    count       INTEGER NOT NULL,
+    PRIMARY KEY (user_id, month, category_id)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+USER_COLUMNS = ("user_id", "username", "password", "role")
+CATEGORY_COLUMNS = ("category_id", "name", "user_id")
+EXPENSE_COLUMNS = ("expense_id", "date", "category_id", "amount", "description", "user_id")
+
+
+def _split(record, columns):
+    """Splits a record into known column values and a JSON blob of any other fields."""
+    extra = {k: v for k, v in record.items() if k not in columns}
+    return [record.get(c) for c in columns], json.dumps(extra) if extra else None
+
+
+def _join(columns, values, extra):
+    record = dict(zip(columns, values))
+    if extra:
+        record.update(json.loads(extra))
+    return record
+
+
+def _upgrade(conn):
+    """
+    Moves a database written when expenses stored their category's name onto category ids.
+    Names without a category row get one; stored totals are dropped and recomputed on load.
+    """
+    if "category" not in {row[1] for row in conn.execute("PRAGMA table_info(expenses)")}:
+        return
+    with conn:
+        conn.execute("BEGIN")
+        known = dict(conn.execute("SELECT name, category_id FROM categories"))
+        next_id = max(known.values(), default=0) + 1
+        for (name,) in conn.execute("SELECT category FROM expenses GROUP BY category ORDER BY MIN(seq)").fetchall():
+            if name not in known:
+                conn.execute("INSERT INTO categories (cat_key, category_id, name) VALUES (?, ?, ?)",
+                             (str(next_id), next_id, name))
+                known[name] = next_id
+                next_id += 1
+        conn.execute("CREATE TABLE expenses_by_id (seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+                     "expense_id INTEGER, date TEXT NOT NULL, category_id INTEGER NOT NULL, "
+                     "amount REAL NOT NULL, description TEXT NOT NULL, extra TEXT)")
+        conn.execute("INSERT INTO expenses_by_id (seq, user_id, expense_id, date, category_id, amount, description, extra) "
+                     "SELECT seq, user_id, expense_id, date, (SELECT category_id FROM categories "
+                     "WHERE name = expenses.category ORDER BY rowid LIMIT 1), amount, description, extra "
+                     "FROM expenses")
+        conn.execute("DROP TABLE expenses")  # its indexes go with it and are recreated by SCHEMA
+        conn.execute("ALTER TABLE expenses_by_id RENAME TO expenses")
+        conn.execute("DROP TABLE IF EXISTS expense_totals")
+    logging.info("SQLite database upgraded to category ids.")
+
+
+def _month_bounds(month):
+    """Turns a YYYY-MM prefix into a [start, end) date range usable by the (user_id, date) index."""
+    return month, month + "\uffff"
+
+
+class SQLiteStore:
+    """
+    Stores the same users/expenses/categories/budgets structure in SQLite.
+    Change records (see apply) are written as row-level statements keyed by id, whole-document
+    saves are first diffed into them, and month/category filters run as indexed queries
+    instead of Python scans.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # One connection per thread, so the background writer's open transaction
+        # never leaks into reads on the UI thread
+        self._local = threading.local()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            _upgrade(conn)
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Closes the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------------------------------------------ loading
+
+    def _users(self):
+        rows = self.conn.execute("SELECT user_id, username, password, role, extra FROM users ORDER BY rowid")
+        return [_join(USER_COLUMNS, row[:4], row[4]) for row in rows]
+
+    def _categories(self):
+        rows = self.conn.execute(
+            "SELECT cat_key, category_id, name, user_id, extra FROM categories ORDER BY rowid")
+        return {row[0]: _join(CATEGORY_COLUMNS, row[1:4], row[4]) for row in rows}
+
+    def _expenses(self, where="", params=()):
+        rows = self.conn.execute(
+            "SELECT expense_id, date, category_id, amount, description, CAST(user_id AS INTEGER), extra "
+            f"FROM expenses {where} ORDER BY seq", params)
+        return [_join(EXPENSE_COLUMNS, row[:6], row[6]) for row in rows]
+
+    def _budgets(self, uid):
+        rows = self.conn.execute("SELECT period, amount FROM budgets WHERE user_id = ? ORDER BY rowid", (uid,))
+        return dict(rows.fetchall())
+
+    def expense_seq(self, uid):
+        """The highest expense_id ever handed out to the user."""
+        row = self.conn.execute("SELECT last_id FROM expense_seq WHERE user_id = ?", (uid,)).fetchone()
+        return row[0] if row else 0
+
+    def _totals(self, uid):
+        totals = {}
+        for month, category_id, total, count in self.conn.execute(
+                "SELECT month, category_id, total, count FROM expense_totals WHERE user_id = ? ORDER BY rowid", (uid,)):
+            totals.setdefault(month, {})[str(category_id)] = [total, count]
+        return totals
+
+    def load_global(self):
+        data = {"users": self._users(), "categories": self._categories()}
+        for name, value in self.conn.execute("SELECT name, value FROM sections"):
+            data[name] = json.loads(value)
+        return data
+
+    def load_user(self, uid):
+        return {"expenses": self._expenses("WHERE user_id = ?", (uid,)), "budgets": self._budgets(uid),
+                "expense_seq": self.expense_seq(uid), "totals": self._totals(uid)}
+
+    def load_all(self):
+        data = self.load_global()
+        data["expenses"] = {}
+        for exp_uid in [r[0] for r in self.conn.execute("SELECT DISTINCT user_id FROM expenses")]:
+            data["expenses"][exp_uid] = self._expenses("WHERE user_id = ?", (exp_uid,))
+        data["budgets"] = {}
+        for budget_uid in [r[0] for r in self.conn.execute("SELECT DISTINCT user_id FROM budgets")]:
+            data["budgets"][budget_uid] = self._budgets(budget_uid)
+        data["expense_seq"] = dict(self.conn.execute("SELECT user_id, last_id FROM expense_seq").fetchall())
+        data["totals"] = {}
+        for totals_uid in [r[0] for r in self.conn.execute("SELECT DISTINCT user_id FROM expense_totals")]:
+            data["totals"][totals_uid] = self._totals(totals_uid)
+        return data
+
+    # ------------------------------------------------------------------ saving
+
+    def _insert_expense(self, uid, record):
+        values, extra = _split(record, EXPENSE_COLUMNS)
+        self.conn.execute(
+            "INSERT INTO expenses (expense_id, date, category_id, amount, description, user_id, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", values[:5] + [uid, extra])
+
+    def _insert_totals(self, uid, month, cells):
+        self.conn.executemany("INSERT INTO expense_totals (user_id, month, category_id, total, count) "
+                              "VALUES (?, ?, ?, ?, ?)",
+                              [(uid, month, int(category_id), total, count)
+                               for category_id, (total, count) in cells.items()])
+
+    def _apply(self, record):
+        op, table, key = record["op"], record["table"], record["key"]
+        value = record.get("value")
+        c = self.conn
+
+        if table == "users":
+            if op == "set":
+                c.execute("DELETE FROM users")
+                for user in value:
+                    self._apply({"op": "put", "table": "users", "key": [user["user_id"]], "value": user})
+            elif op == "put":
+                values, extra = _split(value, USER_COLUMNS)
+                c.execute("INSERT INTO users (user_id, username, password, role, extra) VALUES (?, ?, ?, ?, ?) "
+                          "ON CONFLICT (user_id) DO UPDATE SET username = excluded.username, "
+                          "password = excluded.password, role = excluded.role, extra = excluded.extra",
+                          values + [extra])
+            else:
+                c.execute("DELETE FROM users WHERE user_id = ?", (key[0],))
+        elif table == "categories":
+            if op == "put":
+                values, extra = _split(value, CATEGORY_COLUMNS)
+                c.execute("INSERT INTO categories (cat_key, category_id, name, user_id, extra) "
+                          "VALUES (?, ?, ?, ?, ?) ON CONFLICT (cat_key) DO UPDATE SET "
+                          "category_id = excluded.category_id, name = excluded.name, "
+                          "user_id = excluded.user_id, extra = excluded.extra", [key[0]] + values + [extra])
+            else:
+                c.execute("DELETE FROM categories WHERE cat_key = ?", (key[0],))
+        elif table == "expenses":
+            uid = key[0]
+            if len(key) == 1:
+                c.execute("DELETE FROM expenses WHERE user_id = ?", (uid,))
+                for exp in value or []:
+                    self._insert_expense(uid, exp)
+            elif op == "put":
+                values, extra = _split(value, EXPENSE_COLUMNS)
+                updated = c.execute(
+                    "UPDATE expenses SET date = ?, category_id = ?, amount = ?, description = ?, extra = ? "
+                    "WHERE user_id = ? AND expense_id = ?", values[1:5] + [extra, uid, key[1]]).rowcount
+                if not updated:
+                    self._insert_expense(uid, value)
+            else:
+                c.execute("DELETE FROM expenses WHERE user_id = ? AND expense_id = ?", (uid, key[1]))
+        elif table == "budgets":
+            uid = key[0]
+            if len(key) == 1:
+                c.execute("DELETE FROM budgets WHERE user_id = ?", (uid,))
+                for period, amount in (value or {}).items():
+                    c.execute("INSERT INTO budgets (user_id, period, amount) VALUES (?, ?, ?)", (uid, period, amount))
+            elif op == "put":
+                c.execute("INSERT INTO budgets (user_id, period, amount) VALUES (?, ?, ?) "
+                          "ON CONFLICT (user_id, period) DO UPDATE SET amount = excluded.amount",
+                          (uid, key[1], value))
+            else:
+                c.execute("DELETE FROM budgets WHERE user_id = ? AND period = ?", (uid, key[1]))
+        elif table == "expense_seq":
+            if op == "put":
+                c.execute("INSERT INTO expense_seq (user_id, last_id) VALUES (?, ?) "
+                          "ON CONFLICT (user_id) DO UPDATE SET last_id = excluded.last_id", (key[0], value))
+            else:
+                c.execute("DELETE FROM expense_seq WHERE user_id = ?", (key[0],))
+        elif table == "totals":
+            uid = key[0]
+            if len(key) == 1:
+                c.execute("DELETE FROM expense_totals WHERE user_id = ?", (uid,))
+                for month, cells in (value or {}).items():
+                    self._insert_totals(uid, month, cells)
+            else:
+                c.execute("DELETE FROM expense_totals WHERE user_id = ? AND month = ?", (uid, key[1]))
+                if op == "put":
+                    self._insert_totals(uid, key[1], value)
+        else:
+            if op == "del":
+                c.execute("DELETE FROM sections WHERE name = ?", (table,))
+            else:
+                c.execute("INSERT INTO sections (name, value) VALUES (?, ?) "
+                          "ON CONFLICT (name) DO UPDATE SET value = excluded.value", (table, json.dumps(value)))
+
+    def apply(self, records):
+        """Applies change records (as produced by journal.diff_data) in a single transaction."""
+        if not records:
+            return
+        with self.conn:
+            for record in records:
+                self._apply(record)
+
+    def save_all(self, old, new):
+        self.apply(diff_data(old, new))
+
+    def save_user(self, uid, content):
+        """
+        Replaces one user's sections with `content`, diffed against their current rows.
+        Edits of single expenses or budgets go through apply() instead and never read the rest.
+        """
+        current = self.load_user(uid)
+        old = {section: {uid: current[section]} for section in USER_SECTIONS}
+        new = {section: {uid: content.get(section, current[section])} for section in USER_SECTIONS}
+        self.apply(diff_data(old, new))
+
+    def save_global(self, content):
+        self.apply(diff_data(self.load_global(), content))
+
+    def migrate(self, data):
+        """One-shot import of a monolithic data structure into an empty database."""
+        with self.conn:
+            for table in ("users", "categories", "expenses", "budgets", "expense_seq", "expense_totals", "sections"):
+                self.conn.execute(f"DELETE FROM {table}")
+        self.apply(diff_data({}, data))
+        logging.info(f"Migrated data into SQLite database {self.path}.")
+
+    # ------------------------------------------------------------------ queries
+
+    def month_expenses(self, uid, month):
+        start, end = _month_bounds(month)
+        return self._expenses("WHERE user_id = ? AND date >= ? AND date < ?", (uid, start, end))
+
+    def category_totals(self, uid, month):
+        """{category_id: total} for one user's month."""
+        start, end = _month_bounds(month)
+        rows = self.conn.execute(
+            "SELECT category_id, SUM(amount) FROM expenses WHERE user_id = ? AND date >= ? AND date < ? "
+            "GROUP BY category_id ORDER BY MIN(seq)", (uid, start, end))
+        return dict(rows.fetchall())
+
+    def month_totals(self, uid, months):
+        totals = {}
+        for month in months:
+            start, end = _month_bounds(month)
+            row = self.conn.execute("SELECT COALESCE(SUM(amount), 0) FROM expenses "
+                                    "WHERE user_id = ? AND date >= ? AND date < ?", (uid, start, end)).fetchone()
+            totals[month] = row[0]
+        return totals
+
+    def available_months(self, uid):
+        rows = self.conn.execute("SELECT DISTINCT substr(date, 1, 7) FROM expenses WHERE user_id = ? "
+                                 "ORDER BY 1 DESC", (uid,))
+        return [r[0] for r in rows]
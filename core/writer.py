@@ -0,0 +1,90 @@
+# writer.py - Background Writer Thread for Write-Behind Persistence
+import collections
+import logging
+import threading
+
+
+class BackgroundWriter:
+    """
+    Runs disk writes on a single daemon thread, strictly in submission order.
+    A failing write is retried with backoff and blocks the writes queued after it,
+    so the files on disk never see a later change without the earlier ones.
+    """
+
+    def __init__(self, retry_delay=1.0, max_retry_delay=30.0):
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.last_error = None
+        self._queue = collections.deque()  # (task, coalesce_key)
+        self._cond = threading.Condition()
+        self._busy = False
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="cha-ching-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, task, coalesce_key=None):
+        """
+        Queues `task` for the writer thread. If the last queued task has the same
+        `coalesce_key` it already covers this one, so nothing new is queued.
+        """
+        with self._cond:
+            if coalesce_key is not None and self._queue and self._queue[-1][1] == coalesce_key:
+                return
+            self._queue.append((task, coalesce_key))
+            self._cond.notify_all()
+
+    def pending(self):
+        """Number of writes queued or in progress."""
+        with self._cond:
+            return len(self._queue) + (1 if self._busy else 0)
+
+    def wait(self, timeout=None):
+        """Blocks until every queued write has landed. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def stop(self, timeout=None):
+        """Drains the queue and stops the thread. Returns False (and keeps running) if writes are still pending."""
+        if not self.wait(timeout):
+            return False
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return True
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopping)
+                if self._stopping and not self._queue:
+                    return
+                # Taken off the queue while running so new submissions never coalesce into it
+                entry = self._queue.popleft()
+                self._busy = True
+            try:
+                entry[0]()
+            except Exception as e:
+                self.last_error = str(e) or e.__class__.__name__
+                logging.exception(f"Background write failed; retrying in {delay:.0f}s.")
+                with self._cond:
+                    self._queue.appendleft(entry)
+                    self._busy = False
+                    self._cond.notify_all()
+                    self._cond.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            delay = self.retry_delay
+            self.last_error = None
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
@@ -3,14 +3,22 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import logging
-from core.file_manager import load_data, save_data
+import datetime
+import threading
+from core.file_manager import load_global, put_category, delete_category, reserve_category_id
+from core.queries import category_in_use
+from core.reports import build_report
 from .base_dashboard import BaseDashboard
 from ui.landing import build_landing_content
 
+# Milliseconds between progress checks of a running report
+REPORT_POLL_MS = 200
+
+
 class AdminDashboard(BaseDashboard):
     """
-    Admin dashboard for category management.
-    Enables category creation, editing, and deletion.
+    Admin dashboard for category management and reports.
+    Enables category creation, editing, and deletion, and month-end spend reports across all users.
     """
     def __init__(self, parent, controller):
         super().__init__(parent, controller)
@@ -28,6 +36,7 @@ class AdminDashboard(BaseDashboard):
             return btn
 
         self.nav_actions["Categories"] = create_nav_item("\U0001F4C1", "Categories", self.manage_categories)
+        self.nav_actions["Reports"] = create_nav_item("\U0001F4CA", "Reports", self.reports)
 
     def manage_categories(self):
         """
@@ -36,7 +45,7 @@ class AdminDashboard(BaseDashboard):
         logger = logging.getLogger(__name__)
         self.clear_content()
         user = self.controller.auth.get_current_user()
-        data = load_data()
+        data = load_global()
         logger.info(f"[{user.username}] opened Category Management dashboard.")
 
         wrapper = ttk.Frame(self.content_frame)
@@ -108,14 +117,9 @@ class AdminDashboard(BaseDashboard):
                     messagebox.showerror("Error", "Category already exists.")
                     return
 
-                # Update category name and all related expenses
+                # Expenses refer to the category by id, so only its own record changes
                 categories[cid]['name'] = new_name
-                for uid, exps in data.get("expenses", {}).items():
-                    for exp in exps:
-                        if exp["category"] == old_name:
-                            exp["category"] = new_name
-
-                save_data(data)
+                put_category(categories[cid])
                 refresh_table()
                 logger.info(f"[{user.username}] renamed category '{old_name}' to '{new_name}'")
                 messagebox.showinfo("Updated", "Category updated successfully.")
@@ -136,15 +140,14 @@ class AdminDashboard(BaseDashboard):
 
             cid = selected[0]
             cat_name = categories[cid]["name"]
-            used = any(exp["category"] == cat_name for exps in data.get("expenses", {}).values() for exp in exps)
-            if used:
+            if category_in_use(int(cid)):
                 logger.warning(f"[{user.username}] tried deleting category in use: {cat_name}")
                 messagebox.showerror("Blocked", f"Category '{cat_name}' is used in expenses.")
                 return
 
             if messagebox.askyesno("Confirm", f"Delete category '{cat_name}'?"):
                 del categories[cid]
-                save_data(data)
+                delete_category(cid)
                 refresh_table()
                 logger.info(f"[{user.username}] deleted category ID {cid}: '{cat_name}'")
                 messagebox.showinfo("Deleted", "Category deleted.")
@@ -172,15 +175,15 @@ class AdminDashboard(BaseDashboard):
                 messagebox.showerror("Error", "Category already exists.")
                 return
 
-            new_id = max(map(int, categories.keys()), default=0) + 1
+            new_id = reserve_category_id()
             categories[str(new_id)] = {
                 "category_id": new_id,
                 "name": name,
                 "user_id": user.user_id
             }
-            save_data(data)
+            put_category(categories[str(new_id)])
             categories.clear()
-            categories.update(load_data().get("categories", {}))
+            categories.update(load_global().get("categories", {}))
             new_cat_var.set("")
             refresh_table()
             logger.info(f"[{user.username}] created new category ID {new_id}: '{name}'")
@@ -189,6 +192,102 @@ class AdminDashboard(BaseDashboard):
         ttk.Button(create_frame, text="Create", style="Accent.TButton", command=create_category).grid(row=1, column=1, padx=10)
         refresh_table()
 
+    def reports(self):
+        """
+        Builds spend reports across every user for a month (or all time) in worker processes,
+        without blocking the window, and lists the per-user totals.
+        """
+        logger = logging.getLogger(__name__)
+        self.clear_content()
+        user = self.controller.auth.get_current_user()
+
+        wrapper = ttk.Frame(self.content_frame)
+        wrapper.pack(fill="both", expand=True, padx=40, pady=30)
+        wrapper.columnconfigure(0, weight=1)
+        wrapper.rowconfigure(3, weight=1)
+        ttk.Label(wrapper, text="\U0001F4CA Spend Reports", font=("Segoe UI", 20, "bold")).grid(row=0, column=0, pady=(0, 20), sticky="w")
+
+        form = ttk.Frame(wrapper)
+        form.grid(row=1, column=0, sticky="w")
+        ttk.Label(form, text="Month (YYYY-MM, blank for all):", font=("Segoe UI", 12)).pack(side="left")
+        month_var = tk.StringVar(value=datetime.datetime.now().strftime("%Y-%m"))
+        ttk.Entry(form, textvariable=month_var, font=("Segoe UI", 11), width=10).pack(side="left", padx=10)
+        build_btn = ttk.Button(form, text="Build Report", style="Accent.TButton")
+        build_btn.pack(side="left")
+
+        status_frame = ttk.Frame(wrapper)
+        status_frame.grid(row=2, column=0, pady=10, sticky="ew")
+        progress = ttk.Progressbar(status_frame, length=300, maximum=100, mode="determinate")
+        progress.pack(side="left")
+        status = ttk.Label(status_frame, text="", font=("Segoe UI", 10))
+        status.pack(side="left", padx=10)
+
+        table_frame = ttk.Frame(wrapper)
+        table_frame.grid(row=3, column=0, sticky="nsew")
+        columns = ("User", "Expenses", "Total", "Budget")
+        tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=12)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=200 if col == "User" else 120, anchor="w" if col == "User" else "e")
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+
+        def run():
+            month = month_var.get().strip() or None
+            if month is not None:
+                try:
+                    datetime.datetime.strptime(month, "%Y-%m")
+                except ValueError:
+                    messagebox.showerror("Invalid Month", "Please enter the month as YYYY-MM.")
+                    return
+            job = {"done": 0, "total": 0, "result": None, "error": None}
+
+            def progress_cb(done, total):
+                job["done"], job["total"] = done, total
+
+            def work():
+                try:
+                    job["result"] = build_report(month, progress=progress_cb)
+                except Exception as e:
+                    logger.exception("Report failed:")
+                    job["error"] = e
+
+            build_btn.state(["disabled"])
+            tree.delete(*tree.get_children())
+            status.config(text="Building report…")
+            worker = threading.Thread(target=work, name="report", daemon=True)
+            worker.start()
+            logger.info(f"[{user.username}] started a report for {month or 'all months'}.")
+
+            def poll():
+                if not tree.winfo_exists():
+                    return
+                if worker.is_alive():
+                    if job["total"]:
+                        progress["value"] = job["done"] * 100 / job["total"]
+                        status.config(text=f"{job['done']} of {job['total']} users")
+                    self.after(REPORT_POLL_MS, poll)
+                    return
+                build_btn.state(["!disabled"])
+                if job["error"] is not None:
+                    status.config(text="")
+                    messagebox.showerror("Error", f"Could not build the report: {job['error']}")
+                    return
+                result = job["result"]
+                progress["value"] = 100
+                for report in result["users"]:
+                    budget = report["budget"]
+                    tree.insert("", "end", values=(report["username"], report["count"], f"{report['total']:.2f}",
+                                                   "" if budget is None else f"{budget:.2f}"))
+                status.config(text=f"{len(result['users'])} users · {result['count']} expenses · "
+                                   f"${result['total']:.2f} · saved to {result['dir']}")
+
+            poll()
+
+        build_btn.config(command=run)
+
     def load_landing(self):
         """Loads the landing screen for admins (on clicking profile)."""
         self.clear_content()
@@ -2,6 +2,7 @@
 
 import tkinter as tk
 from tkinter import ttk
+from core.file_manager import write_status
 
 
 
@@ -28,6 +29,11 @@ class BaseDashboard(ttk.Frame):
         self.user_menu["menu"] = self.menu
         self.user_menu.pack(side="right", padx=10, pady=5)
 
+        # Save indicator, shown while the background writer has changes queued
+        self.save_status = ttk.Label(top_bar, text="", font=("Segoe UI", 10))
+        self.save_status.pack(side="right", padx=10)
+        self.poll_save_status()
+
         # Initial call to set the correct username after the dashboard is loaded
         self.update_user_menu()
 
@@ -41,6 +47,17 @@ class BaseDashboard(ttk.Frame):
         self.content_frame.grid(row=1, column=1, sticky="nsew")
         self.content_frame.grid_propagate(False)
 
+    def poll_save_status(self):
+        """Refreshes the save indicator every half second."""
+        pending, error = write_status()
+        if error:
+            self.save_status.config(text="⚠️ Save failed – retrying", foreground="red")
+        elif pending:
+            self.save_status.config(text=f"💾 Saving… ({pending})", foreground="#eeeeee")
+        else:
+            self.save_status.config(text="")
+        self.after(500, self.poll_save_status)
+
     def clear_content(self):
         """Clears all widgets in the main content area."""
         for widget in self.content_frame.winfo_children():
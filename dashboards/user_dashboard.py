@@ -3,18 +3,31 @@ import os
 from tkinter import ttk, messagebox, filedialog
 import datetime
 import logging
-import csv
 from tkcalendar import DateEntry
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.cm import get_cmap
-from core.file_manager import load_data, save_data
-from core.expenses import ExpenseTracker
+from core.file_manager import load_global, load_user_data, put_budget, reserve_expense_ids
+from core.models import Expense
+from core.queries import category_totals, available_months
+from core.categories import category_name, category_names
+from core.csv_import import CsvImport
+from core.csv_export import CsvExport
 from ui.landing import build_landing_content
+from ui.charts import ChartManager
 from dashboards.base_dashboard import BaseDashboard
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
+# Milliseconds the expense search waits after the last keystroke before running
+SEARCH_DELAY_MS = 250
+# Number of months averaged by the trend chart's moving-average line
+TREND_WINDOW = 3
+# Milliseconds between checks on a running CSV import
+IMPORT_POLL_MS = 100
+# Milliseconds between progress updates of a running CSV export
+EXPORT_POLL_MS = 100
+# Category filter entry that matches every category
+ALL_CATEGORIES = "All categories"
+# Rows rendered per page of the expense table
+TABLE_PAGE_SIZE = 100
 
 class UserDashboard(BaseDashboard):
     """
@@ -35,6 +48,7 @@ class UserDashboard(BaseDashboard):
         super().__init__(parent, controller)
         self.active_nav_item = None  # Track currently selected nav label
         self.nav_actions = {}
+        self.charts = ChartManager()  # summary/trend figures, freed whenever the content is cleared
 
         def create_nav_item(icon, text, command):
             """Creates a styled navigation button for the sidebar."""
@@ -79,8 +93,7 @@ class UserDashboard(BaseDashboard):
         """
         self.clear_content()
         user = self.controller.auth.get_current_user()
-        data = load_data()
-        categories = data.get("categories", {})
+        categories = load_global(readonly=True).get("categories", {})
         cat_options = [(cid, cat["name"]) for cid, cat in categories.items()]
 
         # Layout wrapper
@@ -133,19 +146,9 @@ class UserDashboard(BaseDashboard):
 
                 date = date_picker.get_date().strftime("%Y-%m-%d")
 
-                expense = {
-                    "expense_id": next(ExpenseTracker.expense_id_counter),
-                    "amount": amount,
-                    "category": cat_name,
-                    "description": desc,
-                    "user_id": user.user_id,
-                    "date": date
-                }
-
-                if str(user.user_id) not in data["expenses"]:
-                    data["expenses"][str(user.user_id)] = []
-                data["expenses"][str(user.user_id)].append(expense)
-                save_data(data)
+                expense = Expense(amount, cat_id, desc, user.user_id, date, reserve_expense_ids(user.user_id))
+
+                self.controller.current_tracker.expenses.add(expense)
                 logging.info(f"[User {user.user_id}] added expense: {amount:.2f}, {cat_name}, {desc[:30]}, {date}")
                 messagebox.showinfo("Success", "Expense added successfully.")
                 self.add_expense()
@@ -167,53 +170,73 @@ class UserDashboard(BaseDashboard):
 
     def view_expenses(self):
         # Clear previous content in the main frame
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        self.clear_content()
 
         import datetime
         from tkcalendar import DateEntry
 
         # Load user data
         user = self.controller.auth.get_current_user()
-        data = load_data()
-        full_expenses = data.get("expenses", {}).get(str(user.user_id), [])
+        store = self.controller.current_tracker.expenses
 
         # --- HEADER ---
         header = ttk.Label(self.content_frame, text="📄 View & Manage Expenses", font=("Segoe UI", 16, "bold"))
         header.pack(pady=(10, 5))
 
         # --- FILTER FRAME ---
-        filter_frame = ttk.LabelFrame(self.content_frame, text="📅 Filter by Month")
+        filter_frame = ttk.LabelFrame(self.content_frame, text="📅 Filter by Date")
         filter_frame.pack(padx=15, pady=10, fill="x")
 
-        # Set default month to current
-        month_var = tk.StringVar()
+        # Default range is the current month; a month (YYYY-MM) or year covers all its days
         default_month = datetime.datetime.now().strftime("%Y-%m")
-        month_var.set(default_month)
-
-        # Month Entry
-        ttk.Label(filter_frame, text="Month (YYYY-MM):").pack(side="left", padx=(10, 5), pady=10)
-        month_entry = ttk.Entry(filter_frame, textvariable=month_var, width=10)
-        month_entry.pack(side="left", padx=5, pady=10)
+        from_var = tk.StringVar(value=default_month)
+        to_var = tk.StringVar(value=default_month)
+
+        # Date range entries
+        ttk.Label(filter_frame, text="From:").pack(side="left", padx=(10, 5), pady=10)
+        ttk.Entry(filter_frame, textvariable=from_var, width=11).pack(side="left", padx=5, pady=10)
+        ttk.Label(filter_frame, text="To:").pack(side="left", padx=(5, 5), pady=10)
+        ttk.Entry(filter_frame, textvariable=to_var, width=11).pack(side="left", padx=5, pady=10)
+        category_var = tk.StringVar(value=ALL_CATEGORIES)
+        ttk.Combobox(filter_frame, textvariable=category_var, state="readonly", width=14,
+                     values=[ALL_CATEGORIES] + sorted(category_names().values(), key=str.lower)).pack(
+            side="left", padx=5, pady=10)
 
         # Filter + Import + Export Buttons
-        ttk.Button(filter_frame, text="Filter", style="Outlined.TButton", command=lambda: filter_by_month()).pack(
+        ttk.Button(filter_frame, text="Filter", style="Outlined.TButton", command=lambda: filter_by_range()).pack(
             side="left", padx=10)
         ttk.Button(filter_frame, text="📥 Import Expenses", style="Outlined.TButton",  command=self.import_expenses_from_csv).pack(
             side="left", padx=5)
-        ttk.Button(filter_frame, text="📤 Export to CSV", style="Outlined.TButton", command=lambda: export_to_csv(month_var.get())).pack(
+        ttk.Button(filter_frame, text="📤 Export to CSV", style="Outlined.TButton", command=lambda: export_to_csv()).pack(
             side="left", padx=5)
 
+        # Search box: matches words of descriptions/categories by prefix, re-run shortly after typing stops
+        search_var = tk.StringVar()
+        ttk.Label(filter_frame, text="🔍 Search:").pack(side="left", padx=(15, 5), pady=10)
+        ttk.Entry(filter_frame, textvariable=search_var, width=20).pack(side="left", padx=5, pady=10)
+        search_job = {"id": None}
+
+        def schedule_search(*_):
+            if search_job["id"] is not None:
+                self.after_cancel(search_job["id"])
+            search_job["id"] = self.after(SEARCH_DELAY_MS, run_search)
+
+        def run_search():
+            search_job["id"] = None
+            if tree.winfo_exists():
+                filter_by_range()
+
+        search_var.trace_add("write", schedule_search)
 
         # --- EXPENSE TABLE FRAME ---
         table_frame = ttk.Frame(self.content_frame)
         table_frame.pack(padx=15, pady=10, fill="both", expand=True)
 
-        # Expense Table (Treeview)
+        # Expense Table (Treeview); only the current page of rows is ever inserted
         tree = ttk.Treeview(table_frame, columns=("Date", "Category", "Amount", "Description"), show="headings",
                             height=15)
         for col in ("Date", "Category", "Amount", "Description"):
-            tree.heading(col, text=col)
+            tree.heading(col, text=col, command=lambda c=col: sort_by(c))
             tree.column(col, width=140 if col != "Description" else 220)
         tree.pack(side="left", fill="both", expand=True)
 
@@ -222,6 +245,16 @@ class UserDashboard(BaseDashboard):
         tree.configure(yscroll=scrollbar.set)
         scrollbar.pack(side="right", fill="y")
 
+        # --- PAGER ---
+        pager = ttk.Frame(self.content_frame)
+        pager.pack()
+        prev_btn = ttk.Button(pager, text="◀ Prev", style="Outlined.TButton", command=lambda: show_page(view["page"] - 1))
+        prev_btn.pack(side="left", padx=5)
+        page_label = ttk.Label(pager, text="", font=("Segoe UI", 10))
+        page_label.pack(side="left", padx=10)
+        next_btn = ttk.Button(pager, text="Next ▶", style="Outlined.TButton", command=lambda: show_page(view["page"] + 1))
+        next_btn.pack(side="left", padx=5)
+
         # --- BUTTONS: Edit/Delete ---
         button_frame = ttk.Frame(self.content_frame)
         button_frame.pack(pady=(5, 15))
@@ -230,47 +263,108 @@ class UserDashboard(BaseDashboard):
             side="left", padx=10)
         ttk.Button(button_frame, text="🗑️ Delete Selected", style="Danger.TButton", command=lambda: delete_expense()).pack(side="left", padx=10)
 
-        # --- MAPPING TREEVIEW ITEMS TO EXPENSE IDs ---
+        # --- MAPPING TREEVIEW ITEMS TO EXPENSE IDs (current page only) ---
         id_map = {}
+        # The lazy query behind the table, its result count, the page shown and the sort order
+        view = {"query": None, "count": 0, "page": 1, "order": "date"}
 
-        # Populate table with data for given month
-        def populate_table(month):
+        # Builds the query for the entered date range and category; shows an error and returns None if invalid
+        def range_query():
+            category = category_var.get()
+            try:
+                return self.controller.current_tracker.query(from_var.get().strip(), to_var.get().strip(),
+                                                             None if category == ALL_CATEGORIES else [category],
+                                                             text=search_var.get(), order_by=view["order"])
+            except ValueError as e:
+                messagebox.showerror("Invalid Input", str(e))
+                return None
+
+        # Shows one page of the current query; rows are fetched from the store only for that page
+        def show_page(number):
+            pages = max(1, -(-view["count"] // TABLE_PAGE_SIZE))
+            view["page"] = min(max(number, 1), pages)
             tree.delete(*tree.get_children())
             id_map.clear()
-            for exp in full_expenses:
-                if exp["date"].startswith(month):
-                    tree_id = tree.insert("", "end", values=(
-                    exp["date"], exp["category"], f"{exp['amount']:.2f}", exp["description"]))
-                    id_map[tree_id] = exp["expense_id"]
+            for exp in view["query"].page(view["page"], TABLE_PAGE_SIZE):
+                tree_id = tree.insert("", "end", values=(
+                exp["date"], category_name(exp["category_id"]), f"{exp['amount']:.2f}", exp["description"]))
+                id_map[tree_id] = exp["expense_id"]
+            page_label.config(text=f"Page {view['page']} of {pages} · {view['count']} expenses")
+            prev_btn.state(["!disabled" if view["page"] > 1 else "disabled"])
+            next_btn.state(["!disabled" if view["page"] < pages else "disabled"])
+
+        # Re-counts the results (after an edit or delete) and shows the same page again
+        def refresh_page():
+            view["count"] = view["query"].count()
+            show_page(view["page"])
 
         # Validates and applies filter
-        def filter_by_month():
-            month = month_var.get().strip()
-            logging.info(f"[User {user.user_id}] viewed summary for month: {month}")
-            if not month or len(month) != 7 or "-" not in month:
-                messagebox.showerror("Invalid Input", "Enter a valid month in YYYY-MM format.")
+        def filter_by_range():
+            results = range_query()
+            if results is None:
                 return
-            populate_table(month)
-
-        # Exports filtered expenses to CSV
-        def export_to_csv(month):
-            filtered_expenses = [exp for exp in full_expenses if exp["date"].startswith(month)]
-            if not filtered_expenses:
-                messagebox.showinfo("No Data", "No expenses to export for the selected month.")
+            logging.info(f"[User {user.user_id}] viewed expenses from {from_var.get()} to {to_var.get()}")
+            view["query"] = results
+            view["count"] = results.count()
+            show_page(1)
+
+        # Sorts by a column (clicking it again reverses the order); only the first page is re-rendered
+        def sort_by(col):
+            field = col.lower()
+            view["order"] = ("-" + field) if view["order"] == field else field
+            for name in ("Date", "Category", "Amount", "Description"):
+                arrow = "" if view["order"].lstrip("-") != name.lower() else (" ▼" if view["order"].startswith("-") else " ▲")
+                tree.heading(name, text=name + arrow)
+            filter_by_range()
+
+        # Exports the filtered expenses to a CSV file (gzip-compressed if it ends in .gz) from a worker thread
+        def export_to_csv():
+            results = range_query()
+            if results is None:
+                return
+            if not results.count():
+                messagebox.showinfo("No Data", "No expenses to export for the selected filters.")
                 return
 
-            file_path = os.path.join(DATA_DIR, f"expenses_{user.username}_{month}.csv")
-            try:
-                with open(file_path, "w", newline="", encoding="utf-8") as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(["Date", "Category", "Amount", "Description"])
-                    for exp in filtered_expenses:
-                        writer.writerow([exp["date"], exp["category"], f"{exp['amount']:.2f}", exp["description"]])
-                messagebox.showinfo("Export Successful", f"Expenses exported to '{file_path}'")
-                logging.info(f"[User {user.user_id}] exported expenses to CSV for month: {month}")
-
-            except Exception as e:
-                messagebox.showerror("Export Failed", f"Error: {e}")
+            date_range = "_".join(filter(None, (from_var.get().strip(), to_var.get().strip()))) or "all"
+            file_path = filedialog.asksaveasfilename(
+                title="Export Expenses", initialdir=DATA_DIR, defaultextension=".csv",
+                initialfile=f"expenses_{user.username}_{date_range}.csv",
+                filetypes=[("CSV files", "*.csv"), ("Compressed CSV files", "*.csv.gz"), ("All files", "*.*")]
+            )
+            if not file_path:
+                return
+            job = CsvExport(results, file_path).start()
+
+            # Modal progress window, so the expenses cannot change while they are written
+            window = tk.Toplevel(self)
+            window.title("Exporting…")
+            window.resizable(False, False)
+            window.transient(self)
+            window.grab_set()
+            ttk.Label(window, text=os.path.basename(file_path), font=("Segoe UI", 11)).pack(padx=20, pady=(15, 5))
+            progress = ttk.Progressbar(window, length=320, maximum=100, mode="determinate")
+            progress.pack(padx=20, pady=5)
+            status = ttk.Label(window, text="Starting…")
+            status.pack(padx=20)
+            ttk.Button(window, text="✖ Cancel", command=job.cancel).pack(pady=(5, 15))
+            window.protocol("WM_DELETE_WINDOW", job.cancel)
+
+            def poll():
+                if not job.finished:
+                    progress["value"] = job.progress() * 100
+                    status.config(text=f"{job.written} of {job.total or '…'} rows written")
+                    self.after(EXPORT_POLL_MS, poll)
+                    return
+                window.grab_release()
+                window.destroy()
+                if job.error is not None:
+                    messagebox.showerror("Export Failed", f"Error: {job.error}")
+                elif not job.cancelled:
+                    messagebox.showinfo("Export Successful", f"{job.written} expenses exported to '{file_path}'")
+                    logging.info(f"[User {user.user_id}] exported {job.written} expenses to CSV for {date_range}")
+
+            poll()
 
         # Deletes selected expense
         def delete_expense():
@@ -283,10 +377,8 @@ class UserDashboard(BaseDashboard):
             confirm = messagebox.askyesno("Confirm", "Delete this expense?")
             if not confirm:
                 return
-            data["expenses"][str(user.user_id)] = [exp for exp in data["expenses"][str(user.user_id)] if
-                                                   exp["expense_id"] != expense_id]
-            save_data(data)
-            tree.delete(tree_id)
+            store.remove(expense_id)
+            refresh_page()
             messagebox.showinfo("Deleted", "Expense deleted successfully.")
             logging.info(f"[User {user.user_id}] deleted expense ID {expense_id}")
 
@@ -298,13 +390,12 @@ class UserDashboard(BaseDashboard):
                 return
             tree_id = selected[0]
             expense_id = id_map[tree_id]
-            for exp in data["expenses"][str(user.user_id)]:
-                if exp["expense_id"] == expense_id:
-                    open_edit_window(exp, tree_id)
-                    break
+            expense = store.get(expense_id)
+            if expense is not None:
+                open_edit_window(expense)
 
         # Opens popup form styled like 'add_expense' for editing
-        def open_edit_window(expense, tree_id):
+        def open_edit_window(expense):
             ewin = tk.Toplevel(self)
             ewin.title("Edit Expense")
             ewin.geometry("450x480")
@@ -319,12 +410,12 @@ class UserDashboard(BaseDashboard):
             ttk.Label(wrapper, text="🛠️ Edit Expense", font=("Segoe UI", 18, "bold")).grid(row=0, column=0,
                                                                                            pady=(0, 20))
 
-            categories = data.get("categories", {})
+            categories = load_global(readonly=True).get("categories", {})
             category_var = tk.StringVar()
             cat_dropdown = ttk.Combobox(wrapper, textvariable=category_var, font=("Segoe UI", 11), width=18)
             cat_dropdown["values"] = [f"{cid}: {cat['name']}" for cid, cat in categories.items()]
             current_cat = next(
-                (f"{cid}: {cat['name']}" for cid, cat in categories.items() if cat["name"] == expense["category"]), "")
+                (f"{cid}: {cat['name']}" for cid, cat in categories.items() if int(cid) == expense["category_id"]), "")
             cat_dropdown.set(current_cat)
             ttk.Label(wrapper, text="📂 Category", font=("Segoe UI", 12)).grid(row=1, column=0, sticky="w")
             cat_dropdown.grid(row=2, column=0, pady=(0, 15), sticky="ew")
@@ -355,7 +446,8 @@ class UserDashboard(BaseDashboard):
                     if ":" not in selected:
                         raise ValueError("Please select a valid category.")
                     cat_id = int(selected.split(":")[0])
-                    cat_name = categories[str(cat_id)]["name"]
+                    if str(cat_id) not in categories:
+                        raise ValueError("Please select a valid category.")
 
                     new_desc = desc_entry.get("1.0", "end").strip()
                     if not new_desc:
@@ -368,14 +460,11 @@ class UserDashboard(BaseDashboard):
                     new_date = date_picker.get_date().strftime("%Y-%m-%d")
 
                     # Update data
-                    expense["category"] = cat_name
-                    expense["description"] = new_desc
-                    expense["amount"] = new_amt
-                    expense["date"] = new_date
-                    save_data(data)
-
-                    # Update Treeview row
-                    tree.item(tree_id, values=(new_date, cat_name, f"{new_amt:.2f}", new_desc))
+                    store.update(expense["expense_id"], category_id=cat_id, description=new_desc,
+                                 amount=new_amt, date=new_date)
+
+                    # Re-render the page, as the row may now sort elsewhere
+                    refresh_page()
                     messagebox.showinfo("Success", "Expense updated.")
                     logging.info(f"[User {user.user_id}] edited expense ID {expense['expense_id']}")
                     ewin.destroy()
@@ -390,18 +479,12 @@ class UserDashboard(BaseDashboard):
                 side="left")
 
         # Initial population of table
-        populate_table(default_month)
+        filter_by_range()
 
     def view_summary(self):
         self.clear_content()
         user = self.controller.auth.get_current_user()
-        data = load_data()
 
-        expenses = data.get("expenses", {}).get(str(user.user_id), [])
-        budget_data = data.get("budgets", {}).get(str(user.user_id), {})
-
-        self.fig1 = None
-        self.fig2 = None
         self.chart_type = tk.StringVar(value="Both")
 
         # Grid config for flexible resizing
@@ -440,15 +523,16 @@ class UserDashboard(BaseDashboard):
         def download_charts():
             username = user.username
             saved_paths = []
+            bar_fig, pie_fig = self.charts.figure("bar"), self.charts.figure("pie")
 
-            if self.chart_type.get().lower() in ["bar", "both"] and self.fig1:
+            if self.chart_type.get().lower() in ["bar", "both"] and bar_fig:
                 bar_path = os.path.join(DATA_DIR, f"{username}_bar_chart.png")
-                self.fig1.savefig(bar_path)
+                bar_fig.savefig(bar_path)
                 saved_paths.append(bar_path)
 
-            if self.chart_type.get().lower() in ["pie", "both"] and self.fig2:
+            if self.chart_type.get().lower() in ["pie", "both"] and pie_fig:
                 pie_path = os.path.join(DATA_DIR, f"{username}_pie_chart.png")
-                self.fig2.savefig(pie_path)
+                pie_fig.savefig(pie_path)
                 saved_paths.append(pie_path)
 
             if saved_paths:
@@ -464,27 +548,47 @@ class UserDashboard(BaseDashboard):
         result_frame.grid(row=3, column=0, sticky="nsew")
         result_frame.grid_rowconfigure(1, weight=1)
         result_frame.grid_columnconfigure(0, weight=1)
+        summary = ttk.Frame(result_frame)
+        summary.grid(row=0, column=0, pady=10)
+
+        # --- Chart Frame: built once, the charts in it are updated in place ---
+        chart_frame = ttk.Frame(result_frame)
+        chart_frame.grid(row=1, column=0, sticky="nsew", padx=10)
+        chart_frame.grid_propagate(False)
+        chart_frame.config(width=1100, height=500)
+        chart_frame.grid_columnconfigure(0, weight=1)
+        chart_frame.grid_columnconfigure(1, weight=2)
+        chart_frame.grid_rowconfigure(0, weight=1)
+        bar_wrapper = ttk.Frame(chart_frame, width=500, height=450)
+        bar_wrapper.grid(row=0, column=0, sticky="nsew")
+        bar_wrapper.grid_propagate(False)
+        pie_wrapper = ttk.Frame(chart_frame, width=600, height=450)
+        pie_wrapper.grid(row=0, column=1, sticky="nsew")
+        pie_wrapper.grid_propagate(False)
+
+        # Everything shown for a month, computed once per month and version of the user's data
+        def summary_data(month):
+            totals = category_totals(user.user_id, month)
+            stats = self.controller.current_tracker.expenses.analytics()
+            typical = stats.percentiles((50, 90), month=month)
+            busiest = None
+            if typical:
+                by_weekday = stats.by_weekday(month)
+                busiest = max(by_weekday, key=by_weekday.get)
+            return {"spent": sum(totals.values()), "categories": totals, "typical": typical, "busiest": busiest,
+                    "budget": load_user_data(user.user_id, readonly=True)["budgets"].get(month)}
 
         def update_summary():
-            # Close previous figures
-            if self.fig1:
-                plt.close(self.fig1)
-            if self.fig2:
-                plt.close(self.fig2)
-
-            for widget in result_frame.winfo_children():
-                widget.destroy()
-
             current_month = month_var.get().strip()
             logging.info(f"[User {user.user_id}] viewed summary for month: {current_month}")
-            month_expenses = [e for e in expenses if e["date"].startswith(current_month)]
-            total_spent = sum(e["amount"] for e in month_expenses)
-            budget = budget_data.get(current_month)
+            data, key = self.charts.cached(user.user_id, current_month, "summary",
+                                           lambda: summary_data(current_month))
+            total_spent, budget = data["spent"], data["budget"]
             remaining = (budget - total_spent) if budget else None
 
             # --- Summary Section ---
-            summary = ttk.Frame(result_frame)
-            summary.grid(row=0, column=0, pady=10)
+            for widget in summary.winfo_children():
+                widget.destroy()
             ttk.Label(summary, text=f"Total Expenses: ${total_spent:.2f}", font=("Segoe UI", 13, "bold"),
                       foreground="#f54242").pack()
             if budget is not None:
@@ -499,91 +603,23 @@ class UserDashboard(BaseDashboard):
                 ttk.Label(summary, text="No budget set for this month.", foreground="orange",
                           font=("Segoe UI", 12)).pack()
 
-            # --- Chart Frame ---
-            chart_frame = ttk.Frame(result_frame)
-            chart_frame.grid(row=1, column=0, sticky="nsew", padx=10)
-            chart_frame.grid_propagate(False)
-            chart_frame.config(width=1100, height=500)
-            chart_frame.grid_columnconfigure(0, weight=1)
-            chart_frame.grid_columnconfigure(1, weight=2)
-            chart_frame.grid_rowconfigure(0, weight=1)
-
-            from collections import defaultdict
-            category_totals = defaultdict(float)
-            for e in month_expenses:
-                category_totals[e["category"]] += e["amount"]
+            # Typical expense and busiest weekday for the month
+            typical = data["typical"]
+            if typical:
+                ttk.Label(summary, text=f"Typical expense: ${typical[50]:.2f} (90% under ${typical[90]:.2f})"
+                                        f"  •  Busiest day: {data['busiest']}", font=("Segoe UI", 11)).pack(pady=(5, 0))
 
             chart_type = self.chart_type.get().lower()
-
             if chart_type in ["bar", "both"]:
-                self.fig1, ax1 = plt.subplots(figsize=(6.5, 4.5), dpi=100)
-                labels = ["Expenses", "Budget"]
-                values = [total_spent, budget if budget else 0]
-                bars = ax1.bar(labels, values, color=["#f54242", "#42a1f5"], width=0.4)
-                ax1.set_ylim(0, max(max(values), 1) * 1.2)
-                ax1.set_title("Expenses vs Budget", fontsize=14, fontweight="bold", pad=20)
-                ax1.set_ylabel("Amount ($)", fontsize=12)
-                ax1.grid(True, axis='y', linestyle='--', alpha=0.7)
-                for bar in bars:
-                    yval = bar.get_height()
-                    ax1.text(bar.get_x() + bar.get_width() / 2, yval + 10, f"${yval:.2f}", ha='center', va='bottom',
-                             fontsize=11, fontweight='bold')
-
-                canvas_wrapper = ttk.Frame(chart_frame)
-                canvas_wrapper.grid(row=0, column=0, sticky="nsew")
-                canvas_wrapper.grid_propagate(False)
-                canvas_wrapper.config(width=500, height=450)
-
-                canvas1 = FigureCanvasTkAgg(self.fig1, master=canvas_wrapper)
-                canvas1.draw()
-                canvas1.get_tk_widget().pack(fill="both", expand=True)
-
-            if chart_type in ["pie", "both"] and category_totals:
-                self.fig2, ax2 = plt.subplots(figsize=(7.5, 5.5), dpi=100)
-                pie_labels = list(category_totals.keys())
-                pie_sizes = list(category_totals.values())
-                pie_colors = [
-                    "#66c2a5", "#fc8d62", "#8da0cb", "#e78ac3", "#a6d854",
-                    "#ffd92f", "#e5c494", "#b3b3b3", "#f781bf", "#999999"
-                ]
-
-                wedges, _, autotexts = ax2.pie(
-                    pie_sizes,
-                    labels=None,
-                    autopct='%1.1f%%',
-                    startangle=140,
-                    colors=pie_colors[:len(pie_labels)],
-                    wedgeprops=dict(edgecolor='white')
-                )
-
-                for autotext in autotexts:
-                    autotext.set_color("black")
-                    autotext.set_fontsize(12)
-
-                ax2.legend(
-                    wedges,
-                    pie_labels,
-                    title="Categories",
-                    loc="center left",
-                    bbox_to_anchor=(1, 0.5),
-                    fontsize=11,
-                    title_fontsize=12
-                )
-
-                ax2.set_title("Expenses by Category", fontsize=14, fontweight="bold")
-                self.fig2.tight_layout(rect=[0, 0, 0.85, 1])
-
-                canvas_wrapper = ttk.Frame(chart_frame)
-                canvas_wrapper.grid(row=0, column=1, sticky="nsew")
-                canvas_wrapper.grid_propagate(False)
-                canvas_wrapper.config(width=600, height=450)
-
-                canvas2 = FigureCanvasTkAgg(self.fig2, master=canvas_wrapper)
-                canvas2.draw()
-                canvas2.get_tk_widget().pack(fill="both", expand=True)
-
-            # ✅ Force re-layout after all chart rendering
-            self.update_idletasks()
+                bar_wrapper.grid()
+                self.charts.draw("bar", bar_wrapper, key, data)
+            else:
+                bar_wrapper.grid_remove()
+            if chart_type in ["pie", "both"]:
+                pie_wrapper.grid()
+                self.charts.draw("pie", pie_wrapper, key, data)
+            else:
+                pie_wrapper.grid_remove()
 
         update_summary()
 
@@ -627,11 +663,8 @@ class UserDashboard(BaseDashboard):
                 if amount <= 0:
                     raise ValueError("Budget must be a positive number.")
 
-                data = load_data()
-                if str(user.user_id) not in data["budgets"]:
-                    data["budgets"][str(user.user_id)] = {}
-                data["budgets"][str(user.user_id)][month] = amount
-                save_data(data)
+                if not put_budget(user.user_id, month, amount):
+                    raise IOError("The budget could not be saved.")
 
                 logging.info(f"[User {user.user_id}] set budget for {month}: ${amount:.2f}")
                 messagebox.showinfo("Success", f"Budget of ${amount:.2f} set for {month}")
@@ -640,12 +673,16 @@ class UserDashboard(BaseDashboard):
                 logging.error(f"[User {user.user_id}] failed to set budget: {e}")
                 messagebox.showerror("Error", f"Could not set budget. Please ensure valid date/amount.")
 
-
         # --- Save Button Centered Across Columns ---
         ttk.Button(wrapper_center, text="💾 Save Budget", style="Accent.TButton", command=submit_budget).grid(
             row=4, column=0, pady=10, sticky="e"
         )
 
+    def clear_content(self):
+        """Clears the content area, freeing the charts shown in it."""
+        self.charts.release()
+        super().clear_content()
+
     def load_landing(self):
         """
         Displays the landing content (profile/overview section).
@@ -661,7 +698,11 @@ class UserDashboard(BaseDashboard):
             self.nav_actions[name].event_generate("<Button-1>")
 
     def import_expenses_from_csv(self):
-        """Imports expenses from a selected CSV file."""
+        """
+        Imports expenses from a selected CSV file. Rows are read and validated on a worker
+        thread (see core.csv_import) and committed here in chunks, with progress, row errors
+        and a Cancel button shown while it runs.
+        """
         user = self.controller.auth.get_current_user()
         file_path = filedialog.askopenfilename(
             title="Select CSV File",
@@ -670,43 +711,89 @@ class UserDashboard(BaseDashboard):
         if not file_path:
             return
 
+        store = self.controller.current_tracker.expenses
+        skip = messagebox.askyesno("Duplicates", "Skip rows that match expenses you already have?\n\n"
+                                                 "Choose No to import them anyway and list them for review.")
         try:
-            with open(file_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                data = load_data()
-
-                # Ensure the user has an expense list
-                if str(user.user_id) not in data["expenses"]:
-                    data["expenses"][str(user.user_id)] = []
-
-                imported_count = 0
-                for row in reader:
-                    try:
-                        amount = float(row["Amount"])
-                        date = datetime.datetime.strptime(row["Date"], "%Y-%m-%d").strftime("%Y-%m-%d")
-                        category = row["Category"]
-                        description = row["Description"]
-
-                        expense = {
-                            "expense_id": next(ExpenseTracker.expense_id_counter),
-                            "amount": amount,
-                            "category": category,
-                            "description": description,
-                            "user_id": user.user_id,
-                            "date": date
-                        }
-                        data["expenses"][str(user.user_id)].append(expense)
-                        imported_count += 1
-                    except Exception as e:
-                        logging.warning(f"Failed to import row {row}: {e}")
-
-                save_data(data)
-                messagebox.showinfo("Success", f"Successfully imported {imported_count} expenses from CSV.")
-                logging.info(f"[User {user.user_id}] imported {imported_count} expenses from CSV.")
-                self.view_expenses()  # Refresh expenses view
-        except Exception as e:
+            job = CsvImport(file_path, user.user_id, existing=store.fingerprints().counts(),
+                            duplicates="skip" if skip else "flag").start()
+        except OSError as e:
             logging.error(f"Error importing CSV: {e}")
             messagebox.showerror("Error", f"Failed to import expenses from CSV: {e}")
+            return
+
+        self.clear_content()
+        ttk.Label(self.content_frame, text="📥 Import Expenses", font=("Segoe UI", 20, "bold")).pack(pady=(30, 5))
+        ttk.Label(self.content_frame, text=os.path.basename(file_path), font=("Segoe UI", 11)).pack()
+
+        progress = ttk.Progressbar(self.content_frame, length=400, maximum=100, mode="determinate")
+        progress.pack(pady=(20, 5))
+        status = ttk.Label(self.content_frame, text="Reading…", font=("Segoe UI", 11))
+        status.pack()
+
+        buttons = ttk.Frame(self.content_frame)
+        buttons.pack(pady=10)
+        cancel_btn = ttk.Button(buttons, text="✖ Cancel", command=job.cancel)
+        cancel_btn.pack(side="left", padx=5)
+
+        list_title = "Rejected and duplicate rows:" if skip else "Rejected rows, and duplicates imported anyway:"
+        ttk.Label(self.content_frame, text=list_title, font=("Segoe UI", 11, "bold")).pack(anchor="w", padx=30)
+        error_list = tk.Listbox(self.content_frame, height=10, font=("Segoe UI", 10))
+        error_list.pack(fill="both", expand=True, padx=30, pady=(0, 20))
+
+        shown = {"errors": 0, "duplicates": 0}
+
+        def new_rows():
+            # Flagged duplicates are imported too, but are not new
+            return max(job.imported - (0 if skip else job.duplicates), 0)
+
+        def counts():
+            return f"new {new_rows()} · duplicate {job.duplicates} · rejected {job.failed}"
+
+        def poll():
+            if not status.winfo_exists():
+                job.cancel()  # the user navigated away
+                return
+            try:
+                job.take(store.add_many)
+            except Exception as e:
+                job.cancel()
+                job.error = e
+                logging.error(f"[User {user.user_id}] failed to save imported expenses: {e}")
+            progress["value"] = job.progress() * 100
+            status.config(text=f"Read {job.rows} rows · {counts()}")
+            for line, message in job.errors[shown["errors"]:]:
+                error_list.insert("end", f"Line {line}: {message}")
+                shown["errors"] += 1
+            for line, expense in job.duplicate_lines[shown["duplicates"]:]:
+                error_list.insert("end", f"Line {line}: duplicate of {expense}")
+                shown["duplicates"] += 1
+            if job.finished:
+                finish()
+            else:
+                self.after(IMPORT_POLL_MS, poll)
+
+        def finish():
+            cancel_btn.destroy()
+            ttk.Button(buttons, text="📋 View Expenses", command=self.view_expenses).pack(side="left", padx=5)
+            logging.info(f"[User {user.user_id}] imported {job.imported} expenses from CSV ({counts()})"
+                         f"{' before cancelling' if job.cancelled else ''}.")
+            if job.error is not None:
+                status.config(text=f"Stopped: {job.error}")
+                messagebox.showerror("Error", f"Failed to import expenses from CSV: {job.error}\n"
+                                              f"{job.imported} expenses were imported before it stopped.")
+            elif job.cancelled:
+                status.config(text=f"Cancelled · {counts()}")
+            else:
+                progress["value"] = 100
+                status.config(text=f"Done · {counts()}")
+                duplicates = "skipped" if skip else "imported anyway"
+                messagebox.showinfo("Import Complete",
+                                    f"{new_rows()} new expenses imported.\n"
+                                    f"{job.duplicates} duplicate rows {duplicates}.\n"
+                                    f"{job.failed} rows rejected.")
+
+        poll()
 
     def view_spending_trend(self):
         """Displays a spending trend line graph for selected months."""
@@ -727,18 +814,13 @@ class UserDashboard(BaseDashboard):
         ttk.Label(month_selection_frame, text="Select Months:", font=("Segoe UI", 12)).pack(side="left", padx=5)
 
         # Generate a list of months from the data
-        data = load_data()
-        expenses = data.get("expenses", {}).get(str(user.user_id), [])
-        available_months = sorted(set(exp["date"][:7] for exp in expenses), reverse=True)
+        months_with_expenses = available_months(user.user_id)
 
         # Multi-Select Dropdown
         month_var = tk.StringVar(value="Select Months")
         month_entry = ttk.Entry(month_selection_frame, textvariable=month_var, state="readonly", width=25)
         month_entry.pack(side="left", padx=5)
 
-        # Track the chart canvas to prevent overlapping
-        self.chart_canvas = None
-
         # Function to open the multi-select month selector
         def open_month_selector():
             def update_selection():
@@ -758,7 +840,7 @@ class UserDashboard(BaseDashboard):
             month_listbox = tk.Listbox(wrapper, selectmode="multiple", height=10, width=20)
             month_listbox.pack(pady=10)
 
-            for month in available_months:
+            for month in months_with_expenses:
                 month_listbox.insert("end", month)
 
             ttk.Button(wrapper, text="Select", style="Accent.TButton", command=update_selection).pack()
@@ -767,50 +849,29 @@ class UserDashboard(BaseDashboard):
         ttk.Button(month_selection_frame, text="🔽", style="Accent.TButton", command=open_month_selector).pack(
             side="left", padx=5)
 
+        # Chart area, filled by the chart manager on the first plot and updated in place after that
+        chart_area = ttk.Frame(frame)
+        chart_area.pack(fill="both", expand=True)
+
         # Function to plot the spending trend
         def plot_spending_trend():
-            selected_months = month_var.get().split(", ")
+            selected_months = [month for month in month_var.get().split(", ") if month in months_with_expenses]
             if len(selected_months) < 1:
                 messagebox.showwarning("Selection Error", "Please select at least one month.")
                 return
 
-            # Clear the previous chart if it exists
-            if self.chart_canvas:
-                self.chart_canvas.get_tk_widget().destroy()
-
-            # Calculate expenses for the selected months
-            month_totals = {}
-            for month in selected_months:
-                total = sum(exp["amount"] for exp in expenses if exp["date"].startswith(month))
-                month_totals[month] = total
-
-            # Prepare data for the line graph
-            months = list(month_totals.keys())
-            totals = list(month_totals.values())
+            # Monthly totals and their moving average, from the user's expense columns
+            def trend_data():
+                stats = self.controller.current_tracker.expenses.analytics()
+                totals_by_month = stats.by_month()
+                totals = [totals_by_month.get(month, 0.0) for month in selected_months]
+                return {"months": selected_months, "totals": totals, "window": TREND_WINDOW,
+                        "average": stats.rolling_average(totals, TREND_WINDOW)}
 
-            # Create the line graph
-
-            fig, ax = plt.subplots(figsize=(8, 5))
-            ax.plot(months, totals, marker='o', linestyle='-', color='#d62728', linewidth=2, markersize=8)
-            ax.fill_between(months, totals, color='#ff9999', alpha=0.4)
-            ax.set_title("Spending Trend Over Selected Months")
-            ax.set_ylabel("Total Expense ($)")
-            ax.set_xlabel("Months")
-            ax.grid(True, linestyle='--', alpha=0.5)
-
-            # Add value labels on points
-            for i, value in enumerate(totals):
-                ax.text(i, value + 20, f"${value:.2f}", ha='center', va='bottom')
-
-            # Embed the plot in Tkinter and track the canvas
-            self.chart_canvas = FigureCanvasTkAgg(fig, master=frame)
-            self.chart_canvas.draw()
-            self.chart_canvas.get_tk_widget().pack(fill="both", expand=True)
+            data, key = self.charts.cached(user.user_id, tuple(selected_months), "trend", trend_data)
+            self.charts.draw("trend", chart_area, key, data)
 
         # Plot Button
         plot_button = ttk.Button(month_selection_frame, text="Show Trend", style="Accent.TButton",
                                  command=plot_spending_trend)
         plot_button.pack(side="left", padx=10)
-
-
-
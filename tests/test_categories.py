@@ -0,0 +1,74 @@
+import json
+import unittest
+from unittest import mock
+from core import categories, file_manager
+from core.categories import category_usage, migrate_category_refs, rebuild_usage, verify_usage
+from core.expense_store import ExpenseStore
+from core.queries import category_in_use
+from tests.test_storage import StorageTestCase
+
+
+def _expense(expense_id, category_id, date="2024-01-05"):
+    return {"expense_id": expense_id, "amount": 10.0, "category_id": category_id,
+            "description": "x", "user_id": 1, "date": date}
+
+
+class CategoryUsageTest(StorageTestCase):
+    mode = "json"
+
+    def test_counts_follow_store_changes(self):
+        store = ExpenseStore(1)
+        self.assertEqual(category_usage(), {})
+        store.add_many([_expense(1, 1), _expense(2, 1), _expense(3, 2)])
+        self.assertEqual(category_usage(), {1: 2, 2: 1})
+        store.update(1, category_id=3)
+        store.remove(3)
+        self.assertEqual(category_usage(), {1: 1, 3: 1})
+        self.assertEqual(category_usage(1), {1: 1, 3: 1})
+        self.assertEqual(category_usage(2), {})
+        self.assertFalse(category_in_use(2))
+
+    def test_verify_and_rebuild(self):
+        ExpenseStore(1).add_many([_expense(1, 1), _expense(2, 2)])
+        self.assertTrue(verify_usage())
+        categories._usage["total"][1] = 5  # drifted counts
+        self.assertFalse(verify_usage())
+        rebuild_usage()
+        self.assertTrue(verify_usage())
+        self.assertEqual(category_usage(), {1: 1, 2: 1})
+
+    def test_save_by_another_process_is_counted(self):
+        ExpenseStore(1).add(_expense(1, 1))
+        self.assertFalse(category_in_use(3))
+        self.assertTrue(file_manager.sync(timeout=10))
+        # Another process adds an expense filed under Travel, straight to data.json
+        with open(self.paths["data_file"]) as f:
+            data = json.load(f)
+        data["expenses"]["1"].append(_expense(2, 3))
+        data.get("totals", {}).pop("1", None)
+        with open(self.paths["data_file"], "w") as f:
+            json.dump(data, f)
+        self.assertTrue(category_in_use(3))
+        self.assertEqual(category_usage(), {1: 1, 3: 1})
+        self.assertEqual(len(ExpenseStore(1)), 2)
+
+
+class CategoryRefsMigrationTest(StorageTestCase):
+    mode = "json"
+
+    def test_migrates_once_then_skips_the_full_load(self):
+        data = file_manager.load_data()
+        legacy = dict(_expense(1, None), category="Rent")
+        del legacy["category_id"]
+        data["expenses"]["1"] = [legacy]
+        file_manager.save_data(data)
+
+        self.assertEqual(migrate_category_refs(), 1)
+        self.assertEqual(file_manager.load_user_data(1, readonly=True)["expenses"][0]["category_id"], 2)
+        self.reopen()
+        with mock.patch.object(categories, "load_data", side_effect=AssertionError("full load")):
+            self.assertEqual(migrate_category_refs(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
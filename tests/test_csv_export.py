@@ -0,0 +1,61 @@
+import csv
+import gzip
+import os
+import time
+import unittest
+from core import file_manager
+from core.csv_export import CsvExport
+from core.csv_import import COLUMNS
+from core.expense_store import ExpenseStore
+from tests.test_storage import StorageTestCase
+
+
+class CsvExportTest(StorageTestCase):
+    mode = "json"
+
+    def setUp(self):
+        super().setUp()
+        self.store = ExpenseStore(1)
+        first = file_manager.reserve_expense_ids(1, 40)
+        self.store.add_many([{"expense_id": first + i, "user_id": 1, "date": f"2024-{i % 12 + 1:02d}-10",
+                              "category_id": i % 3 + 1, "amount": i + 0.5, "description": f"item {i}"}
+                             for i in range(40)])
+
+    def run_export(self, query, name, **kwargs):
+        export = CsvExport(query, os.path.join(self.dir, name), **kwargs).start()
+        deadline = time.monotonic() + 10
+        while not export.finished:
+            self.assertLess(time.monotonic(), deadline, "export did not finish")
+            time.sleep(0.01)
+        return export
+
+    def read(self, name, opener=open):
+        with opener(os.path.join(self.dir, name), "rt", newline="", encoding="utf-8") as f:
+            return list(csv.reader(f))
+
+    def test_writes_the_query_results(self):
+        query = self.store.query("2024-03", "2024-06", categories=["Food"])
+        export = self.run_export(query, "food.csv")
+        self.assertIsNone(export.error)
+        expected = [[exp["date"], "Food", f"{exp['amount']:.2f}", exp["description"]] for exp in query]
+        self.assertEqual(self.read("food.csv"), [list(COLUMNS)] + expected)
+        self.assertEqual((export.total, export.written, export.progress()), (len(expected), len(expected), 1.0))
+
+    def test_gz_path_is_compressed(self):
+        export = self.run_export(self.store.query(), "all.csv.gz")
+        self.assertIsNone(export.error)
+        self.assertEqual(len(self.read("all.csv.gz", gzip.open)), 41)
+
+    def test_cancelled_or_failed_export_leaves_no_file(self):
+        export = CsvExport(self.store.query(), os.path.join(self.dir, "cancelled.csv"))
+        export.cancel()
+        export.start()
+        while not export.finished:
+            time.sleep(0.01)
+        failed = self.run_export(self.store.query(), os.path.join("missing", "failed.csv"))
+        self.assertIsInstance(failed.error, OSError)
+        self.assertEqual(sorted(name for name in os.listdir(self.dir) if ".csv" in name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import time
+import unittest
+from core.csv_import import CsvImport, parse_row
+from core.expense_store import ExpenseStore
+from tests.test_storage import StorageTestCase
+
+HEADER = "Date,Category,Amount,Description\n"
+
+
+class CsvImportTest(StorageTestCase):
+    mode = "json"
+
+    def write_csv(self, *rows):
+        path = os.path.join(self.dir, "import.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(HEADER + "".join(row + "\n" for row in rows))
+        return path
+
+    def run_import(self, importer, store):
+        """Commits chunks the way the dashboard's poll loop does, until the import is finished."""
+        importer.start()
+        deadline = time.monotonic() + 10
+        while not importer.finished:
+            self.assertLess(time.monotonic(), deadline, "import did not finish")
+            importer.take(store.add_many)
+            time.sleep(0.01)
+        importer.take(store.add_many)
+        return importer
+
+    def test_parse_row_rejects_amounts_that_are_not_positive_numbers(self):
+        for amount in ("inf", "-inf", "1e400", "nan", "-5", "0", "abc"):
+            with self.subTest(amount=amount):
+                with self.assertRaisesRegex(ValueError, "invalid amount"):
+                    parse_row({"Date": "2024-01-05", "Category": "Food", "Amount": amount,
+                               "Description": "x"}, 1)
+
+    def test_bad_rows_are_reported_and_good_rows_imported(self):
+        path = self.write_csv("2024-01-05,Food,12.50,lunch",
+                              "2024-01-06,Food,inf,overflow",
+                              "2024-01-07,Food,nan,not a number",
+                              "2024-01-08,Food,-3,refund",
+                              "2024-01-09,Food,0,free",
+                              "2024-1-10,Rent,800,unpadded date",
+                              "2024-01-11,Nope,5,unknown category",
+                              "2024-02-30,Food,5,no such day")
+        store = ExpenseStore(1)
+        importer = self.run_import(CsvImport(path, 1), store)
+        self.assertIsNone(importer.error)
+        self.assertEqual((importer.rows, importer.imported, importer.failed), (8, 2, 6))
+        self.assertEqual([line for line, _ in importer.errors], [3, 4, 5, 6, 8, 9])
+        self.assertIn("invalid amount 'inf'", importer.errors[0][1])
+        self.assertIn("invalid amount 'nan'", importer.errors[1][1])
+        self.assertIn("invalid date", importer.errors[5][1])
+        self.assertEqual(sorted((exp["date"], exp["amount"]) for exp in self.reopen().records()),
+                         [("2024-01-05", 12.5), ("2024-01-10", 800.0)])
+
+    def test_missing_column_stops_the_import(self):
+        path = os.path.join(self.dir, "import.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Date,Category,Amount\n2024-01-05,Food,12.50\n")
+        importer = self.run_import(CsvImport(path, 1), ExpenseStore(1))
+        self.assertIn("Description", str(importer.error))
+        self.assertEqual(importer.imported, 0)
+
+    def test_duplicates_are_matched_per_occurrence(self):
+        store = ExpenseStore(1)
+        first = self.write_csv("2024-01-05,Food,12.50,Coffee", "2024-01-06,Rent,800,rent")
+        self.run_import(CsvImport(first, 1), store)
+        # The same export again, plus a second identical coffee and one new row
+        path = self.write_csv("2024-01-05,Food,12.50,coffee!", "2024-01-05,Food,12.50,Coffee",
+                              "2024-01-06,Rent,800,rent", "2024-01-07,Travel,30,bus")
+        skipped = self.run_import(CsvImport(path, 1, existing=store.fingerprints().counts()), store)
+        self.assertEqual((skipped.imported, skipped.duplicates), (2, 2))
+        self.assertEqual([line for line, _ in skipped.duplicate_lines], [2, 4])
+        self.assertEqual(len(store), 4)
+
+        flagged = self.run_import(CsvImport(path, 1, existing=store.fingerprints().counts(), duplicates="flag"),
+                                  store)
+        self.assertEqual((flagged.imported, flagged.duplicates), (4, 4))
+        self.assertEqual(len(store), 8)
+        with self.assertRaises(ValueError):
+            CsvImport(path, 1, duplicates="merge")
+
+    def test_cancel_keeps_only_the_chunks_already_taken(self):
+        path = self.write_csv(*(f"2024-01-{day % 28 + 1:02d},Food,{day + 1},item {day}" for day in range(100)))
+        store = ExpenseStore(1)
+        importer = CsvImport(path, 1, chunk_size=10).start()
+
+        def commit_then_cancel(records):
+            store.add_many(records)
+            importer.cancel()  # the user presses Cancel while the first chunk is committed
+
+        deadline = time.monotonic() + 10
+        while not importer.finished:
+            self.assertLess(time.monotonic(), deadline, "import did not stop")
+            importer.take(commit_then_cancel)
+            time.sleep(0.01)
+        self.assertEqual(importer.take(store.add_many), 0)
+        self.assertEqual(importer.imported, 10)
+        self.assertEqual(len(self.reopen()), 10)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import datetime
+import unittest
+from core import file_manager
+from core.expense_store import ExpenseStore
+from tests.test_storage import StorageTestCase
+
+DATES = ("2023-12-31", "2024-01-01", "2024-01-31", "2024-02-01", "2024-02-29", "2024-03-01", "2025-01-01")
+
+
+class ExpenseQueryTest(StorageTestCase):
+    mode = "json"
+
+    def setUp(self):
+        super().setUp()
+        self.store = ExpenseStore(1)
+        first = file_manager.reserve_expense_ids(1, 30)
+        self.store.add_many([{"expense_id": first + i, "user_id": 1, "date": DATES[i % len(DATES)],
+                              "category_id": i % 3 + 1, "amount": float(i % 11 + 1),
+                              "description": f"item {i % 5}"} for i in range(30)])
+
+    def dates(self, query):
+        return [exp["date"] for exp in query]
+
+    def test_partial_dates_cover_their_whole_year_or_month(self):
+        self.assertEqual(set(self.dates(self.store.query("2024", "2024"))),
+                         {"2024-01-01", "2024-01-31", "2024-02-01", "2024-02-29", "2024-03-01"})
+        self.assertEqual(set(self.dates(self.store.query("2024-02", "2024-02"))), {"2024-02-01", "2024-02-29"})
+        self.assertEqual(set(self.dates(self.store.query("2024-01-31", "2024-02-01"))), {"2024-01-31", "2024-02-01"})
+
+    def test_bounds_are_inclusive_and_may_be_open_or_dates(self):
+        self.assertEqual(set(self.dates(self.store.query(date_to="2024-01-01"))), {"2023-12-31", "2024-01-01"})
+        self.assertEqual(set(self.dates(self.store.query(date_from=datetime.date(2024, 3, 1)))),
+                         {"2024-03-01", "2025-01-01"})
+        self.assertEqual(self.store.query("2026").count(), 0)
+        for bad in ("2024-13", "24-01-01", "2024-02-30", "soon"):
+            with self.subTest(bound=bad):
+                with self.assertRaises(ValueError):
+                    self.store.query(bad)
+
+    def test_pages_follow_the_iteration_order(self):
+        for order_by in ("date", "-date", "amount", "-amount", "category", "-description"):
+            with self.subTest(order_by=order_by):
+                query = self.store.query(order_by=order_by)
+                paged = [exp["expense_id"] for number in range(1, 5) for exp in query.page(number, 8)]
+                self.assertEqual(paged, [exp["expense_id"] for exp in query])
+                self.assertEqual(query.page(5, 8), [])
+        dates = self.dates(self.store.query(order_by="-date"))
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        with self.assertRaises(ValueError):
+            self.store.query().page(0)
+
+    def test_offset_and_limit_apply_to_counts_and_pages(self):
+        everything = [exp["expense_id"] for exp in self.store.query(order_by="amount")]
+        query = self.store.query(order_by="amount", offset=5, limit=10)
+        self.assertEqual(query.count(), 10)
+        self.assertEqual([exp["expense_id"] for exp in query.page(2, 4)], everything[9:13])
+        self.assertEqual([exp["expense_id"] for exp in query.page(3, 4)], everything[13:15])
+        self.assertEqual(self.store.query(offset=40).count(), 0)
+
+    def test_filters_narrow_count_and_total(self):
+        query = self.store.query("2024", "2024", categories=["Rent"], min_amount=3, text="item")
+        expected = [exp for exp in self.store.records()
+                    if exp["date"].startswith("2024") and exp["category_id"] == 2 and exp["amount"] >= 3]
+        self.assertEqual(query.count(), len(expected))
+        self.assertEqual(query.total(), sum(exp["amount"] for exp in expected))
+
+    def test_changes_during_iteration_are_reported(self):
+        results = iter(self.store.query())
+        next(results)
+        self.store.remove(self.store.records()[-1]["expense_id"])
+        with self.assertRaises(RuntimeError):
+            list(results)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from core import file_manager
+from core.expense_store import ExpenseStore
+from core.indexes import AggregateIndex
+from tests.test_storage import StorageTestCase
+
+
+def _expense(expense_id, date, category_id, amount):
+    return {"expense_id": expense_id, "user_id": 1, "date": date, "category_id": category_id,
+            "amount": amount, "description": "x"}
+
+
+class AggregateIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = AggregateIndex()
+        self.index.rebuild([_expense(1, "2024-01-05", 1, 10.0), _expense(2, "2024-01-09", 2, 5.0),
+                            _expense(3, "2024-02-01", 1, 2.5)])
+
+    def test_totals_follow_changes(self):
+        self.index.update(_expense(2, "2024-01-09", 2, 5.0), _expense(2, "2024-02-09", 1, 7.0))
+        self.index.remove(_expense(1, "2024-01-05", 1, 10.0))
+        self.assertEqual((self.index.total, self.index.count), (9.5, 2))
+        self.assertEqual(self.index.month_total("2024-01"), 0.0)
+        self.assertEqual(self.index.category_totals("2024-02"), {1: 9.5})
+        self.assertEqual(self.index.category_counts(), {1: 2})
+        self.assertEqual(self.index.dump(["2024-01"]), {"2024-01": {}})
+
+    def test_dump_and_load_round_trip(self):
+        loaded = AggregateIndex()
+        loaded.load(self.index.dump())
+        self.assertTrue(loaded.matches(self.index))
+        self.assertEqual(loaded.category_totals(), {1: 12.5, 2: 5.0})
+        for drift, same in ((0.001, True), (1.0, False)):
+            dumped = self.index.dump()
+            dumped["2024-01"]["1"][0] += drift
+            loaded.load(dumped)
+            self.assertIs(loaded.matches(self.index), same)
+        loaded.load(dict(self.index.dump(), **{"2024-03": {"2": [0.0, 1]}}))
+        self.assertFalse(loaded.matches(self.index))
+
+
+class StoredTotalsTest(StorageTestCase):
+    mode = "sqlite"
+
+    def test_verify_then_rebuild_stored_totals(self):
+        store = ExpenseStore(1)
+        first = file_manager.reserve_expense_ids(1, 3)
+        store.add_many([_expense(first, "2024-01-05", 1, 10.0), _expense(first + 1, "2024-01-09", 2, 5.0),
+                        _expense(first + 2, "2024-02-01", 1, 2.5)])
+        self.assertTrue(store.verify_aggregates())
+
+        # Totals saved out of step with the expenses, e.g. by an interrupted older version
+        self.assertTrue(file_manager.save_expense_changes(1, totals={"2024-01": {"1": [99.0, 1]}}))
+        self.assertFalse(store.verify_aggregates())
+
+        store.rebuild_aggregates()
+        self.assertTrue(store.verify_aggregates())
+        self.assertEqual(self.reopen().month_total("2024-01"), 15.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from core.journal import Journal, apply_records, diff_data
+
+
+def _put_budget(uid, period, amount):
+    return {"op": "put", "table": "budgets", "key": [uid, period], "value": amount}
+
+
+class JournalRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "data.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_replay_round_trip(self):
+        old = {"users": [], "budgets": {}}
+        new = {"users": [{"user_id": 1, "username": "a"}], "budgets": {"1": {"2024-01": 50.0}}}
+        journal = Journal(self.path)
+        journal.append(diff_data(old, new))
+        self.assertEqual(Journal(self.path).replay({"users": [], "budgets": {}}), new)
+
+    def test_torn_tail_is_cut_before_the_next_append(self):
+        journal = Journal(self.path)
+        journal.append([_put_budget("1", "2024-01", 10.0)])
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"op":"put","table":"budg')  # crash mid-append
+
+        journal = Journal(self.path)
+        data = journal.replay({"budgets": {}})
+        self.assertEqual(data["budgets"], {"1": {"2024-01": 10.0}})
+        journal.append([_put_budget("1", "2024-02", 20.0)])
+
+        data = Journal(self.path).replay({"budgets": {}})
+        self.assertEqual(data["budgets"], {"1": {"2024-01": 10.0, "2024-02": 20.0}})
+        with open(self.path, "rb") as f:
+            self.assertTrue(all(line.endswith(b"\n") for line in f))
+
+    def test_failed_append_is_cut_back_before_the_retry(self):
+        journal = Journal(self.path)
+        journal.append([_put_budget("1", "2024-01", 10.0)])
+        real_write = os.write
+
+        def torn_write(fd, data):
+            real_write(fd, bytes(data[:10]))
+            raise OSError("No space left on device")
+
+        with mock.patch("core.journal.os.write", torn_write):
+            with self.assertRaises(OSError):
+                journal.append([_put_budget("1", "2024-02", 20.0)])
+        journal.append([_put_budget("1", "2024-02", 20.0)])  # the caller retries
+
+        data = Journal(self.path).replay({"budgets": {}})
+        self.assertEqual(data["budgets"], {"1": {"2024-01": 10.0, "2024-02": 20.0}})
+        with open(self.path, "rb") as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_torn_append_that_cannot_be_cut_back_is_cut_on_the_next_one(self):
+        journal = Journal(self.path)
+        journal.append([_put_budget("1", "2024-01", 10.0)])
+        with mock.patch("core.journal.os.fsync", side_effect=OSError("I/O error")), \
+                mock.patch("core.journal.os.ftruncate", side_effect=OSError("I/O error")):
+            with self.assertRaises(OSError):
+                journal.append([_put_budget("1", "2024-02", 20.0)])
+        journal.append([_put_budget("1", "2024-03", 30.0)])
+
+        data = Journal(self.path).replay({"budgets": {}})
+        self.assertEqual(data["budgets"], {"1": {"2024-01": 10.0, "2024-03": 30.0}})
+
+    def test_unreadable_line_is_skipped(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(_put_budget("1", "2024-01", 10.0)) + "\n")
+            f.write("not json\n")
+            f.write(json.dumps(_put_budget("1", "2024-02", 20.0)) + "\n")
+        journal = Journal(self.path)
+        data = journal.replay({"budgets": {}})
+        self.assertEqual(data["budgets"], {"1": {"2024-01": 10.0, "2024-02": 20.0}})
+        self.assertEqual(journal.record_count, 2)
+
+    def test_apply_matches_diff(self):
+        old = {"users": [{"user_id": 1}], "expenses": {"1": [{"expense_id": 1, "amount": 1.0},
+                                                              {"expense_id": 2, "amount": 2.0}]}}
+        new = {"users": [{"user_id": 1}], "expenses": {"1": [{"expense_id": 2, "amount": 3.0},
+                                                              {"expense_id": 4, "amount": 4.0}]}}
+        copy = json.loads(json.dumps(old))
+        self.assertEqual(apply_records(copy, diff_data(old, new)), new)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from core.models import Expense
+
+RECORD = {"expense_id": 7, "amount": 12.34, "category_id": 2, "description": "weekly shop",
+          "user_id": 1, "date": "2024-03-05"}
+
+
+class ExpenseRecordTest(unittest.TestCase):
+    def test_from_lists_reads_like_the_stored_dict(self):
+        exp, = Expense.from_lists([RECORD])
+        self.assertEqual(exp.cents, 1234)
+        self.assertEqual(exp["date"], "2024-03-05")
+        self.assertEqual(dict(exp), RECORD)
+        self.assertEqual(exp, RECORD)
+
+    def test_same_day_and_description_are_shared(self):
+        first, second = Expense.from_lists([RECORD, dict(RECORD, expense_id=8)])
+        self.assertIs(first.ordinal, second.ordinal)
+        self.assertIs(first.description, second.description)
+
+    def test_unknown_fields_and_unreadable_dates_round_trip(self):
+        stored = dict(RECORD, date="2024-3-5", note="cash")
+        exp, = Expense.from_lists([stored])
+        self.assertEqual(exp.ordinal, 0)
+        self.assertEqual(dict(exp), stored)
+        exp["date"] = "2024-03-06"
+        self.assertEqual(dict(exp), dict(stored, date="2024-03-06"))
+
+    def test_assignment_goes_through_the_compact_fields(self):
+        exp = Expense.from_dict(RECORD)
+        exp.update(amount=5.5, date="2025-01-01")
+        self.assertEqual((exp.cents, exp["amount"], exp["date"]), (550, 5.5, "2025-01-01"))
+        with self.assertRaises(ValueError):
+            exp["date"] = "soon"
+        with self.assertRaises(KeyError):
+            del exp["amount"]
+
+
+if __name__ == "__main__":
+    unittest.main()
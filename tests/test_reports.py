@@ -0,0 +1,48 @@
+import csv
+import os
+import unittest
+from core import file_manager
+from core.expense_store import ExpenseStore
+from core.reports import build_report
+from tests.test_storage import StorageTestCase
+
+
+class JournalReportTest(StorageTestCase):
+    mode = "journal"
+    writer = True
+
+    def test_report_sees_queued_saves_and_leaves_the_journal(self):
+        store = ExpenseStore(1)
+        first = file_manager.reserve_expense_ids(1, 2)
+        store.add_many([{"expense_id": first + i, "user_id": 1, "date": "2024-05-0{}".format(i + 1),
+                         "category_id": 1, "amount": 10.0 + i, "description": "x"} for i in range(2)])
+        file_manager.put_budget(1, "2024-05", 15.0)
+
+        report = build_report("2024-05", out_dir=os.path.join(self.dir, "report"), workers=1)
+
+        self.assertEqual((report["count"], report["total"]), (2, 21.0))
+        with open(os.path.join(self.dir, "report", "summary.csv"), newline="", encoding="utf-8") as f:
+            self.assertEqual(list(csv.reader(f))[1], ["1", "alice", "2", "21.00", "15.00", "yes"])
+        # The spawned worker must not have folded and truncated the live journal
+        self.assertGreater(os.path.getsize(self.paths["journal_file"]), 0)
+        self.assertStored({exp["expense_id"]: exp for exp in store.records()}, {"2024-05": 15.0})
+
+    def test_categories_are_kept_apart_by_id_and_rows_limited_to_the_month(self):
+        store = ExpenseStore(1)
+        first = file_manager.reserve_expense_ids(1, 4)
+        # 98 and 99 are deleted categories: both show as Unknown but must not overwrite each other
+        rows = [("2024-05-09", 98, 5.0), ("2024-05-02", 99, 7.0), ("2024-05-05", 1, 3.0), ("2024-06-01", 1, 100.0)]
+        store.add_many([{"expense_id": first + i, "user_id": 1, "date": date, "category_id": cid,
+                         "amount": amount, "description": "x"} for i, (date, cid, amount) in enumerate(rows)])
+
+        report = build_report("2024-05", out_dir=os.path.join(self.dir, "report"), workers=1)
+
+        self.assertEqual(report["categories"], {1: [3.0, 1], 98: [5.0, 1], 99: [7.0, 1]})
+        with open(report["users"][0]["file"], newline="", encoding="utf-8") as f:
+            self.assertEqual([row[:3] for row in list(csv.reader(f))[1:]],
+                             [["2024-05-02", "Unknown", "7.00"], ["2024-05-05", "Food", "3.00"],
+                              ["2024-05-09", "Unknown", "5.00"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from core import file_manager
+from core.expense_store import ExpenseStore
+
+
+class StorageTestCase(unittest.TestCase):
+    """Runs against a fresh data directory in `mode`, optionally with the background writer."""
+
+    mode = "json"
+    writer = False
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.paths = {"data_file": os.path.join(self.dir, "data.json"),
+                      "journal_file": os.path.join(self.dir, "data.journal"),
+                      "shard_dir": os.path.join(self.dir, "shards"),
+                      "db_file": os.path.join(self.dir, "chaching.db")}
+        with open(self.paths["data_file"], "w") as f:
+            json.dump({"users": [], "expenses": {}, "categories": {}, "budgets": {}}, f)
+        self.saved = (file_manager.STORAGE_MODE, file_manager.data_paths())
+        file_manager.use_data_paths(**self.paths)
+        file_manager.set_storage_mode(self.mode, carry_over=False)
+        if self.writer:
+            file_manager.start_background_writer()
+        file_manager.put_user({"user_id": 1, "username": "alice", "password": "x", "role": "user"})
+        for cid, name in enumerate(("Food", "Rent", "Travel"), start=1):
+            file_manager.put_category({"category_id": cid, "name": name})
+
+    def tearDown(self):
+        self.assertTrue(file_manager.shutdown_background_writer(timeout=10))
+        file_manager.set_storage_mode("json", carry_over=False)
+        file_manager.use_data_paths(**self.saved[1])
+        file_manager.set_storage_mode(self.saved[0], carry_over=False)
+        shutil.rmtree(self.dir)
+
+    def reopen(self):
+        """Drops every in-memory state, as if the app had been restarted."""
+        self.assertTrue(file_manager.sync(timeout=10))
+        file_manager.use_data_paths(**self.paths)
+        return ExpenseStore(1)
+
+    def assertStored(self, expected, budgets):
+        store = self.reopen()
+        self.assertEqual({exp["expense_id"]: exp for exp in store.records()}, expected)
+        self.assertEqual(dict(file_manager.load_user_data(1, readonly=True)["budgets"]), budgets)
+        self.assertTrue(store.verify_aggregates())
+        self.assertEqual(file_manager.load_global(readonly=True)["users"][0]["username"], "alice")
+
+
+class RandomizedRoundTrip:
+    """A single-threaded random run of adds, edits, deletes and budgets, reloaded from disk along the way."""
+
+    def test_random_changes_survive_reload(self):
+        rng = random.Random(f"{self.mode}-{self.writer}")
+        store = ExpenseStore(1)
+        expected, budgets = {}, {}
+        for step in range(300):
+            action = rng.random()
+            if action < 0.45 or not expected:
+                first = file_manager.reserve_expense_ids(1, 2)
+                records = [{"expense_id": first + i, "user_id": 1,
+                            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                            "category_id": rng.randint(1, 3), "amount": round(rng.uniform(1, 100), 2),
+                            "description": f"item {step}"} for i in range(2)]
+                store.add_many([dict(r) for r in records])
+                expected.update((r["expense_id"], r) for r in records)
+            elif action < 0.7:
+                expense_id = rng.choice(sorted(expected))
+                changes = {"amount": round(rng.uniform(1, 100), 2), "date": f"2025-{rng.randint(1, 12):02d}-01"}
+                store.update(expense_id, **changes)
+                expected[expense_id] = dict(expected[expense_id], **changes)
+            elif action < 0.9:
+                expense_id = rng.choice(sorted(expected))
+                store.remove(expense_id)
+                del expected[expense_id]
+            else:
+                month = f"2024-{rng.randint(1, 12):02d}"
+                budgets[month] = float(rng.randint(50, 500))
+                self.assertTrue(file_manager.put_budget(1, month, budgets[month]))
+            if step % 60 == 59:
+                self.assertStored(expected, budgets)
+                store = ExpenseStore(1)
+        self.assertStored(expected, budgets)
+        # Ids are never handed out twice, even after every expense above was reloaded
+        self.assertGreater(file_manager.reserve_expense_ids(1), max(expected, default=0))
+
+    def test_queued_changes_are_visible_before_they_are_written(self):
+        store = ExpenseStore(1)
+        first = file_manager.reserve_expense_ids(1, 2)
+        records = [{"expense_id": first + i, "user_id": 1, "date": "2024-05-01", "category_id": 1,
+                    "amount": 10.0, "description": "x"} for i in range(2)]
+        store.add_many([dict(r) for r in records])
+        self.assertTrue(file_manager.sync(timeout=10))
+        with file_manager._write_lock:  # keeps the background writer from writing anything
+            store.update(first, amount=5.0)
+            store.remove(first + 1)
+            self.assertTrue(file_manager.put_budget(1, "2024-05", 100.0))
+            content = file_manager.load_user_data(1, readonly=True)
+            self.assertEqual([(exp["expense_id"], exp["amount"]) for exp in content["expenses"]], [(first, 5.0)])
+            self.assertEqual(content["budgets"]["2024-05"], 100.0)
+            self.assertEqual(len(file_manager.load_data(readonly=True)["expenses"]["1"]), 1)
+        self.assertStored({first: dict(records[0], amount=5.0)}, {"2024-05": 100.0})
+
+    def test_whole_document_save_after_changes(self):
+        store = ExpenseStore(1)
+        first = file_manager.reserve_expense_ids(1, 3)
+        store.add_many([{"expense_id": first + i, "user_id": 1, "date": "2024-05-01", "category_id": 1,
+                         "amount": 10.0, "description": "x"} for i in range(3)])
+        data = file_manager.load_data()
+        data["expenses"]["1"][0]["amount"] = 99.0
+        file_manager.save_data(data)
+        store.update(first + 1, amount=20.0)
+        expected = {exp["expense_id"]: dict(exp) for exp in data["expenses"]["1"]}
+        expected[first + 1]["amount"] = 20.0
+        self.assertStored(expected, {})
+
+    def test_deleted_category_id_is_not_reused(self):
+        top = file_manager.reserve_category_id()
+        file_manager.put_category({"category_id": top, "name": "Gifts"})
+        file_manager.delete_category(top)
+        self.reopen()
+        self.assertGreater(file_manager.reserve_category_id(), top)
+
+
+def _mode_cases():
+    for mode in file_manager.STORAGE_MODES:
+        for writer in (False, True):
+            name = f"{mode.capitalize()}{'Writer' if writer else ''}RoundTripTest"
+            yield name, type(name, (RandomizedRoundTrip, StorageTestCase), {"mode": mode, "writer": writer})
+
+
+globals().update(_mode_cases())
+
+
+class NewerSnapshotAtStartup:
+    """Starting in sharded/sqlite mode when data.json may have been saved after the store."""
+
+    def restart(self, mode):
+        self.assertTrue(file_manager.sync(timeout=10))
+        file_manager.use_data_paths(**self.paths)
+        file_manager.set_storage_mode(mode, carry_over=False)
+
+    def backups(self):
+        return [name for name in os.listdir(self.dir) if name.endswith(".bak")]
+
+    def test_data_json_saved_after_the_store_is_migrated(self):
+        self.restart("json")  # a run in json mode sees only data.json, which has no alice
+        file_manager.put_user({"user_id": 2, "username": "bob", "password": "x", "role": "user"})
+        later = os.stat(self.paths["data_file"]).st_mtime + 5  # newer, however coarse the file times
+        os.utime(self.paths["data_file"], (later, later))
+        self.restart(self.mode)
+        self.assertEqual([user["username"] for user in file_manager.load_global(readonly=True)["users"]], ["bob"])
+        self.assertEqual(len(self.backups()), 1)
+
+    def test_store_saved_last_is_kept(self):
+        self.restart("json")
+        self.restart(self.mode)
+        self.assertEqual([user["username"] for user in file_manager.load_global(readonly=True)["users"]], ["alice"])
+        self.assertEqual(self.backups(), [])
+
+
+class ShardedStartupTest(NewerSnapshotAtStartup, StorageTestCase):
+    mode = "sharded"
+
+
+class SqliteStartupTest(NewerSnapshotAtStartup, StorageTestCase):
+    mode = "sqlite"
+
+
+class JournalCrashTest(StorageTestCase):
+    mode = "journal"
+
+    def test_torn_append_then_reload(self):
+        store = ExpenseStore(1)
+        expense_id = file_manager.reserve_expense_ids(1)
+        record = {"expense_id": expense_id, "user_id": 1, "date": "2024-05-01", "category_id": 2,
+                  "amount": 12.5, "description": "rent"}
+        store.add(dict(record))
+        with open(self.paths["journal_file"], "a", encoding="utf-8") as f:
+            f.write('{"op":"put","table":"expen')  # the process died mid-append
+        self.reopen()
+        self.assertTrue(file_manager.put_budget(1, "2024-05", 300.0))
+        self.assertStored({expense_id: record}, {"2024-05": 300.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+# charts.py - Persistent Summary and Trend Charts, Updated in Place and Cached by Data Version
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from core.file_manager import data_version, global_version
+
+# Chart data sets kept; the oldest is dropped first
+CHART_CACHE_SIZE = 64
+PIE_COLORS = ["#66c2a5", "#fc8d62", "#8da0cb", "#e78ac3", "#a6d854",
+              "#ffd92f", "#e5c494", "#b3b3b3", "#f781bf", "#999999"]
+FIGURE_SIZES = {"bar": (6.5, 4.5), "pie": (7.5, 5.5), "trend": (8, 5)}
+
+
+class ChartManager:
+    """
+    Owns a dashboard's matplotlib charts. Each chart type ("bar", "pie", "trend") keeps one
+    Figure, Axes and Tk canvas while its view is shown, and new data updates the existing
+    artists instead of building a new figure. The data behind a chart is cached by
+    (user, key, kind, data versions), so switching back to a month costs no recomputation,
+    and a chart already showing that data is not redrawn at all. Figures are created
+    with matplotlib.figure.Figure, not pyplot, so nothing global holds on to them;
+    release() frees them when the user navigates away.
+    """
+
+    def __init__(self):
+        self._charts = {}  # chart type -> {"figure", "axes", "canvas", "master", "artists", "shown"}
+        self._data = {}    # (user_id, key, kind, data version, categories version) -> chart data
+
+    def cached(self, user_id, key, kind, compute):
+        """
+        (data, cache key) for `key` (e.g. a month); `compute()` runs only if the user's data, or
+        the categories whose names the charts show, changed since.
+        """
+        cache_key = (str(user_id), key, kind, data_version(user_id), global_version())
+        data = self._data.get(cache_key)
+        if data is None:
+            if len(self._data) >= CHART_CACHE_SIZE:
+                del self._data[next(iter(self._data))]
+            data = self._data[cache_key] = compute()
+        return data, cache_key
+
+    def figure(self, chart):
+        """The Figure currently showing `chart`, or None (e.g. for savefig)."""
+        entry = self._charts.get(chart)
+        return entry["figure"] if entry is not None else None
+
+    def draw(self, chart, master, cache_key, data):
+        """Shows `data` (from cached()) as `chart` inside `master`, reusing its figure if it is already there."""
+        entry = self._charts.get(chart)
+        if entry is None or entry["master"] is not master or not entry["canvas"].get_tk_widget().winfo_exists():
+            self._free(chart)
+            figure = Figure(figsize=FIGURE_SIZES[chart], dpi=100)
+            canvas = FigureCanvasTkAgg(figure, master=master)
+            canvas.get_tk_widget().pack(fill="both", expand=True)
+            entry = self._charts[chart] = {"figure": figure, "axes": figure.add_subplot(), "canvas": canvas,
+                                           "master": master, "artists": None, "shown": None}
+        if entry["shown"] == cache_key:
+            return
+        getattr(self, f"_draw_{chart}")(entry, data)
+        entry["shown"] = cache_key
+        entry["canvas"].draw_idle()
+
+    def release(self):
+        """Frees every figure and its canvas; the cached data stays for when the charts are shown again."""
+        for chart in list(self._charts):
+            self._free(chart)
+
+    def _free(self, chart):
+        entry = self._charts.pop(chart, None)
+        if entry is None:
+            return
+        widget = entry["canvas"].get_tk_widget()
+        if widget.winfo_exists():
+            widget.destroy()
+        entry["figure"].clear()
+
+    # ------------------------------------------------------------------ charts
+
+    @staticmethod
+    def _draw_bar(entry, data):
+        """Expenses vs budget; the two bars and their labels are created once and then moved."""
+        ax = entry["axes"]
+        values = [data["spent"], data["budget"] or 0]
+        if entry["artists"] is None:
+            bars = ax.bar(["Expenses", "Budget"], values, color=["#f54242", "#42a1f5"], width=0.4)
+            labels = [ax.text(bar.get_x() + bar.get_width() / 2, 0, "", ha='center', va='bottom',
+                              fontsize=11, fontweight='bold') for bar in bars]
+            ax.set_title("Expenses vs Budget", fontsize=14, fontweight="bold", pad=20)
+            ax.set_ylabel("Amount ($)", fontsize=12)
+            ax.grid(True, axis='y', linestyle='--', alpha=0.7)
+            entry["artists"] = (bars, labels)
+        bars, labels = entry["artists"]
+        top = max(max(values), 1) * 1.2
+        for bar, label, value in zip(bars, labels, values):
+            bar.set_height(value)
+            label.set_y(value + top * 0.01)
+            label.set_text(f"${value:.2f}")
+        ax.set_ylim(0, top)
+
+    @staticmethod
+    def _draw_pie(entry, data):
+        """Expenses by category. The number of wedges changes with the data, so the pie is re-plotted on the same axes."""
+        ax = entry["axes"]
+        ax.clear()
+        totals = data["categories"]
+        if not totals:
+            ax.set_axis_off()
+            ax.set_title("No expenses this month", fontsize=14, fontweight="bold")
+            return
+        wedges, _, autotexts = ax.pie(list(totals.values()), labels=None, autopct='%1.1f%%', startangle=140,
+                                      colors=PIE_COLORS[:len(totals)], wedgeprops=dict(edgecolor='white'))
+        for autotext in autotexts:
+            autotext.set_color("black")
+            autotext.set_fontsize(12)
+        ax.legend(wedges, list(totals), title="Categories", loc="center left", bbox_to_anchor=(1, 0.5),
+                  fontsize=11, title_fontsize=12)
+        ax.set_title("Expenses by Category", fontsize=14, fontweight="bold")
+        if entry["artists"] is None:
+            entry["figure"].tight_layout(rect=[0, 0, 0.85, 1])
+            entry["artists"] = True
+
+    @staticmethod
+    def _draw_trend(entry, data):
+        """Monthly totals and their moving average; the lines are kept and given new data."""
+        ax = entry["axes"]
+        months, totals, average = data["months"], data["totals"], data["average"]
+        positions = list(range(len(months)))
+        if entry["artists"] is None:
+            total_line, = ax.plot([], [], marker='o', linestyle='-', color='#d62728', linewidth=2, markersize=8,
+                                  label="Monthly total")
+            average_line, = ax.plot([], [], linestyle='--', color='#1f77b4', linewidth=2,
+                                    label=f"{data['window']}-month average")
+            ax.set_title("Spending Trend Over Selected Months")
+            ax.set_ylabel("Total Expense ($)")
+            ax.set_xlabel("Months")
+            ax.grid(True, linestyle='--', alpha=0.5)
+            entry["artists"] = {"total": total_line, "average": average_line, "fill": None, "labels": []}
+        artists = entry["artists"]
+        artists["total"].set_data(positions, totals)
+        artists["average"].set_data(positions, average)
+        artists["average"].set_visible(len(months) > 1)
+        # The shaded area and the value labels depend on how many months there are
+        if artists["fill"] is not None:
+            artists["fill"].remove()
+        for label in artists["labels"]:
+            label.remove()
+        artists["fill"] = ax.fill_between(positions, totals, color='#ff9999', alpha=0.4)
+        top = max(totals + [1]) * 1.15
+        artists["labels"] = [ax.text(i, value + top * 0.01, f"${value:.2f}", ha='center', va='bottom')
+                             for i, value in enumerate(totals)]
+        legend = ax.get_legend()
+        if len(months) > 1 and legend is None:
+            ax.legend(handles=[artists["total"], artists["average"]])
+        elif len(months) <= 1 and legend is not None:
+            legend.remove()
+        ax.set_xticks(positions)
+        ax.set_xticklabels(months)
+        ax.set_xlim(-0.5, max(len(months) - 0.5, 0.5))
+        ax.set_ylim(0, top)
@@ -1,36 +1,35 @@
 # landing.py - Landing Page for the Application
 from tkinter import ttk
-from core.file_manager import load_data
+from core.file_manager import load_global, load_user_data
+from core.categories import category_name, category_usage
+from core.queries import month_totals
 import datetime
 
 
 def build_landing_content(container, controller):
     # Get the current logged-in user
     user = controller.auth.get_current_user()
-    # Load the application data
-    data = load_data()
 
     # Display a welcome message with the username
     ttk.Label(container, text=f"👋 Welcome back, {user.username}!", font=("Segoe UI", 20, "bold")).pack(pady=(0, 20))
 
     # Check user role and call appropriate landing function
     if user.role == "user":
-        show_user_landing(container, user, data, controller)
+        # Only the user's own shard is needed here
+        show_user_landing(container, user, load_user_data(user.user_id, readonly=True), controller)
     else:
-        show_admin_landing(container, data, controller)
+        show_admin_landing(container, load_global(readonly=True), controller)
 
 
-def show_user_landing(container, user, data, controller):
-    # Extract user ID as a string
-    user_id = str(user.user_id)
+def show_user_landing(container, user, user_data, controller):
     # Get the current month in YYYY-MM format
     current_month = datetime.datetime.now().strftime("%Y-%m")
     # Get the expenses for the current user
-    expenses = data.get("expenses", {}).get(user_id, [])
+    expenses = user_data["expenses"]
     # Calculate the total expenses for the current month
-    total = sum(e["amount"] for e in expenses if e["date"].startswith(current_month))
+    total = month_totals(user.user_id, [current_month])[current_month]
     # Get the budget set for the current month, if any
-    budget = data.get("budgets", {}).get(user_id, {}).get(current_month)
+    budget = user_data["budgets"].get(current_month)
     # Determine the budget status
     budget_status = f"Set: ${budget:.2f}" if budget else "Not Set"
 
@@ -63,7 +62,7 @@ def show_user_landing(container, user, data, controller):
     # Display the recent expenses or a message if none exist
     if recent_exp:
         for exp in recent_exp:
-            text = f"{exp['date']} - ${exp['amount']:.2f} for {exp['category']} | {exp['description'][:40]}"
+            text = f"{exp['date']} - ${exp['amount']:.2f} for {category_name(exp['category_id'])} | {exp['description'][:40]}"
             ttk.Label(recent_frame, text=text, font=("Segoe UI", 10)).pack(anchor="w", pady=2)
     else:
         ttk.Label(recent_frame, text="No recent activity.", font=("Segoe UI", 10, "italic")).pack(anchor="w")
@@ -77,9 +76,8 @@ def show_admin_landing(container, data, controller):
     # Get the total number of categories and count unused ones
     categories = data.get("categories", {})
     total_categories = len(categories)
-    unused = sum(1 for cat in categories.values()
-                 if cat["name"] not in {exp["category"]
-                 for exps in data.get("expenses", {}).values() for exp in exps})
+    usage = category_usage()  # expenses per category id, kept up to date as expenses change
+    unused = sum(1 for cat in categories.values() if not usage.get(cat["category_id"]))
 
     # Display admin summary with total and unused categories
     info = f"🗂 Total Categories: {total_categories}\n🚫 Unused Categories: {unused}"